@@ -1,20 +1,93 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
-import joblib
 import numpy as np
-import pandas as pd
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ConfigDict, Field, create_model
+
+from artifact import LEAN_HEADER_PATH, LEAN_MODEL_PATH, load_lean_artifact, load_tree_artifact, model_fingerprint
+from batcher import MicroBatcher
+from cache import PredictionCache
+from drift import DriftMonitor
+from encoder import FeatureEncoder
+from explain import Explainer
+from features import FEATURE_COLUMNS, parse_hour
+from hotspots import DEFAULT_CELL_DEG, Geocoder, HotspotIndex
+from lookup_table import TABLE_META_PATH, TABLE_PATH, LookupTable, file_fingerprint
+from metrics import Counter, Gauge, MetricsMiddleware, MetricsRegistry, StageTimer
+from prediction_log import LOG_DIR, PredictionLog
+from registry import LoadedModel, ModelRegistry, stamp
+from risk_surface import DEFAULT_SPEED_STEP, RiskSurface, index_of
+from route_scoring import aggregate_route, segment_lengths_km, segment_risk
+from stats_cube import MAX_VIEW_DIMS, StatsCube
+from tree_eval import TREES_PATH
 
 BASE_DIR = Path(__file__).resolve().parent
 MODEL_PATH = BASE_DIR / "model.joblib"
 META_PATH = BASE_DIR / "model_meta.json"
 
+# "auto" serves the lean artifact (model.ubj) when it is at least as new as model.joblib
+MODEL_FORMAT = os.environ.get("ML_MODEL_FORMAT", "auto")
+
+# "tree_eval" scores with the flattened trees (tree_eval.py) instead of the xgboost runtime;
+# ML_TREE_EVAL_BACKEND picks its kernel: auto|native|numpy
+MODEL_BACKEND = os.environ.get("ML_MODEL_BACKEND", "xgboost")
+TREE_EVAL_BACKEND = os.environ.get("ML_TREE_EVAL_BACKEND", "auto")
+
+# Opt-in micro-batching of concurrent /predict calls
+MICROBATCH_ENABLED = os.environ.get("ML_MICROBATCH", "0") == "1"
+MICROBATCH_MAX_BATCH = int(os.environ.get("ML_MICROBATCH_MAX_BATCH", "64"))
+MICROBATCH_WAIT_MS = float(os.environ.get("ML_MICROBATCH_WAIT_MS", "2"))
+
+# In-process prediction cache keyed on the engineered features (size 0 disables)
+CACHE_SIZE = int(os.environ.get("ML_CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.environ.get("ML_CACHE_TTL_SECONDS", "300"))
+# /explain results, cached the same way in a cache of their own (size 0 disables)
+EXPLAIN_CACHE_SIZE = int(os.environ.get("ML_EXPLAIN_CACHE_SIZE", str(CACHE_SIZE)))
+
+# Poll the model files this often and hot-swap a retrained model (0 disables)
+RELOAD_POLL_SECONDS = float(os.environ.get("ML_RELOAD_POLL_SECONDS", "5"))
+# Load at import time, so a pre-forking server (gunicorn --preload) shares the model copy-on-write
+PRELOAD = os.environ.get("ML_PRELOAD", "0") == "1"
+
+# Per-stage handler timing in /metrics; switch at runtime with POST /metrics/stages
+STAGE_TIMING = os.environ.get("ML_STAGE_TIMING", "1") == "1"
+
+# Compare /predict traffic with the training distribution (needs drift_reference in model_meta.json);
+# live counts are halved every ML_DRIFT_WINDOW observations
+DRIFT_ENABLED = os.environ.get("ML_DRIFT", "1") == "1"
+DRIFT_WINDOW = int(os.environ.get("ML_DRIFT_WINDOW", "50000"))
+
+# Append every prediction to segment files in this directory from a background thread ("" disables).
+# A full queue drops rows per ML_PREDICTION_LOG_POLICY: drop_newest|drop_oldest|sample
+PREDICTION_LOG_DIR = os.environ.get("ML_PREDICTION_LOG_DIR", str(LOG_DIR))
+PREDICTION_LOG_QUEUE_ROWS = int(os.environ.get("ML_PREDICTION_LOG_QUEUE_ROWS", "50000"))
+PREDICTION_LOG_POLICY = os.environ.get("ML_PREDICTION_LOG_POLICY", "drop_newest")
+PREDICTION_LOG_FLUSH_SECONDS = float(os.environ.get("ML_PREDICTION_LOG_FLUSH_SECONDS", "1"))
+PREDICTION_LOG_SEGMENT_MB = float(os.environ.get("ML_PREDICTION_LOG_SEGMENT_MB", "64"))
+PREDICTION_LOG_MAX_SEGMENTS = int(os.environ.get("ML_PREDICTION_LOG_MAX_SEGMENTS", "100"))
+
+# /risk_surface: hour x weather x lighting probabilities per road bucket, built with each model.
+# "lazy" fills a bucket on first use, "precompute" fills all of them at load, "" disables
+RISK_SURFACE_MODE = os.environ.get("ML_RISK_SURFACE", "lazy")
+RISK_SURFACE_SPEED_STEP = int(os.environ.get("ML_RISK_SURFACE_SPEED_STEP", str(DEFAULT_SPEED_STEP)))
+
+# /hotspots: grid index over the accident CSV, rebuilt when the file changes ("" disables)
+HOTSPOT_DATA_PATH = os.environ.get(
+    "ML_HOTSPOT_DATA", str(BASE_DIR.parent / "public" / "data" / "accident_prediction_india.csv"),
+)
+HOTSPOT_CELL_DEG = float(os.environ.get("ML_HOTSPOT_CELL_DEG", str(DEFAULT_CELL_DEG)))
+
+# /stats: pre-aggregated counts over the same CSV, rebuilt when the file changes ("" disables)
+STATS_DATA_PATH = os.environ.get("ML_STATS_DATA", HOTSPOT_DATA_PATH)
+STATS_VIEW_DIMS = int(os.environ.get("ML_STATS_VIEW_DIMS", str(MAX_VIEW_DIMS)))
+
 app = FastAPI(title="Safe Route XGBoost API", version="2.0.0")
 
 app.add_middleware(
@@ -24,16 +97,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-model_bundle = None
-model_meta = None
+metrics_registry = MetricsRegistry()
+http_requests = metrics_registry.counter(
+    "ml_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"),
+)
+http_latency = metrics_registry.histogram(
+    "ml_http_request_duration_seconds", "End-to-end request latency.", ("route",),
+)
+http_in_flight = metrics_registry.gauge("ml_http_requests_in_flight", "Requests being handled.", ("route",))
+predictions_served = metrics_registry.counter(
+    "ml_predictions_total", "Predictions served, by model version, predicted class and source.",
+    ("model_version", "prediction", "source"),
+)
+stages = StageTimer(
+    metrics_registry.histogram(
+        "ml_stage_duration_seconds",
+        "Time per handler stage; 'framework' is parsing, validation and serialization.",
+        ("stage",),
+    ),
+    enabled=STAGE_TIMING,
+)
+app.add_middleware(
+    MetricsMiddleware, requests=http_requests, latency=http_latency, in_flight=http_in_flight, stages=stages,
+)
 
-# Risk mappings (must match train.py)
-WEATHER_RISK = {"Clear": 0, "Cloudy": 0.02, "Hazy": 0.06, "Rainy": 0.12, "Foggy": 0.15, "Stormy": 0.22}
-ROAD_COND_RISK = {"Dry": 0, "Wet": 0.06, "Damaged": 0.12, "Under Construction": 0.10}
-LIGHTING_RISK = {"Daylight": 0, "Dusk": 0.04, "Dawn": 0.05, "Dark": 0.12}
-ROAD_TYPE_RISK = {"Urban Road": 0.02, "Village Road": 0.04, "State Highway": 0.08, "National Highway": 0.10, "Expressway": 0.06}
-VEHICLE_RISK = {"Cycle": 0.10, "Pedestrian": 0.12, "Two-Wheeler": 0.10, "Auto-Rickshaw": 0.06, "Car": 0.02, "Bus": 0.04, "Truck": 0.06}
-LOCATION_RISK = {"Straight Road": 0, "Curve": 0.06, "Intersection": 0.08, "T-Junction": 0.06, "Bridge": 0.04, "Flyover": 0.02}
+batcher: Optional[MicroBatcher] = None
+prediction_cache = PredictionCache(max_size=CACHE_SIZE, ttl_seconds=CACHE_TTL_SECONDS)
+explanation_cache = PredictionCache(max_size=EXPLAIN_CACHE_SIZE, ttl_seconds=CACHE_TTL_SECONDS)
+prediction_log = PredictionLog(
+    Path(PREDICTION_LOG_DIR),
+    max_queue_rows=PREDICTION_LOG_QUEUE_ROWS,
+    policy=PREDICTION_LOG_POLICY,
+    flush_seconds=PREDICTION_LOG_FLUSH_SECONDS,
+    segment_bytes=int(PREDICTION_LOG_SEGMENT_MB * (1 << 20)),
+    max_segments=PREDICTION_LOG_MAX_SEGMENTS,
+) if PREDICTION_LOG_DIR else None
 
 
 class PredictionRequest(BaseModel):
@@ -61,17 +159,160 @@ class PredictionRequest(BaseModel):
 
 
 class PredictionResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
     prediction: str
     confidence: float
     probabilities: Dict[str, float]
+    model_version: Optional[str] = None
 
 
-def parse_hour(time_str: str) -> int:
-    try:
-        parts = time_str.strip().split(":")
-        return max(0, min(23, int(parts[0])))
-    except Exception:
-        return 0
+# Columnar form of PredictionRequest: every field becomes an optional list, or one
+# value shared by every row. Missing columns fall back to the PredictionRequest default.
+ColumnarPredictionRequest = create_model(
+    "ColumnarPredictionRequest",
+    **{
+        name: (Optional[Union[List[field.annotation], field.annotation]], None)
+        for name, field in PredictionRequest.model_fields.items()
+    },
+)
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[PredictionResponse]
+
+
+class ExplanationResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    prediction: str
+    confidence: float
+    probabilities: Dict[str, float]
+    explained_class: str
+    method: str
+    # Log-odds of explained_class before any feature is known
+    base_value: float
+    # Engineered feature -> log-odds it adds to explained_class, largest magnitude first
+    contributions: Dict[str, float]
+    # The engineered (unscaled) feature values the model saw
+    feature_values: Dict[str, float]
+    model_version: Optional[str] = None
+
+
+class BatchExplanationResponse(BaseModel):
+    explanations: List[ExplanationResponse]
+
+
+class RouteContext(BaseModel):
+    """Conditions shared by every segment of a route."""
+    year: int = 2024
+    month: str = "January"
+    day_of_week: str = "Monday"
+    time_of_day: str = "12:00"
+    weather: str = "Clear"
+    road_condition: str = "Dry"
+    lighting: str = "Daylight"
+    vehicle_type: str = "Car"
+    num_vehicles: int = 1
+    driver_age: int = 35
+    driver_gender: str = "Male"
+    license_status: str = "Valid"
+    alcohol: str = "No"
+
+
+class RouteSegment(BaseModel):
+    road_type: str = "Urban Road"
+    speed_limit: int = 50
+    location_detail: str = "Straight Road"
+    road_condition: Optional[str] = None  # overrides the route-wide condition
+
+
+class RouteScoreRequest(BaseModel):
+    polyline: List[Tuple[float, float]] = Field(..., min_length=2, description="[lat, lon] points")
+    context: RouteContext = Field(default_factory=RouteContext)
+    # One entry per segment (len(polyline) - 1), a single entry applied to all,
+    # or empty for defaults.
+    segments: List[RouteSegment] = Field(default_factory=list)
+
+
+class RiskSurfaceContext(BaseModel):
+    """Conditions held fixed while hour, weather and lighting are swept."""
+    road_condition: str = "Dry"
+    vehicle_type: str = "Car"
+    num_vehicles: int = 1
+    driver_age: int = 35
+    license_status: str = "Valid"
+    alcohol: str = "No"
+
+
+class RiskSurfaceSegment(BaseModel):
+    road_type: str = "Urban Road"
+    speed_limit: int = 50
+    location_detail: str = "Straight Road"
+
+
+class RiskSurfaceRequest(BaseModel):
+    polyline: List[Tuple[float, float]] = Field(..., min_length=2, description="[lat, lon] points")
+    # One entry per segment, a single entry applied to all, or empty for defaults
+    segments: List[RiskSurfaceSegment] = Field(default_factory=list)
+    context: RiskSurfaceContext = Field(default_factory=RiskSurfaceContext)
+    # Sweep axes; each defaults to every value
+    hours: Optional[List[int]] = Field(None, min_length=1)
+    weather: Optional[List[str]] = Field(None, min_length=1)
+    lighting: Optional[List[str]] = Field(None, min_length=1)
+
+
+class DepartureOption(BaseModel):
+    weather: str
+    lighting: str
+    hour: int
+    risk_score: float
+
+
+class RiskSurfaceResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    length_km: float
+    hours: List[int]
+    weather: List[str]
+    lighting: List[str]
+    # Speed limit each segment was scored at (rounded to the surface's speed step)
+    speed_limits: List[int]
+    # Route risk score (0-100) indexed [hour][weather][lighting]
+    risk_score: List[List[List[float]]]
+    # Route class probabilities, per class, indexed [hour][weather][lighting]
+    probabilities: Dict[str, List[List[List[float]]]]
+    # Lowest-risk hour for every weather x lighting scenario
+    best: List[DepartureOption]
+    source: str
+    model_version: Optional[str] = None
+
+
+class HotspotRouteRequest(BaseModel):
+    polyline: List[Tuple[float, float]] = Field(..., min_length=2, description="[lat, lon] points")
+    buffer_km: float = Field(1.0, gt=0, le=100)
+    min_accidents: int = Field(1, ge=1)
+
+
+class SegmentScore(BaseModel):
+    index: int
+    length_km: float
+    prediction: str
+    risk_score: float
+    probabilities: Dict[str, float]
+
+
+class RouteScoreResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    length_km: float
+    risk_score: float
+    max_segment_risk_score: float
+    highest_risk_segment: int
+    max_fatal_probability: Optional[float] = None
+    probabilities: Dict[str, float]
+    segments: List[SegmentScore]
+    model_version: Optional[str] = None
 
 
 def parse_minute(time_str: str) -> int:
@@ -82,65 +323,726 @@ def parse_minute(time_str: str) -> int:
         return 0
 
 
-def load_model() -> None:
-    global model_bundle, model_meta
-    if not MODEL_PATH.exists():
-        raise FileNotFoundError(f"Model not found at {MODEL_PATH}. Run train.py first.")
-    model_bundle = joblib.load(MODEL_PATH)
-    if META_PATH.exists():
-        model_meta = json.loads(META_PATH.read_text())
+def _columns_from_rows(rows: List[PredictionRequest]) -> Dict[str, List]:
+    return {
+        name: [getattr(row, name) for row in rows]
+        for name in PredictionRequest.model_fields
+    }
+
+
+def build_feature_matrix(columns: Dict[str, Optional[List]], encoder: FeatureEncoder) -> np.ndarray:
+    """Build the (n_rows, len(FEATURE_COLUMNS)) feature matrix for a columnar batch.
+
+    Each column is a list of per-row values or a single value shared by all rows.
+    The lists set the row count; with none there are no rows.
+    """
+    lengths = {len(values) for values in columns.values() if isinstance(values, list)}
+    if len(lengths) > 1:
+        raise HTTPException(status_code=422, detail="All columns must have the same length")
+    n_rows = lengths.pop() if lengths else 0
+    if n_rows == 0:
+        return np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float64)
+
+    # Scalar values (and missing columns) are broadcast to every row.
+    defaults = {name: field.default for name, field in PredictionRequest.model_fields.items()}
+    return encoder.transform(
+        {name: default if columns.get(name) is None else columns[name] for name, default in defaults.items()},
+        n_rows=n_rows,
+    )
+
+
+def _use_lean_artifact() -> bool:
+    if MODEL_BACKEND == "tree_eval":
+        return True
+    if MODEL_FORMAT != "auto":
+        return MODEL_FORMAT == "lean"
+    if not (LEAN_MODEL_PATH.exists() and LEAN_HEADER_PATH.exists()):
+        return False
+    return not MODEL_PATH.exists() or LEAN_MODEL_PATH.stat().st_mtime >= MODEL_PATH.stat().st_mtime
+
+
+def build_model() -> LoadedModel:
+    """Load the current artifacts from disk into a new, not yet published, snapshot."""
+    bundle = None
+    if _use_lean_artifact():
+        if MODEL_BACKEND == "tree_eval":
+            booster, header = load_tree_artifact(backend=TREE_EVAL_BACKEND)
+            source = LEAN_HEADER_PATH.with_name(header["tree_arrays"])
+        else:
+            booster, header = load_lean_artifact()
+            source = LEAN_MODEL_PATH
+        model_encoder = FeatureEncoder.from_header(booster, header)
+        content = header.get("model_fingerprint")
+    else:
+        if not MODEL_PATH.exists():
+            raise FileNotFoundError(f"Model not found at {MODEL_PATH}. Run train.py first.")
+        import joblib  # pulls in sklearn/pandas; only needed for the full bundle
+
+        bundle = joblib.load(MODEL_PATH)
+        source = MODEL_PATH
+        model_encoder = FeatureEncoder.from_bundle(bundle)
+        content = model_fingerprint(model_encoder.booster, model_encoder.mean, model_encoder.scale,
+                                    model_encoder.class_names)
+
+    fingerprint = file_fingerprint(source)
+    # Headers written before model_fingerprint existed: key the lookup table to the file
+    content = content or fingerprint
+    meta = json.loads(META_PATH.read_text()) if META_PATH.exists() else None
+    # tree_eval serves without xgboost; explanations load the same export's model.ubj on first use
+    if MODEL_BACKEND == "tree_eval":
+        explainer = Explainer(load=lambda: load_lean_artifact()[0])
+    else:
+        explainer = Explainer(model_encoder.booster)
+    risk_surface = None
+    if RISK_SURFACE_MODE:
+        risk_surface = RiskSurface(model_encoder, RiskSurfaceContext().model_dump(), RISK_SURFACE_SPEED_STEP)
+        if RISK_SURFACE_MODE == "precompute":
+            # Built before the snapshot is published, so a reload swaps in a complete surface
+            risk_surface.precompute()
+    drift = None
+    if DRIFT_ENABLED and meta and "drift_reference" in meta:
+        drift = DriftMonitor(meta["drift_reference"], model_encoder.mean, model_encoder.scale, DRIFT_WINDOW)
+    return LoadedModel(
+        version=fingerprint[:12],
+        source=source,
+        encoder=model_encoder,
+        meta=meta,
+        lookup_table=LookupTable.load(content, parse_hour),
+        bundle=bundle,
+        drift=drift,
+        explainer=explainer,
+        risk_surface=risk_surface,
+        model_fingerprint=content,
+    )
+
+
+registry = ModelRegistry(
+    build_model,
+    # A recompiled lookup table is picked up without a restart; its meta is written
+    # before the table, so only the table is watched
+    watched=[MODEL_PATH, LEAN_MODEL_PATH, LEAN_HEADER_PATH, TREES_PATH, META_PATH, TABLE_PATH],
+    poll_seconds=RELOAD_POLL_SECONDS,
+    on_swap=lambda model: (prediction_cache.clear(), explanation_cache.clear()),
+)
+
+
+def load_model() -> LoadedModel:
+    return registry.load()
+
+
+# (file stamp it was built from, index)
+_hotspot_state: Tuple[Tuple, Optional[HotspotIndex]] = ((), None)
+
+
+def hotspot_index() -> HotspotIndex:
+    """The hotspot index for the CSV as it is now; rebuilt (~50ms) after the file changes."""
+    global _hotspot_state
+    if not HOTSPOT_DATA_PATH:
+        raise HTTPException(status_code=404, detail="Hotspots are disabled (ML_HOTSPOT_DATA is empty)")
+    path = Path(HOTSPOT_DATA_PATH)
+    current = stamp([path])
+    built_from, index = _hotspot_state
+    if index is None or current != built_from:
+        if not current:
+            raise HTTPException(status_code=503, detail=f"Accident data not found at {path}")
+        index = HotspotIndex.from_csv(path, Geocoder.load(), cell_deg=HOTSPOT_CELL_DEG)
+        _hotspot_state = (current, index)
+    return index
+
+
+_stats_state: Tuple[Tuple, Optional[StatsCube]] = ((), None)
+
+
+def stats_cube() -> StatsCube:
+    """The statistics cube for the CSV as it is now; rebuilt after the file changes."""
+    global _stats_state
+    if not STATS_DATA_PATH:
+        raise HTTPException(status_code=404, detail="Statistics are disabled (ML_STATS_DATA is empty)")
+    path = Path(STATS_DATA_PATH)
+    current = stamp([path])
+    built_from, cube = _stats_state
+    if cube is None or current != built_from:
+        if not current:
+            raise HTTPException(status_code=503, detail=f"Accident data not found at {path}")
+        cube = StatsCube.from_csv(path, parse_hour, max_view_dims=STATS_VIEW_DIMS)
+        _stats_state = (current, cube)
+    return cube
+
+
+def current_model() -> LoadedModel:
+    model = registry.current
+    if model is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    return model
+
+
+def _to_response(
+    probabilities: Sequence[float], class_names: Tuple[str, ...], version: Optional[str] = None,
+) -> PredictionResponse:
+    best_index = max(range(len(probabilities)), key=probabilities.__getitem__)
+    return PredictionResponse(
+        prediction=class_names[best_index],
+        confidence=round(probabilities[best_index], 4),
+        probabilities={name: round(p, 4) for name, p in zip(class_names, probabilities)},
+        model_version=version,
+    )
+
+
+if PRELOAD:
+    load_model()
 
 
 @app.on_event("startup")
 def on_startup() -> None:
-    load_model()
+    if registry.current is None:
+        load_model()
+    if HOTSPOT_DATA_PATH and Path(HOTSPOT_DATA_PATH).exists():
+        hotspot_index()
+    if STATS_DATA_PATH and Path(STATS_DATA_PATH).exists():
+        stats_cube()
+    # The watcher and log threads are started per worker: threads do not survive a fork.
+    registry.start()
+    if prediction_log is not None:
+        prediction_log.start()
+
+
+@app.on_event("startup")
+async def start_batcher() -> None:
+    global batcher
+    if MICROBATCH_ENABLED:
+        # Each row is scored with the snapshot it was encoded for.
+        batcher = MicroBatcher(
+            score=lambda matrix, model: model.encoder.predict_encoded(matrix),
+            n_features=len(FEATURE_COLUMNS),
+            max_batch=MICROBATCH_MAX_BATCH,
+            max_wait_ms=MICROBATCH_WAIT_MS,
+        )
+        batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_batcher() -> None:
+    registry.stop()
+    if prediction_log is not None:
+        prediction_log.stop()
+    if batcher is not None:
+        await batcher.stop()
 
 
 @app.get("/health")
 def health() -> Dict:
-    acc = model_meta.get("test_accuracy", "unknown") if model_meta else "unknown"
-    return {"status": "ok", "test_accuracy": acc}
+    model = registry.current
+    acc = model.meta.get("test_accuracy", "unknown") if model and model.meta else "unknown"
+    result = {"status": "ok", "test_accuracy": acc, "model": registry.stats()}
+    if model is not None:
+        result["backend"] = getattr(model.encoder.booster, "backend", "xgboost")
+    if batcher is not None:
+        result["microbatch"] = batcher.stats()
+    if model is not None and model.lookup_table is not None:
+        result["lookup_table"] = model.lookup_table.stats()
+    elif model is not None and TABLE_META_PATH.exists():
+        result["lookup_table"] = {
+            "status": "stale",
+            "detail": f"{TABLE_PATH.name} was compiled for a different model; run lookup_table.py",
+        }
+    if prediction_cache.enabled:
+        result["cache"] = prediction_cache.stats()
+    if explanation_cache.enabled:
+        result["explanation_cache"] = explanation_cache.stats()
+    if prediction_log is not None:
+        result["prediction_log"] = prediction_log.stats()
+    if model is not None and model.risk_surface is not None:
+        result["risk_surface"] = dict(model.risk_surface.stats(), mode=RISK_SURFACE_MODE)
+    if _hotspot_state[1] is not None:
+        result["hotspots"] = _hotspot_state[1].stats()
+    if _stats_state[1] is not None:
+        result["stats_cube"] = _stats_state[1].stats()
+    return result
+
+
+def _collect_runtime_metrics() -> List:
+    """Scrape-time view of state kept elsewhere (registry, cache, lookup table, batcher)."""
+    collected = []
+    model = registry.current
+    info = Gauge("ml_model_info", "Model being served.", ("model_version", "source", "backend"))
+    if model is not None:
+        info.set(1, (model.version, model.source.name, getattr(model.encoder.booster, "backend", "xgboost")))
+    reloads = Counter("ml_model_reloads_total", "Model reloads by outcome.", ("outcome",))
+    reloads.inc(("ok",), registry.reloads)
+    reloads.inc(("failed",), registry.failed_reloads)
+    collected += [info, reloads]
+
+    if prediction_cache.enabled:
+        cache_events = Counter("ml_prediction_cache_events_total", "Prediction cache events.", ("event",))
+        for event in ("hits", "misses", "evictions", "expirations", "invalidations"):
+            cache_events.inc((event,), getattr(prediction_cache, event))
+        collected.append(cache_events)
+    if explanation_cache.enabled:
+        explain_events = Counter("ml_explanation_cache_events_total", "Explanation cache events.", ("event",))
+        for event in ("hits", "misses", "evictions", "expirations", "invalidations"):
+            explain_events.inc((event,), getattr(explanation_cache, event))
+        collected.append(explain_events)
+    if model is not None and model.lookup_table is not None:
+        lookups = Counter("ml_lookup_table_requests_total", "Lookup table queries.", ("result",))
+        lookups.inc(("hit",), model.lookup_table.hits)
+        lookups.inc(("miss",), model.lookup_table.misses)
+        collected.append(lookups)
+    if batcher is not None:
+        batched = Counter("ml_microbatch_items_total", "Rows scored by the micro-batcher.")
+        batched.inc((), batcher.items)
+        batches = Counter("ml_microbatch_batches_total", "Model calls made by the micro-batcher.")
+        batches.inc((), batcher.batches)
+        depth = Gauge("ml_microbatch_queue_depth", "Rows waiting for the micro-batcher.")
+        depth.set(batcher.queue_depth)
+        collected += [batched, batches, depth]
+    if prediction_log is not None:
+        logged = Counter("ml_prediction_log_rows_total", "Prediction log rows by outcome.", ("outcome",))
+        logged.inc(("written",), prediction_log.written)
+        logged.inc(("dropped",), prediction_log.dropped)
+        queued = Gauge("ml_prediction_log_queue_rows", "Rows waiting to be written to the prediction log.")
+        queued.set(prediction_log.queue_rows)
+        collected += [logged, queued]
+    if model is not None and model.drift is not None:
+        report = model.drift.report()
+        observed = Counter("ml_drift_observations_total", "Rows added to the drift sketches.")
+        observed.inc((), report["observed"])
+        collected.append(observed)
+        if report["status"] != "insufficient_data":
+            scores = Gauge("ml_drift_psi", "PSI of live traffic against the training reference.",
+                           ("group", "column"))
+            for group in ("features", "probabilities"):
+                for column, score in report[group].items():
+                    scores.set(score["psi"], (group, column))
+            collected.append(scores)
+    return collected
+
+
+metrics_registry.add_collector(_collect_runtime_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/metrics/stages")
+def set_stage_timing(enabled: bool) -> Dict:
+    stages.enabled = enabled
+    return {"stage_timing": stages.enabled}
+
+
+@app.get("/drift")
+def drift_report() -> Dict:
+    model = current_model()
+    if model.drift is None:
+        if not DRIFT_ENABLED:
+            raise HTTPException(status_code=404, detail="Drift monitoring is disabled (ML_DRIFT=0)")
+        raise HTTPException(status_code=404, detail="model_meta.json has no drift_reference")
+    return dict(model.drift.report(), model_version=model.version)
+
+
+@app.post("/drift/reset")
+def reset_drift() -> Dict:
+    model = current_model()
+    if model.drift is not None:
+        model.drift.reset()
+    return {"reset": model.drift is not None}
 
 
-@app.post("/predict", response_model=PredictionResponse)
 def predict(payload: PredictionRequest) -> PredictionResponse:
-    if model_bundle is None:
-        raise HTTPException(status_code=500, detail="Model not loaded")
+    started = stages.start()
+    model = current_model()
+    encoder = model.encoder
 
-    pipeline = model_bundle["pipeline"]
-    label_encoder = model_bundle["label_encoder"]
-
-    hour = parse_hour(payload.time_of_day)
-    minute = parse_minute(payload.time_of_day)
-    time_minutes = hour * 60 + minute
-
-    row = {
-        "weather_risk": WEATHER_RISK.get(payload.weather, 0),
-        "road_cond_risk": ROAD_COND_RISK.get(payload.road_condition, 0),
-        "lighting_risk": LIGHTING_RISK.get(payload.lighting, 0),
-        "road_type_risk": ROAD_TYPE_RISK.get(payload.road_type, 0),
-        "vehicle_risk": VEHICLE_RISK.get(payload.vehicle_type, 0),
-        "location_risk": LOCATION_RISK.get(payload.location_detail, 0),
-        "alcohol_risk": 0.14 if payload.alcohol == "Yes" else 0.0,
-        "license_risk": {"Valid": 0.0, "Expired": 0.03, "None": 0.06}.get(payload.license_status, 0),
-        "hour": hour,
-        "speed_limit": payload.speed_limit,
-        "driver_age": payload.driver_age,
-        "num_vehicles": payload.num_vehicles,
-    }
+    probabilities = model.lookup_table.lookup(payload) if model.lookup_table is not None else None
+    started = stages.lap("lookup_table", started)
+    if probabilities is not None:
+        if model.drift is not None or prediction_log is not None:
+            _record(model, encoder.encode_one(payload), probabilities)
+            started = stages.lap("record", started)
+        return _served(_to_response(probabilities.tolist(), encoder.class_names, model.version),
+                       "lookup_table", started)
 
-    data = pd.DataFrame([row])
+    encoded = encoder.encode_one(payload)
+    started = stages.lap("encode", started)
+    # The version keeps a request that straddles a reload from caching into the new model's entries
+    key = (model.version, encoded.tobytes())
+    cached = prediction_cache.get(key)
+    started = stages.lap("cache", started)
+    source = "cache"
+    if cached is None:
+        cached = tuple(encoder.predict_encoded(encoded)[0].tolist())
+        prediction_cache.put(key, cached)
+        started = stages.lap("model", started)
+        source = "model"
+    _record(model, encoded, cached)
+    started = stages.lap("record", started)
+    return _served(_to_response(cached, encoder.class_names, model.version), source, started)
 
-    probabilities = pipeline.predict_proba(data)[0]
-    best_index = int(probabilities.argmax())
-    label = label_encoder.inverse_transform([best_index])[0].lower()
 
-    result_probs: Dict[str, float] = {}
-    for idx, class_name in enumerate(label_encoder.classes_):
-        result_probs[class_name.lower()] = round(float(probabilities[idx]), 4)
+async def predict_microbatched(payload: PredictionRequest) -> PredictionResponse:
+    started = stages.start()
+    model = current_model()
+    encoder = model.encoder
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="Micro-batcher not running")
 
-    return PredictionResponse(
-        prediction=label,
-        confidence=round(float(probabilities[best_index]), 4),
-        probabilities=result_probs,
+    probabilities = model.lookup_table.lookup(payload) if model.lookup_table is not None else None
+    started = stages.lap("lookup_table", started)
+    if probabilities is not None:
+        if model.drift is not None or prediction_log is not None:
+            _record(model, encoder.encode_one(payload), probabilities)
+            started = stages.lap("record", started)
+        return _served(_to_response(probabilities.tolist(), encoder.class_names, model.version),
+                       "lookup_table", started)
+
+    row = encoder.encode(payload, np.empty(len(FEATURE_COLUMNS), dtype=np.float32))
+    started = stages.lap("encode", started)
+    key = (model.version, row.tobytes())
+    cached = prediction_cache.get(key)
+    started = stages.lap("cache", started)
+    source = "cache"
+    if cached is None:
+        cached = tuple((await batcher.submit(row, model)).tolist())
+        prediction_cache.put(key, cached)
+        started = stages.lap("microbatch", started)
+        source = "model"
+    _record(model, row, cached)
+    started = stages.lap("record", started)
+    return _served(_to_response(cached, encoder.class_names, model.version), source, started)
+
+
+def _record(model: LoadedModel, encoded: np.ndarray, probabilities: Sequence[float]) -> None:
+    """Feed one encoded request row to the drift monitor and the prediction log."""
+    if model.drift is not None:
+        model.drift.observe(encoded, probabilities)
+    if prediction_log is not None:
+        prediction_log.submit(model, encoded, probabilities)
+
+
+def _served(response: PredictionResponse, source: str, started: float) -> PredictionResponse:
+    stages.lap("response", started)
+    predictions_served.inc((response.model_version, response.prediction, source))
+    return response
+
+
+app.add_api_route(
+    "/predict",
+    predict_microbatched if MICROBATCH_ENABLED else predict,
+    methods=["POST"],
+    response_model=PredictionResponse,
+)
+
+
+@app.post("/predict_batch", response_model=BatchPredictionResponse)
+def predict_batch(
+    payload: Union[List[PredictionRequest], ColumnarPredictionRequest],
+) -> BatchPredictionResponse:
+    model = current_model()
+
+    if isinstance(payload, list):
+        columns = _columns_from_rows(payload)
+    else:
+        columns = payload.model_dump()
+    started = stages.start()
+    matrix = build_feature_matrix(columns, model.encoder)
+    started = stages.lap("build_features", started)
+    if len(matrix) == 0:
+        return BatchPredictionResponse(predictions=[])
+
+    encoded = model.encoder.scale_matrix(matrix)
+    probabilities = model.encoder.predict_encoded(encoded)
+    started = stages.lap("model", started)
+    if model.drift is not None:
+        model.drift.observe(encoded, probabilities)
+    if prediction_log is not None:
+        prediction_log.submit(model, matrix, probabilities, scaled=False)
+    started = stages.lap("record", started)
+    predictions = [
+        _to_response(probs, model.encoder.class_names, model.version) for probs in probabilities.tolist()
+    ]
+    stages.lap("response", started)
+    _count_predictions(model, probabilities, "batch")
+    return BatchPredictionResponse(predictions=predictions)
+
+
+def _count_predictions(model: LoadedModel, probabilities: np.ndarray, source: str) -> None:
+    counts = np.bincount(probabilities.argmax(axis=1), minlength=len(model.encoder.class_names))
+    for name, count in zip(model.encoder.class_names, counts.tolist()):
+        if count:
+            predictions_served.inc((model.version, name, source), count)
+
+
+def _explained_class(model: LoadedModel, class_name: Optional[str]) -> Optional[int]:
+    """Index of the requested class; None explains each row's predicted class."""
+    if class_name is None:
+        return None
+    names = model.encoder.class_names
+    if class_name.lower() not in names:
+        raise HTTPException(status_code=422, detail=f"Unknown class {class_name!r}; expected one of {', '.join(names)}")
+    return names.index(class_name.lower())
+
+
+def _explain_rows(model: LoadedModel, encoded: np.ndarray, approximate: bool) -> List[Tuple[Tuple, np.ndarray]]:
+    """(probabilities, contributions) per encoded row; cache misses are explained in one call."""
+    keys = [(model.version, approximate, row.tobytes()) for row in encoded]
+    results = [explanation_cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        rows = encoded[missing]
+        contributions = model.explainer.contributions(rows, approximate)
+        probabilities = model.encoder.predict_encoded(rows).tolist()
+        for i, probs, contribution in zip(missing, probabilities, contributions):
+            results[i] = (tuple(probs), contribution)
+            explanation_cache.put(keys[i], results[i])
+    return results
+
+
+def _to_explanation(
+    model: LoadedModel, encoded: np.ndarray, probabilities: Tuple, contributions: np.ndarray,
+    target: Optional[int], approximate: bool,
+) -> ExplanationResponse:
+    encoder = model.encoder
+    prediction = _to_response(probabilities, encoder.class_names, model.version)
+    explained = probabilities.index(max(probabilities)) if target is None else target
+    values = contributions[explained]
+    order = np.argsort(-np.abs(values[:-1]), kind="stable").tolist()
+    raw = (encoded.astype(np.float64) * encoder.scale + encoder.mean).tolist()
+    return ExplanationResponse(
+        **prediction.model_dump(),
+        explained_class=encoder.class_names[explained],
+        method="approximate" if approximate else "tree_shap",
+        base_value=round(float(values[-1]), 4),
+        contributions={encoder.feature_columns[i]: round(float(values[i]), 4) for i in order},
+        feature_values={name: round(value, 4) for name, value in zip(encoder.feature_columns, raw)},
     )
+
+
+@app.post("/explain", response_model=ExplanationResponse)
+def explain(payload: PredictionRequest, class_name: Optional[str] = None, approximate: bool = False) -> ExplanationResponse:
+    """Why the model predicts what it does: each engineered feature's contribution (SHAP value).
+
+    Explains the predicted class, or ``class_name`` (e.g. ``fatal``) if given.
+    ``approximate=true`` uses the cheaper path attribution instead of exact TreeSHAP.
+    """
+    started = stages.start()
+    model = current_model()
+    target = _explained_class(model, class_name)
+    encoded = model.encoder.encode_one(payload)
+    started = stages.lap("encode", started)
+    (probabilities, contributions), = _explain_rows(model, encoded, approximate)
+    started = stages.lap("explain", started)
+    response = _to_explanation(model, encoded[0], probabilities, contributions, target, approximate)
+    stages.lap("response", started)
+    return response
+
+
+@app.post("/explain_batch", response_model=BatchExplanationResponse)
+def explain_batch(
+    payload: Union[List[PredictionRequest], ColumnarPredictionRequest],
+    class_name: Optional[str] = None,
+    approximate: bool = False,
+) -> BatchExplanationResponse:
+    """``/explain`` for many rows, in the row or columnar form of ``/predict_batch``."""
+    model = current_model()
+    target = _explained_class(model, class_name)
+    columns = _columns_from_rows(payload) if isinstance(payload, list) else payload.model_dump()
+    started = stages.start()
+    encoded = model.encoder.scale_matrix(build_feature_matrix(columns, model.encoder))
+    started = stages.lap("build_features", started)
+    results = _explain_rows(model, encoded, approximate)
+    started = stages.lap("explain", started)
+    explanations = [
+        _to_explanation(model, row, probabilities, contributions, target, approximate)
+        for row, (probabilities, contributions) in zip(encoded, results)
+    ]
+    stages.lap("response", started)
+    return BatchExplanationResponse(explanations=explanations)
+
+
+@app.get("/explain/global")
+def global_importance() -> Dict:
+    """Mean |SHAP value| per feature, computed on hold-out rows at training time."""
+    model = current_model()
+    importance = (model.meta or {}).get("feature_importance")
+    if importance is None:
+        raise HTTPException(status_code=404, detail="model_meta.json has no feature_importance; re-run train.py")
+    return dict(importance, model_version=model.version)
+
+
+@app.post("/score_route", response_model=RouteScoreResponse)
+def score_route(payload: RouteScoreRequest) -> RouteScoreResponse:
+    model = current_model()
+    encoder = model.encoder
+
+    points = np.asarray(payload.polyline, dtype=np.float64)
+    n_segments = len(points) - 1
+    segments = payload.segments or [RouteSegment()]
+    if len(segments) == 1:
+        segments = segments * n_segments
+    if len(segments) != n_segments:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Expected {n_segments} segments for {len(points)} polyline points, got {len(segments)}",
+        )
+
+    started = stages.start()
+    columns: Dict = payload.context.model_dump()
+    columns.update({
+        "road_type": [s.road_type for s in segments],
+        "speed_limit": [s.speed_limit for s in segments],
+        "location_detail": [s.location_detail for s in segments],
+        "road_condition": [s.road_condition or payload.context.road_condition for s in segments],
+    })
+    matrix = build_feature_matrix(columns, encoder)
+    started = stages.lap("build_features", started)
+    probabilities = encoder.predict_matrix(matrix)
+    started = stages.lap("model", started)
+    lengths = segment_lengths_km(points)
+    route_probs, risk, summary = aggregate_route(probabilities, lengths, encoder.class_names)
+    started = stages.lap("aggregate", started)
+
+    class_names = encoder.class_names
+    best = probabilities.argmax(axis=1).tolist()
+    segment_scores = [
+        SegmentScore(
+            index=i,
+            length_km=round(length, 3),
+            prediction=class_names[best[i]],
+            risk_score=round(r * 100, 2),
+            probabilities={name: round(p, 4) for name, p in zip(class_names, probs)},
+        )
+        for i, (length, r, probs) in enumerate(zip(lengths.tolist(), risk.tolist(), probabilities.tolist()))
+    ]
+    response = RouteScoreResponse(
+        **summary, probabilities=route_probs, segments=segment_scores, model_version=model.version,
+    )
+    stages.lap("response", started)
+    return response
+
+
+@app.post("/risk_surface", response_model=RiskSurfaceResponse)
+def risk_surface(payload: RiskSurfaceRequest) -> RiskSurfaceResponse:
+    """Route risk for every departure hour under each weather and lighting scenario.
+
+    Answered by slicing the model's precomputed surfaces; a context other than the
+    defaults is scored on the fly, one batched model call per road bucket.
+    """
+    model = current_model()
+    if model.risk_surface is None:
+        raise HTTPException(status_code=404, detail="Risk surfaces are disabled (ML_RISK_SURFACE is empty)")
+    points = np.asarray(payload.polyline, dtype=np.float64)
+    n_segments = len(points) - 1
+    segments = payload.segments or [RiskSurfaceSegment()]
+    if len(segments) == 1:
+        segments = segments * n_segments
+    if len(segments) != n_segments:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Expected {n_segments} segments for {len(points)} polyline points, got {len(segments)}",
+        )
+
+    started = stages.start()
+    surface = model.risk_surface
+    source = "precomputed" if RISK_SURFACE_MODE == "precompute" else "lazy"
+    context = payload.context.model_dump()
+    if context != surface.context:
+        surface = RiskSurface(model.encoder, context, surface.speed_step)
+        source = "context"
+    if payload.hours is not None and not all(0 <= hour < 24 for hour in payload.hours):
+        raise HTTPException(status_code=422, detail="hours must be between 0 and 23")
+    try:
+        hours = index_of(payload.hours, range(24), "hour")
+        weather = index_of(payload.weather, surface.weather, "weather")
+        lighting = index_of(payload.lighting, surface.lighting, "lighting")
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    buckets = [surface.bucket(s.road_type, s.location_detail, s.speed_limit) for s in segments]
+    blocks = surface.surfaces(buckets)
+    started = stages.lap("surface", started)
+
+    # (segments, hours, weather, lighting, classes), weighted by segment length like /score_route
+    swept = blocks[np.ix_(range(len(buckets)), hours, weather, lighting)]
+    lengths = segment_lengths_km(points)
+    total_km = float(lengths.sum())
+    weights = lengths / total_km if total_km > 0 else np.full(n_segments, 1.0 / n_segments)
+    route = np.tensordot(weights, swept, axes=1)
+    risk = np.tensordot(weights, segment_risk(swept, model.encoder.class_names), axes=1) * 100
+    best_hour = risk.argmin(axis=0)
+    best = [
+        DepartureOption(
+            weather=surface.weather[w], lighting=surface.lighting[k],
+            hour=hours[int(best_hour[i, j])], risk_score=round(float(risk[best_hour[i, j], i, j]), 2),
+        )
+        for i, w in enumerate(weather) for j, k in enumerate(lighting)
+    ]
+    response = RiskSurfaceResponse(
+        length_km=round(total_km, 3),
+        hours=hours,
+        weather=[surface.weather[w] for w in weather],
+        lighting=[surface.lighting[k] for k in lighting],
+        speed_limits=[int(surface.speeds[b[2]]) for b in buckets],
+        risk_score=np.round(risk, 2).tolist(),
+        probabilities={
+            name: np.round(route[..., c], 4).tolist() for c, name in enumerate(model.encoder.class_names)
+        },
+        best=best,
+        source=source,
+        model_version=model.version,
+    )
+    stages.lap("response", started)
+    return response
+
+
+@app.get("/hotspots")
+def hotspots_in_bbox(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float, min_accidents: int = 1,
+) -> Dict:
+    """Accident counts per grid cell inside a bounding box."""
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=422, detail="min_lat/min_lon must not exceed max_lat/max_lon")
+    return hotspot_index().bbox(min_lat, min_lon, max_lat, max_lon, min_accidents)
+
+
+@app.post("/hotspots")
+def hotspots_near_route(payload: HotspotRouteRequest) -> Dict:
+    """Accident counts per grid cell within ``buffer_km`` of a polyline."""
+    return hotspot_index().near_polyline(
+        np.asarray(payload.polyline, dtype=np.float64), payload.buffer_km, payload.min_accidents,
+    )
+
+
+def _values(param: Optional[str]) -> Optional[List[str]]:
+    return [v.strip() for v in param.split(",") if v.strip()] if param else None
+
+
+@app.get("/stats")
+def accident_stats(
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    month: Optional[str] = None,
+    day_of_week: Optional[str] = None,
+    hour: Optional[str] = None,
+    weather: Optional[str] = None,
+    road_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    group_by: Optional[str] = None,
+    limit: int = 100,
+) -> Dict:
+    """Accident count, fatalities and casualties for any filter / group-by combination.
+
+    Filters take comma-separated values (``weather=Rainy,Foggy``); ``group_by``
+    names comma-separated dimensions (``group_by=month,severity``).
+    """
+    if limit < 1:
+        raise HTTPException(status_code=422, detail="limit must be at least 1")
+    filters = {
+        "state": state, "city": city, "month": month, "day_of_week": day_of_week,
+        "hour": hour, "weather": weather, "road_type": road_type, "severity": severity,
+    }
+    try:
+        return stats_cube().query(
+            {name: _values(value) for name, value in filters.items()}, _values(group_by) or [], limit,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
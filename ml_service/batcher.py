@@ -0,0 +1,136 @@
+"""
+Opt-in async micro-batcher for /predict.
+
+Requests are queued as already-encoded feature rows, each tagged with the
+model it was encoded for. A single worker collects whatever arrives within
+``max_wait_ms`` (or until ``max_batch`` rows are waiting), scores the batch with
+one model call on a dedicated thread and resolves each caller's future. Under
+load, many tiny booster invocations turn into a few large ones. A batch that
+straddles a model reload is scored with one call per model.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Upper bounds of the batch-size histogram buckets (last bucket is open-ended)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        score: Callable[[np.ndarray, Any], np.ndarray],
+        n_features: int,
+        max_batch: int = 64,
+        max_wait_ms: float = 2.0,
+    ) -> None:
+        self.score = score
+        self.n_features = n_features
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="microbatch")
+
+        self.batches = 0
+        self.items = 0
+        self.max_queue_depth = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, row: np.ndarray, model: Any = None) -> np.ndarray:
+        """Queue one encoded feature row and wait for ``score(rows, model)``'s probabilities."""
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher.start() has not been called")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, model, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Whatever is already waiting joins this batch rather than the next one.
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            groups: Dict[int, Tuple[Any, List[Tuple[np.ndarray, Any, asyncio.Future]]]] = {}
+            for item in batch:
+                groups.setdefault(id(item[1]), (item[1], []))[1].append(item)
+            for model, items in groups.values():
+                await self._score(loop, model, items)
+
+    async def _score(
+        self, loop: asyncio.AbstractEventLoop, model: Any, items: List[Tuple[np.ndarray, Any, asyncio.Future]],
+    ) -> None:
+        matrix = np.empty((len(items), self.n_features), dtype=np.float32)
+        for i, (row, _, _) in enumerate(items):
+            matrix[i] = row
+        self._record(len(items))
+        try:
+            probabilities = await loop.run_in_executor(self._executor, self.score, matrix, model)
+        except Exception as exc:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for i, (_, _, future) in enumerate(items):
+            if not future.done():
+                future.set_result(probabilities[i])
+
+    def _record(self, size: int) -> None:
+        self.batches += 1
+        self.items += size
+        for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                self.batch_size_counts[i] += 1
+                return
+        self.batch_size_counts[-1] += 1
+
+    def stats(self) -> Dict:
+        labels = [f"<={bound}" for bound in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": dict(zip(labels, self.batch_size_counts)),
+        }
@@ -0,0 +1,54 @@
+"""
+Feature-building cost: CSV parsing, ``build_dataset``, and a warm load from
+the feature cache (into a throwaway cache directory).
+"""
+from __future__ import annotations
+
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+import common  # noqa: F401  (puts ml_service/ on sys.path)
+
+
+def run(quick: bool = False) -> Dict[str, float]:
+    import pandas as pd
+
+    from feature_cache import load_dataset
+    from features import READ_CSV_OPTIONS
+    from train import DATA_PATH, build_dataset
+
+    repeats = 1 if quick else 3
+    read_s, build_s, cold_s, warm_s = [], [], [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = pd.read_csv(DATA_PATH, **READ_CSV_OPTIONS)
+        read_s.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        build_dataset(df)
+        build_s.append(time.perf_counter() - start)
+
+        with tempfile.TemporaryDirectory(prefix="bench-features-") as cache_dir:
+            start = time.perf_counter()
+            load_dataset(DATA_PATH, Path(cache_dir))
+            cold_s.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            features, _, _, _ = load_dataset(DATA_PATH, Path(cache_dir))
+            np.asarray(features.to_numpy()).sum()  # touch the mapped pages
+            warm_s.append(time.perf_counter() - start)
+
+    return {
+        "rows": len(df),
+        "read_csv_s": round(float(np.median(read_s)), 4),
+        "build_dataset_s": round(float(np.median(build_s)), 4),
+        "cache_miss_s": round(float(np.median(cold_s)), 4),
+        "cache_hit_s": round(float(np.median(warm_s)), 4),
+    }
+
+
+if __name__ == "__main__":
+    print(run())
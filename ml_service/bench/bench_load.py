@@ -0,0 +1,469 @@
+"""
+Load and soak test: the app running under uvicorn, driven over HTTP from a
+pool of client processes.
+
+    python bench/bench_load.py --workers 1,2,4 --concurrency 1,8,32,64 --duration 20
+    python bench/bench_load.py --workers 2 --server-cpus 0-1 --output /tmp/load.json
+    python bench/run.py load                # the fixed quick scenario, compared like any suite
+
+For each worker count the harness starts ``uvicorn app:app --workers N`` on a
+free local port and waits for /health. It then runs one scenario per
+concurrency level against ``/predict``, plus ``/predict_batch`` with
+``--batch-rows``-row bodies. Every scenario is closed-loop. ``--clients``
+processes each run their share of the concurrency as asyncio tasks over one
+keep-alive httpx client, and each task sends its next request as soon as the
+previous one returns. Requests that finish during the warm-up or after the
+window are not counted.
+
+Results are comparable across commits because:
+
+* the payloads come from ``generate_data.generate_row`` with a fixed seed and
+  are split between client processes the same way on every run;
+* the server is started with the same environment every time. The prediction
+  cache is off, so every request is scored, and prediction logs go to a
+  temporary directory. ``--env`` overrides either;
+* the report records the commit, the environment and every setting.
+
+While a scenario runs, the server's processes (the uvicorn supervisor and its
+workers) are sampled from /proc for CPU and RSS. Reported per scenario:
+requests/s, latency p50/p95/p99/max, errors and error rate, mean server CPU
+(100 = one core busy) and peak server RSS. The report also holds the full
+timeline. The saturation point of a worker count is the lowest concurrency
+whose throughput is within ``SATURATION_MARGIN`` of the best one. Past it,
+extra load only adds latency.
+
+The clients share the machine with the server. Unless ``--server-cpus`` pins
+the server to its own cores, client CPU counts against the server's
+throughput.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from common import BASE, sample_payloads
+
+PAYLOAD_SEED = 7
+PAYLOAD_COUNT = 2000
+DEFAULT_BATCH_ROWS = 64
+REQUEST_TIMEOUT_SECONDS = 30.0
+SERVER_START_TIMEOUT_SECONDS = 120.0
+# Time allowed for the client processes to import and connect before the shared start
+CLIENT_START_GRACE_SECONDS = 2.0
+SAMPLE_INTERVAL_SECONDS = 0.5
+# Throughput within this fraction of the best counts as saturated
+SATURATION_MARGIN = 0.05
+
+# Server environment for every run: score every request, keep logs out of the tree
+SERVER_ENV = {
+    "ML_CACHE_SIZE": "0",
+    "ML_RELOAD_POLL_SECONDS": "0",
+}
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_cpus(spec: str) -> Set[int]:
+    """CPU list like ``0-1,4`` -> {0, 1, 4}."""
+    cpus: Set[int] = set()
+    for part in spec.split(","):
+        low, _, high = part.partition("-")
+        cpus.update(range(int(low), int(high or low) + 1))
+    return cpus
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE,
+                                capture_output=True, text=True, timeout=10)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class Server:
+    """``uvicorn app:app`` in its own process group, stopped on exit."""
+
+    def __init__(self, workers: int, env: Dict[str, str], cpus: Optional[Set[int]] = None) -> None:
+        self.workers = workers
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._log_dir = tempfile.TemporaryDirectory(prefix="load_predictions_")
+        self.env = {"ML_PREDICTION_LOG_DIR": self._log_dir.name, **SERVER_ENV, **env}
+        self.cpus = cpus
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self) -> float:
+        """Start the server and wait for /health; return the start-up time in seconds."""
+        import httpx
+
+        command = [
+            sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(self.port),
+            "--workers", str(self.workers), "--log-level", "warning", "--no-access-log",
+        ]
+        cpus = self.cpus
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            command, cwd=BASE, env={**os.environ, **self.env}, start_new_session=True,
+            preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus else None,
+        )
+        deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {self.process.returncode} during start-up")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1.0).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Server did not answer /health within {SERVER_START_TIMEOUT_SECONDS:.0f}s")
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            os.killpg(self.process.pid, 15)
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, 9)
+                self.process.wait()
+        self._log_dir.cleanup()
+
+    def __enter__(self) -> "Server":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _read_process(pid: int) -> Optional[Tuple[int, int, float]]:
+    """(parent pid, CPU ticks used, RSS in MB) of a live process."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces; the fields after it do not
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+    except (OSError, StopIteration, IndexError):
+        return None
+    return int(fields[1]), int(fields[11]) + int(fields[12]), rss_kb / 1024
+
+
+class ProcessSampler(threading.Thread):
+    """Samples CPU and RSS of a process tree from /proc every ``interval`` seconds.
+
+    Each sample is ``{"t", "cpu_percent", "rss_mb", "processes"}``, with ``t`` in
+    ``time.time()`` seconds. ``cpu_percent`` is the tree's CPU use since the
+    previous sample, where 100 means one core busy.
+    """
+
+    def __init__(self, root_pid: int, interval: float = SAMPLE_INTERVAL_SECONDS) -> None:
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.samples: List[Dict] = []
+        self._done = threading.Event()
+
+    def _tree(self) -> Dict[int, Tuple[int, float]]:
+        table = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                info = _read_process(int(entry))
+                if info is not None:
+                    table[int(entry)] = info
+        members, frontier = {}, [self.root_pid]
+        while frontier:
+            pid = frontier.pop()
+            if pid in table and pid not in members:
+                members[pid] = table[pid][1:]
+                frontier.extend(child for child, info in table.items() if info[0] == pid)
+        return members
+
+    def run(self) -> None:
+        previous_time, previous_ticks = time.time(), None
+        while not self._done.wait(self.interval):
+            tree = self._tree()
+            now = time.time()
+            ticks = {pid: used for pid, (used, _) in tree.items()}
+            if previous_ticks is not None:
+                # Only processes present in both samples: a new worker's ticks are not all recent
+                used = sum(ticks[pid] - previous_ticks[pid] for pid in ticks if pid in previous_ticks)
+                self.samples.append({
+                    "t": round(now, 3),
+                    "cpu_percent": round(100.0 * used / CLOCK_TICKS / (now - previous_time), 1),
+                    "rss_mb": round(sum(rss for _, rss in tree.values()), 1),
+                    "processes": len(tree),
+                })
+            previous_time, previous_ticks = now, ticks
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+    def window(self, start: float, end: float) -> List[Dict]:
+        return [sample for sample in self.samples if start <= sample["t"] <= end]
+
+
+# ---------------------------------------------------------------------------
+# Clients
+# ---------------------------------------------------------------------------
+
+async def _drive(url: str, path: str, bodies: Sequence, tasks: int,
+                 start_at: float, measure_from: float, stop_at: float) -> Dict:
+    import httpx
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=tasks, max_keepalive_connections=tasks)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+
+        async def loop(offset: int) -> None:
+            i = offset
+            while time.time() < stop_at:
+                body = bodies[i % len(bodies)]
+                i += tasks
+                sent_at, started = time.time(), time.perf_counter()
+                try:
+                    status = (await client.post(path, json=body)).status_code
+                    error = None if status == 200 else str(status)
+                except httpx.HTTPError as exc:
+                    error = type(exc).__name__
+                elapsed = time.perf_counter() - started
+                if sent_at < measure_from or sent_at + elapsed > stop_at:
+                    continue
+                if error is None:
+                    latencies.append(elapsed)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+
+        await asyncio.gather(*(loop(k) for k in range(tasks)))
+    return {"latencies": latencies, "errors": errors}
+
+
+def _client(args: Tuple) -> Dict:
+    url, path, bodies, tasks, start_at, measure_from, stop_at, cpus = args
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    return asyncio.run(_drive(url, path, bodies, tasks, start_at, measure_from, stop_at))
+
+
+def _split(total: int, parts: int) -> List[int]:
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+
+def run_scenario(pool, clients: int, server: Server, sampler: ProcessSampler, path: str, bodies: List,
+                 concurrency: int, warmup: float, duration: float,
+                 rows_per_request: int = 1, client_cpus: Optional[Set[int]] = None) -> Dict:
+    """One closed-loop scenario; the pool's processes share ``concurrency`` tasks."""
+    shares = [share for share in _split(concurrency, clients) if share]
+    start_at = time.time() + CLIENT_START_GRACE_SECONDS
+    measure_from, stop_at = start_at + warmup, start_at + warmup + duration
+    jobs = []
+    for index, tasks in enumerate(shares):
+        # Every client starts at its own fixed offset into the same payload sequence
+        offset = index * len(bodies) // len(shares)
+        jobs.append((server.url, path, bodies[offset:] + bodies[:offset], tasks,
+                     start_at, measure_from, stop_at, client_cpus))
+    outcomes = pool.map(_client, jobs)
+
+    latencies_us = np.array([x for outcome in outcomes for x in outcome["latencies"]]) * 1e6
+    errors: Dict[str, int] = {}
+    for outcome in outcomes:
+        for kind, count in outcome["errors"].items():
+            errors[kind] = errors.get(kind, 0) + count
+    ok, failed = len(latencies_us), sum(errors.values())
+    samples = sampler.window(measure_from, stop_at)
+    result = {
+        "path": path,
+        "concurrency": concurrency,
+        "rows_per_request": rows_per_request,
+        "requests": ok + failed,
+        "requests_per_s": round(ok / duration, 1),
+        "rows_per_s": round(ok * rows_per_request / duration, 1),
+        "request_errors": failed,
+        "error_rate": round(failed / (ok + failed), 4) if ok + failed else 0.0,
+        "errors_by_kind": errors,
+        "server_cpu_percent": round(float(np.mean([s["cpu_percent"] for s in samples])), 1) if samples else None,
+        "server_peak_rss_mb": max((s["rss_mb"] for s in samples), default=None),
+    }
+    if ok:
+        p50, p95, p99 = np.percentile(latencies_us, [50, 95, 99])
+        result.update(p50_us=round(float(p50), 1), p95_us=round(float(p95), 1),
+                      p99_us=round(float(p99), 1), max_us=round(float(latencies_us.max()), 1))
+    return result
+
+
+def saturation(results: List[Dict]) -> Dict:
+    """The lowest-concurrency result within SATURATION_MARGIN of the best throughput."""
+    best = max(result["requests_per_s"] for result in results)
+    knee = min((r for r in results if r["requests_per_s"] >= (1 - SATURATION_MARGIN) * best),
+               key=lambda r: r["concurrency"])
+    return {"concurrency": knee["concurrency"], "requests_per_s": knee["requests_per_s"],
+            "p99_us": knee.get("p99_us"), "best_requests_per_s": best}
+
+
+# ---------------------------------------------------------------------------
+# Runs
+# ---------------------------------------------------------------------------
+
+def run_load(
+    workers: Sequence[int],
+    concurrency: Sequence[int],
+    duration: float,
+    warmup: float,
+    clients: int,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    batch_concurrency: Optional[Sequence[int]] = None,
+    env: Optional[Dict[str, str]] = None,
+    server_cpus: Optional[Set[int]] = None,
+) -> Dict:
+    """Run every scenario for every worker count; return the full report."""
+    payloads = sample_payloads(PAYLOAD_COUNT, seed=PAYLOAD_SEED)
+    batches = [payloads[i:i + batch_rows] for i in range(0, len(payloads) - batch_rows + 1, batch_rows)]
+    batch_concurrency = list(batch_concurrency or [max(1, min(concurrency))])
+    client_cpus = None
+    if server_cpus:
+        # Keep the clients off the server's cores when there are cores to spare
+        client_cpus = (os.sched_getaffinity(0) - server_cpus) or None
+    clients = max(1, min(clients, max(list(concurrency) + batch_concurrency)))
+
+    report: Dict = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "settings": {
+            "workers": list(workers), "concurrency": list(concurrency), "duration_s": duration,
+            "warmup_s": warmup, "clients": clients, "batch_rows": batch_rows,
+            "batch_concurrency": batch_concurrency, "payload_seed": PAYLOAD_SEED,
+            "payloads": PAYLOAD_COUNT, "server_env": {**SERVER_ENV, **(env or {})},
+            "server_cpus": sorted(server_cpus) if server_cpus else None,
+        },
+        "environment": {"cpu_count": os.cpu_count(), "available_cpus": len(os.sched_getaffinity(0))},
+        "runs": [],
+    }
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(clients) as pool:
+        for n_workers in workers:
+            print(f"Starting uvicorn with {n_workers} worker(s)...", flush=True)
+            server = Server(n_workers, env or {}, server_cpus)
+            startup = server.start()
+            sampler = ProcessSampler(server.process.pid)
+            sampler.start()
+            run: Dict = {"workers": n_workers, "startup_s": round(startup, 2), "scenarios": []}
+            try:
+                for level in concurrency:
+                    result = run_scenario(pool, clients, server, sampler, "/predict", payloads, level,
+                                          warmup, duration, client_cpus=client_cpus)
+                    run["scenarios"].append(result)
+                    _print(n_workers, result)
+                for level in batch_concurrency:
+                    result = run_scenario(pool, clients, server, sampler, "/predict_batch", batches, level,
+                                          warmup, duration, rows_per_request=batch_rows, client_cpus=client_cpus)
+                    run["scenarios"].append(result)
+                    _print(n_workers, result)
+            finally:
+                sampler.stop()
+                server.stop()
+            run["saturation"] = saturation([r for r in run["scenarios"] if r["path"] == "/predict"])
+            run["timeline"] = sampler.samples
+            report["runs"].append(run)
+            knee = run["saturation"]
+            print(f"  saturates at concurrency {knee['concurrency']}: {knee['requests_per_s']} req/s "
+                  f"(p99 {knee['p99_us']} us)", flush=True)
+    return report
+
+
+def _print(workers: int, result: Dict) -> None:
+    print(f"  w={workers} {result['path']:<14} c={result['concurrency']:<4} "
+          f"{result['requests_per_s']:>8} req/s {result['rows_per_s']:>9} rows/s  "
+          f"p50 {result.get('p50_us')} p99 {result.get('p99_us')} us  errors {result['request_errors']}  "
+          f"cpu {result['server_cpu_percent']}%  rss {result['server_peak_rss_mb']} MB", flush=True)
+
+
+def _scenario_name(result: Dict) -> str:
+    return f"{result['path'].strip('/')}.c{result['concurrency']}"
+
+
+def flat_metrics(report: Dict) -> Dict[str, object]:
+    """bench/run.py metrics: ``w<workers>.<endpoint>.c<concurrency>.<metric>``."""
+    metrics: Dict[str, object] = {}
+    for run in report["runs"]:
+        prefix = f"w{run['workers']}"
+        metrics[f"{prefix}.startup_s"] = run["startup_s"]
+        for result in run["scenarios"]:
+            name = f"{prefix}.{_scenario_name(result)}"
+            for key in ("requests_per_s", "rows_per_s", "p50_us", "p95_us", "p99_us",
+                        "request_errors", "server_cpu_percent", "server_peak_rss_mb"):
+                if result.get(key) is not None:
+                    metrics[f"{name}.{key}"] = result[key]
+        metrics[f"{prefix}.predict.saturation_requests_per_s"] = run["saturation"]["requests_per_s"]
+        metrics[f"{prefix}.predict.saturation_concurrency"] = run["saturation"]["concurrency"]
+    return metrics
+
+
+def run(quick: bool = False) -> Dict[str, object]:
+    """The fixed scenario for bench/run.py: one worker, a short concurrency sweep."""
+    if quick:
+        report = run_load([1], [1, 8], duration=3.0, warmup=1.0, clients=2, batch_concurrency=[2])
+    else:
+        report = run_load([1], [1, 8, 32], duration=10.0, warmup=3.0, clients=2, batch_concurrency=[4])
+    return flat_metrics(report)
+
+
+def _ints(spec: str) -> List[int]:
+    return [int(value) for value in spec.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the prediction service under uvicorn.")
+    parser.add_argument("--workers", type=_ints, default=[1], help="uvicorn worker counts, e.g. 1,2,4")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 4, 16, 64],
+                        help="in-flight /predict requests per scenario")
+    parser.add_argument("--batch-concurrency", type=_ints, default=None,
+                        help="in-flight /predict_batch requests (default: the lowest --concurrency)")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="client processes")
+    parser.add_argument("--server-cpus", type=parse_cpus, default=None,
+                        help="pin the server to these CPUs (e.g. 0-1); clients use the rest")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra server environment, e.g. ML_CACHE_SIZE=10000 or ML_MICROBATCH=1")
+    parser.add_argument("--output", type=Path, default=Path(__file__).resolve().parent / "load_results.json")
+    args = parser.parse_args()
+
+    env = dict(item.split("=", 1) for item in args.env)
+    report = run_load(args.workers, args.concurrency, args.duration, args.warmup, args.clients,
+                      args.batch_rows, args.batch_concurrency, env, args.server_cpus)
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Prediction latency and throughput, in-process and through the FastAPI app.
+
+* ``single.encoder``: ``FeatureEncoder.predict_one``, the model path of /predict.
+* ``single.handler``: the /predict handler as deployed (lookup table included),
+  with the prediction cache disabled so every call is scored.
+* ``single.pipeline``: the original dict -> DataFrame -> Pipeline path, for
+  reference (needs model.joblib). Its responses are checked against the encoder.
+* ``batch``: ``build_feature_matrix`` + ``predict_matrix`` on BATCH_ROWS rows.
+* ``http.*``: the same requests through the ASGI app (routing, validation and
+  serialization included) with Starlette's TestClient.
+"""
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+
+from common import percentiles, sample_payloads, time_calls
+
+BATCH_ROWS = 256
+
+
+def _pipeline_predict(bundle: Dict, app, payload) -> Dict:
+    """The pre-encoder request path: dict -> DataFrame -> Pipeline -> LabelEncoder."""
+    import pandas as pd
+
+    from features import (
+        LICENSE_RISK, LIGHTING_RISK, LOCATION_RISK, ROAD_COND_RISK, ROAD_TYPE_RISK, VEHICLE_RISK,
+        WEATHER_RISK, parse_hour,
+    )
+
+    pipeline = bundle["pipeline"]
+    label_encoder = bundle["label_encoder"]
+    row = {
+        "weather_risk": WEATHER_RISK.get(payload.weather, 0),
+        "road_cond_risk": ROAD_COND_RISK.get(payload.road_condition, 0),
+        "lighting_risk": LIGHTING_RISK.get(payload.lighting, 0),
+        "road_type_risk": ROAD_TYPE_RISK.get(payload.road_type, 0),
+        "vehicle_risk": VEHICLE_RISK.get(payload.vehicle_type, 0),
+        "location_risk": LOCATION_RISK.get(payload.location_detail, 0),
+        "alcohol_risk": 0.14 if payload.alcohol == "Yes" else 0.0,
+        "license_risk": LICENSE_RISK.get(payload.license_status, 0),
+        "hour": parse_hour(payload.time_of_day),
+        "speed_limit": payload.speed_limit,
+        "driver_age": payload.driver_age,
+        "num_vehicles": payload.num_vehicles,
+    }
+    probabilities = pipeline.predict_proba(pd.DataFrame([row]))[0]
+    best_index = int(probabilities.argmax())
+    return {
+        "prediction": label_encoder.inverse_transform([best_index])[0].lower(),
+        "confidence": round(float(probabilities[best_index]), 4),
+        "probabilities": {
+            name.lower(): round(float(probabilities[i]), 4)
+            for i, name in enumerate(label_encoder.classes_)
+        },
+    }
+
+
+def run(quick: bool = False) -> Dict[str, float]:
+    import app
+    from cache import PredictionCache
+    from encoder import FeatureEncoder
+    from fastapi.testclient import TestClient
+
+    n_payloads, repeats, batch_repeats = (200, 2, 10) if quick else (500, 4, 40)
+    app.prediction_cache = PredictionCache(max_size=0)  # score every call, no cache hits
+    model = app.load_model()
+    bodies = sample_payloads(n_payloads)
+    requests = [app.PredictionRequest(**body) for body in bodies]
+
+    metrics: Dict[str, float] = {"model_source": model.source.name}
+    metrics.update(percentiles("single.encoder", time_calls(model.encoder.predict_one, requests, repeats)))
+    metrics.update(percentiles("single.handler", time_calls(app.predict, requests, repeats)))
+
+    batch_bodies = (bodies * (BATCH_ROWS // len(bodies) + 1))[:BATCH_ROWS]
+    columns = {name: [body[name] for body in batch_bodies] for name in batch_bodies[0]}
+
+    def score_batch(_) -> np.ndarray:
+        return model.encoder.predict_matrix(app.build_feature_matrix(columns, model.encoder))
+
+    batch_us = time_calls(score_batch, range(batch_repeats))
+    metrics.update(percentiles("batch", batch_us))
+    metrics["batch.rows_per_s"] = round(BATCH_ROWS / (float(np.median(batch_us)) / 1e6), 1)
+
+    if app.MODEL_PATH.exists():
+        import joblib
+
+        bundle = joblib.load(app.MODEL_PATH)
+        reference = FeatureEncoder.from_bundle(bundle)
+        pipeline_requests = requests[:max(50, n_payloads // 5)]
+        metrics["pipeline_parity_mismatches"] = sum(
+            _pipeline_predict(bundle, app, r) != app._to_response(
+                reference.predict_one(r).tolist(), reference.class_names
+            ).model_dump(exclude={"model_version"})
+            for r in pipeline_requests
+        )
+        metrics.update(percentiles(
+            "single.pipeline", time_calls(lambda r: _pipeline_predict(bundle, app, r), pipeline_requests),
+        ))
+
+    with TestClient(app.app) as client:
+        metrics.update(percentiles(
+            "http.predict", time_calls(lambda body: client.post("/predict", json=body), bodies, repeats),
+        ))
+        http_batch_us = time_calls(
+            lambda _: client.post("/predict_batch", json=columns), range(batch_repeats),
+        )
+        metrics.update(percentiles("http.predict_batch", http_batch_us))
+        metrics["http.predict_batch.rows_per_s"] = round(
+            BATCH_ROWS / (float(np.median(http_batch_us)) / 1e6), 1,
+        )
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
@@ -0,0 +1,78 @@
+"""
+Cold start: ``import app`` + ``load_model()`` in a fresh interpreter, for the
+joblib bundle, the lean artifact (model.ubj) and the flattened trees
+(model_trees.npz). Import cost of pandas/sklearn/joblib/xgboost is included.
+Variants whose artifacts are missing are skipped.
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from typing import Dict
+
+import numpy as np
+
+from common import BASE
+
+# Peak RSS comes from VmHWM: ru_maxrss survives exec, so it would report the parent's peak.
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+model = app.load_model()
+elapsed = time.perf_counter() - start
+with open("/proc/self/status") as status:
+    peak_kb = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": peak_kb / 1024,
+    "source": model.source.name,
+    "sklearn_imported": "sklearn" in sys.modules,
+    "xgboost_imported": "xgboost" in sys.modules,
+}))
+"""
+
+# name -> (environment overrides, artifacts it needs)
+VARIANTS = {
+    "joblib": ({"ML_MODEL_FORMAT": "joblib"}, ["model.joblib"]),
+    "lean": ({"ML_MODEL_FORMAT": "lean"}, ["model.ubj", "model_header.json"]),
+    "tree_eval": ({"ML_MODEL_BACKEND": "tree_eval"}, ["model_header.json", "model_trees.npz"]),
+}
+
+
+def measure(overrides: Dict[str, str], runs: int) -> Dict:
+    env = dict(os.environ, **overrides)
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=BASE, env=env,
+            capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "source": samples[0]["source"],
+        "sklearn_imported": samples[0]["sklearn_imported"],
+        "xgboost_imported": samples[0]["xgboost_imported"],
+        "median_s": float(np.median([s["seconds"] for s in samples])),
+        "max_rss_mb": float(np.median([s["max_rss_mb"] for s in samples])),
+    }
+
+
+def run(quick: bool = False) -> Dict[str, float]:
+    runs = 2 if quick else 5
+    metrics: Dict[str, float] = {}
+    for name, (overrides, artifacts) in VARIANTS.items():
+        if not all((BASE / artifact).exists() for artifact in artifacts):
+            continue
+        result = measure(overrides, runs)
+        metrics[f"{name}.load_s"] = round(result["median_s"], 4)
+        metrics[f"{name}.rss_mb"] = round(result["max_rss_mb"], 1)
+        metrics[f"{name}.xgboost_imported"] = result["xgboost_imported"]
+        metrics[f"{name}.sklearn_imported"] = result["sklearn_imported"]
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
@@ -0,0 +1,44 @@
+"""
+Training cost per PARAM_GRID config: one early-stopped fit on the first
+cross-validation fold, exactly as the search's first rung runs it.
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import Dict
+
+import common  # noqa: F401  (puts ml_service/ on sys.path)
+
+
+def run(quick: bool = False) -> Dict[str, float]:
+    import numpy as np
+    from sklearn.preprocessing import LabelEncoder
+
+    from feature_cache import load_dataset
+    from search import build_folds, fit_fold
+    from train import DATA_PATH, PARAM_GRID
+
+    features, target, _, _ = load_dataset(DATA_PATH)
+    y = LabelEncoder().fit_transform(target)
+    X = np.asarray(features.to_numpy(), dtype=np.float32)
+    n_jobs = os.cpu_count() or 1
+
+    start = time.perf_counter()
+    fold = build_folds(X, y, n_folds=5, random_state=42)[0]
+    metrics: Dict[str, float] = {"build_folds_s": round(time.perf_counter() - start, 4)}
+
+    configs = PARAM_GRID[:2] if quick else PARAM_GRID
+    for i, params in enumerate(configs, start=1):
+        start = time.perf_counter()
+        accuracy, rounds = fit_fold(params, fold, len(np.unique(y)), n_jobs, random_state=42)
+        seconds = time.perf_counter() - start
+        metrics[f"config_{i}.fit_s"] = round(seconds, 3)
+        metrics[f"config_{i}.rounds"] = rounds
+        metrics[f"config_{i}.accuracy"] = round(accuracy, 4)
+        metrics[f"config_{i}.rounds_per_s"] = round(rounds / seconds, 1)
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
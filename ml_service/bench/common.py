@@ -0,0 +1,62 @@
+"""
+Shared helpers for the bench suites: deterministic request payloads and
+percentile summaries. Importing this module puts ml_service/ on sys.path.
+"""
+from __future__ import annotations
+
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List
+
+import numpy as np
+
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+# CSV column -> PredictionRequest field
+REQUEST_FIELDS = {
+    "State Name": "state_name", "City Name": "city_name", "Month": "month",
+    "Day of Week": "day_of_week", "Time of Day": "time_of_day",
+    "Number of Vehicles Involved": "num_vehicles", "Vehicle Type Involved": "vehicle_type",
+    "Weather Conditions": "weather", "Road Type": "road_type", "Road Condition": "road_condition",
+    "Lighting Conditions": "lighting", "Speed Limit (km/h)": "speed_limit",
+    "Driver Age": "driver_age", "Driver License Status": "license_status",
+    "Alcohol Involvement": "alcohol", "Accident Location Details": "location_detail",
+}
+
+
+def sample_payloads(n: int, seed: int = 7) -> List[Dict]:
+    """``n`` request bodies drawn from the synthetic data generator."""
+    from generate_data import generate_row
+
+    random.seed(seed)
+    payloads = []
+    while len(payloads) < n:
+        row = generate_row()
+        if row is not None:
+            payloads.append({field: row[column] for column, field in REQUEST_FIELDS.items()})
+    return payloads
+
+
+def time_calls(func: Callable, args: Iterable, repeats: int = 1) -> np.ndarray:
+    """Wall time of each ``func(arg)`` call, in microseconds."""
+    args = list(args)
+    timings = []
+    for _ in range(repeats):
+        for arg in args:
+            start = time.perf_counter()
+            func(arg)
+            timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1e6
+
+
+def percentiles(prefix: str, timings_us: np.ndarray) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(timings_us, [50, 95, 99])
+    return {
+        f"{prefix}.p50_us": round(float(p50), 1),
+        f"{prefix}.p95_us": round(float(p95), 1),
+        f"{prefix}.p99_us": round(float(p99), 1),
+    }
@@ -0,0 +1,157 @@
+"""
+Benchmark runner: runs the suites, writes machine-readable JSON and compares
+it against a stored baseline.
+
+    python bench/run.py                     # all suites -> bench/results.json
+    python bench/run.py --quick predict     # fewer samples, one suite
+    python bench/run.py --save-baseline     # record bench/baseline.json
+    python bench/run.py --tolerance 0.15    # fail on >15% regressions
+
+Metrics are flat ``"<suite>.<name>": value`` pairs. The suffix says which
+direction is better: ``_s``, ``_ms``, ``_us`` and ``_mb`` are lower-is-better,
+``_per_s`` is higher-is-better, and ``_mismatches`` and ``_errors`` must be 0. Other values are
+recorded but not compared. The exit status is 1 if any compared metric
+regressed past the tolerance, so the runner can gate a deploy.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from common import BASE
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_PATH = BENCH_DIR / "results.json"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+# Suite name -> module exposing run(quick) -> {metric: value}
+SUITES = {
+    "features": "bench_features",
+    "load": "bench_load",
+    "predict": "bench_predict",
+    "startup": "bench_startup",
+    "training": "bench_training",
+}
+
+LOWER_IS_BETTER = ("_s", "_ms", "_us", "_mb")
+HIGHER_IS_BETTER = ("_per_s",)
+MUST_BE_ZERO = ("_mismatches", "_errors")
+DEFAULT_TOLERANCE = 0.25
+
+
+def _direction(metric: str) -> Optional[str]:
+    if metric.endswith(HIGHER_IS_BETTER):
+        return "higher"
+    if metric.endswith(MUST_BE_ZERO):
+        return "zero"
+    if metric.endswith(LOWER_IS_BETTER):
+        return "lower"
+    return None
+
+
+def environment() -> Dict:
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    for package in ("numpy", "xgboost", "sklearn", "fastapi"):
+        try:
+            info[package] = importlib.import_module(package).__version__
+        except ImportError:
+            info[package] = None
+    return info
+
+
+def run_suites(names: List[str], quick: bool) -> Dict:
+    metrics: Dict[str, object] = {}
+    timings: Dict[str, float] = {}
+    for name in names:
+        print(f"Running {name} suite...", flush=True)
+        start = time.perf_counter()
+        results = importlib.import_module(SUITES[name]).run(quick=quick)
+        timings[name] = round(time.perf_counter() - start, 1)
+        metrics.update({f"{name}.{key}": value for key, value in results.items()})
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "quick": quick,
+        "suites": names,
+        "suite_seconds": timings,
+        "environment": environment(),
+        "metrics": metrics,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Tuple[str, object, object, str]]:
+    """Rows of (metric, baseline, current, verdict) for every comparable metric."""
+    rows = []
+    for metric, value in current["metrics"].items():
+        direction = _direction(metric)
+        old = baseline["metrics"].get(metric)
+        if direction is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if direction == "zero":
+            rows.append((metric, old, value, "REGRESSION" if value else "ok"))
+            continue
+        if not isinstance(old, (int, float)) or old <= 0:
+            continue
+        change = (value - old) / old
+        worse = change > tolerance if direction == "lower" else change < -tolerance
+        better = change < -tolerance if direction == "lower" else change > tolerance
+        rows.append((metric, old, value, "REGRESSION" if worse else "improved" if better else "ok"))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the ml_service benchmarks.")
+    parser.add_argument("suites", nargs="*", help=f"suites to run (default: all of {', '.join(SUITES)})")
+    parser.add_argument("--quick", action="store_true", help="fewer samples and configs")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    unknown = sorted(set(args.suites) - set(SUITES))
+    if unknown:
+        parser.error(f"unknown suite(s) {', '.join(unknown)}; choose from {', '.join(SUITES)}")
+
+    os.chdir(BASE)
+    names = args.suites or list(SUITES)
+    results = run_suites(names, args.quick)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("quick") != results["quick"]:
+        print("Warning: baseline and results were recorded with different --quick settings")
+    rows = compare(results, baseline, args.tolerance)
+    width = max((len(metric) for metric, *_ in rows), default=10)
+    print(f"\nAgainst {args.baseline.name} (tolerance {args.tolerance:.0%}):")
+    for metric, old, new, verdict in rows:
+        print(f"  {metric:<{width}}  {old!s:>12} -> {new!s:>12}  {verdict}")
+    regressions = [metric for metric, _, _, verdict in rows if verdict == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
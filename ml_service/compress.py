@@ -0,0 +1,232 @@
+"""
+Post-training compression: the smallest booster whose hold-out accuracy stays
+within a tolerance of the full model's.
+
+The search grid produces hundreds of deep trees for a 12-feature target that
+is nearly deterministic. ``compress`` shrinks the trained booster in three
+stages. A stage's setting is kept only if hold-out accuracy stays within
+``tolerance`` of the full model's:
+
+1. truncate: keep the first N boosting rounds, for the smallest N that passes;
+2. prune: bottom-up, collapse every split whose loss reduction is below
+   ``gamma`` into a leaf, like xgboost's prune updater, and drop the nodes
+   that are no longer reachable. The largest ``PRUNE_GAMMAS`` value that passes
+   is kept;
+3. quantize: round split thresholds down to float16, and leaf values to an int8
+   grid with one scale per class. If int8 leaves fail, float16 leaves are
+   tried.
+
+The result is an ordinary booster whose values are exactly representable at
+the reduced precision. model.joblib, model.ubj and model_trees.npz therefore
+all predict the same, and ``export_trees`` stores the narrow tables (see
+tree_eval.py). ``apply_compression`` replays chosen settings on another
+booster, e.g. the refit on the full dataset.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_TOLERANCE = 0.002
+# Loss-reduction cut-offs tried in order; the last one within tolerance is kept
+PRUNE_GAMMAS = (0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+# Truncation candidates are every 1/TRUNCATION_STEPS of the rounds
+TRUNCATION_STEPS = 100
+LEAF_PRECISIONS = ("int8", "float16")
+
+_ROOT_PARENT = 2147483647
+
+
+def _model_json(booster: Any) -> Dict:
+    return json.loads(booster.save_raw(raw_format="json"))
+
+
+def _booster(model: Dict) -> Any:
+    import xgboost
+
+    booster = xgboost.Booster()
+    booster.load_model(bytearray(json.dumps(model).encode()))
+    return booster
+
+
+def _trees(model: Dict) -> List[Dict]:
+    return model["learner"]["gradient_booster"]["model"]["trees"]
+
+
+def count_nodes(booster: Any) -> int:
+    return sum(len(tree["left_children"]) for tree in _trees(_model_json(booster)))
+
+
+def accuracy(booster: Any, X: np.ndarray, y: np.ndarray) -> float:
+    return float((booster.inplace_predict(X).argmax(axis=1) == y).mean())
+
+
+def truncate(booster: Any, rounds: int) -> Any:
+    return booster[:rounds] if rounds < booster.num_boosted_rounds() else booster
+
+
+def _prune_tree(tree: Dict, gamma: float, learning_rate: float) -> None:
+    left = np.asarray(tree["left_children"], dtype=np.int64)
+    right = np.asarray(tree["right_children"], dtype=np.int64)
+    loss = np.asarray(tree["loss_changes"], dtype=np.float64)
+    is_leaf = left == -1
+    leaf_value = np.asarray(tree["split_conditions"], dtype=np.float32)
+    # Internal nodes keep their unscaled weight; a leaf made from one is worth weight * eta
+    collapsed_value = np.asarray(tree["base_weights"], dtype=np.float32) * np.float32(learning_rate)
+
+    order, frontier = [], [0]
+    while frontier:
+        node = frontier.pop()
+        order.append(node)
+        if not is_leaf[node]:
+            frontier += [left[node], right[node]]
+    for node in reversed(order):
+        if not is_leaf[node] and is_leaf[left[node]] and is_leaf[right[node]] and loss[node] < gamma:
+            is_leaf[node] = True
+            leaf_value[node] = collapsed_value[node]
+
+    # Renumber the nodes still reachable, breadth first, and rebuild every per-node list
+    kept, parent = [0], [_ROOT_PARENT]
+    for position, node in enumerate(kept):
+        if not is_leaf[node]:
+            kept += [int(left[node]), int(right[node])]
+            parent += [position, position]
+    new_id = {node: i for i, node in enumerate(kept)}
+    old = {key: tree[key] for key in ("base_weights", "default_left", "split_indices", "sum_hessian", "split_type")}
+    tree["left_children"] = [new_id[int(left[n])] if not is_leaf[n] else -1 for n in kept]
+    tree["right_children"] = [new_id[int(right[n])] if not is_leaf[n] else -1 for n in kept]
+    tree["parents"] = parent
+    tree["split_conditions"] = [float(leaf_value[n]) if is_leaf[n] else tree["split_conditions"][n] for n in kept]
+    tree["base_weights"] = [float(leaf_value[n]) if is_leaf[n] else old["base_weights"][n] for n in kept]
+    tree["loss_changes"] = [0.0 if is_leaf[n] else float(loss[n]) for n in kept]
+    tree["split_indices"] = [0 if is_leaf[n] else old["split_indices"][n] for n in kept]
+    tree["default_left"] = [0 if is_leaf[n] else old["default_left"][n] for n in kept]
+    tree["sum_hessian"] = [old["sum_hessian"][n] for n in kept]
+    tree["split_type"] = [old["split_type"][n] for n in kept]
+    tree["tree_param"]["num_nodes"] = str(len(kept))
+
+
+def prune(booster: Any, gamma: float, learning_rate: float) -> Any:
+    """Booster with every split of loss reduction < ``gamma`` collapsed, bottom-up."""
+    model = _model_json(booster)
+    for tree in _trees(model):
+        _prune_tree(tree, gamma, learning_rate)
+    return _booster(model)
+
+
+def _float16_below(values: np.ndarray) -> np.ndarray:
+    """The largest float16 at or below each value.
+
+    Split thresholds are cut points that equal data values, so rounding to the
+    nearest float16 would move rows sitting exactly on a cut to the other side.
+    Rounding down keeps ``x < t`` unchanged for every x outside the float16 gap
+    just below t.
+    """
+    with np.errstate(over="ignore"):
+        narrow = values.astype(np.float16)
+    above = narrow.astype(np.float32) > values
+    narrow[above] = np.nextafter(narrow[above], np.float16(-np.inf))
+    return narrow
+
+
+def quantize(booster: Any, thresholds: str, leaves: str) -> Tuple[Any, Optional[Dict]]:
+    """Booster with thresholds and leaves rounded to the given precisions, and the
+    quantization record ``export_trees`` needs to store them (None if nothing changed)."""
+    if thresholds == "float32" and leaves == "float32":
+        return booster, None
+    model = _model_json(booster)
+    trees = _trees(model)
+    tree_class = model["learner"]["gradient_booster"]["model"]["tree_info"]
+    n_class = max(int(model["learner"]["learner_model_param"]["num_class"]), 1)
+
+    leaf_scale = np.ones(n_class, dtype=np.float32)
+    if leaves == "int8":
+        peak = np.zeros(n_class, dtype=np.float32)
+        for tree, cls in zip(trees, tree_class):
+            values = np.asarray(tree["split_conditions"], dtype=np.float32)[np.asarray(tree["left_children"]) == -1]
+            peak[cls] = max(peak[cls], np.abs(values).max(initial=0.0))
+        leaf_scale = np.where(peak > 0, peak / np.float32(127), np.float32(1)).astype(np.float32)
+
+    for tree, cls in zip(trees, tree_class):
+        values = np.asarray(tree["split_conditions"], dtype=np.float32)
+        is_leaf = np.asarray(tree["left_children"]) == -1
+        if thresholds == "float16":
+            narrow = _float16_below(values)
+            if not np.isfinite(narrow[~is_leaf]).all():
+                raise ValueError("Split thresholds exceed the float16 range")
+            values = np.where(is_leaf, values, narrow.astype(np.float32))
+        if leaves == "int8":
+            codes = np.clip(np.rint(values / leaf_scale[cls]), -127, 127).astype(np.int8)
+            values = np.where(is_leaf, codes.astype(np.float32) * leaf_scale[cls], values)
+        elif leaves == "float16":
+            values = np.where(is_leaf, values.astype(np.float16).astype(np.float32), values)
+        tree["split_conditions"] = values.tolist()
+        tree["base_weights"] = np.where(is_leaf, values, np.asarray(tree["base_weights"], dtype=np.float32)).tolist()
+
+    record: Dict = {"thresholds": thresholds, "leaves": leaves}
+    if leaves == "int8":
+        record["leaf_scale"] = leaf_scale.tolist()
+    return _booster(model), record
+
+
+def apply_compression(booster: Any, settings: Dict, learning_rate: float) -> Tuple[Any, Optional[Dict]]:
+    """Replay ``compress``'s chosen settings; returns (booster, quantization record)."""
+    booster = truncate(booster, settings["rounds"])
+    if settings.get("gamma"):
+        booster = prune(booster, settings["gamma"], learning_rate)
+    return quantize(booster, settings.get("thresholds", "float32"), settings.get("leaves", "float32"))
+
+
+def compress(
+    booster: Any, X: np.ndarray, y: np.ndarray, learning_rate: float, tolerance: float = DEFAULT_TOLERANCE,
+) -> Tuple[Any, Optional[Dict], Dict]:
+    """(compressed booster, quantization record, summary) for scaled hold-out rows ``X``, labels ``y``."""
+    full = accuracy(booster, X, y)
+    floor = full - tolerance
+    rounds = booster.num_boosted_rounds()
+    summary: Dict = {"tolerance": tolerance, "full_accuracy": round(full, 4),
+                     "full_trees": len(_trees(_model_json(booster))), "full_nodes": count_nodes(booster)}
+
+    # 1. Truncate: iteration_range scores a prefix without copying the booster
+    step = max(1, rounds // TRUNCATION_STEPS)
+    for candidate in list(range(step, rounds, step)) + [rounds]:
+        predicted = booster.inplace_predict(X, iteration_range=(0, candidate)).argmax(axis=1)
+        if float((predicted == y).mean()) >= floor:
+            rounds = candidate
+            break
+    current = truncate(booster, rounds)
+
+    # 2. Prune, loosening gamma until accuracy first falls out of tolerance
+    gamma = 0.0
+    for candidate in PRUNE_GAMMAS:
+        pruned = prune(current, candidate, learning_rate)
+        if accuracy(pruned, X, y) < floor:
+            break
+        gamma, best_pruned = candidate, pruned
+    if gamma:
+        current = best_pruned
+
+    # 3. Quantize thresholds, then leaves, as narrow as stays within tolerance
+    thresholds = "float32"
+    try:
+        if accuracy(quantize(current, "float16", "float32")[0], X, y) >= floor:
+            thresholds = "float16"
+    except ValueError:
+        pass
+    leaves = "float32"
+    for candidate in LEAF_PRECISIONS:
+        if accuracy(quantize(current, thresholds, candidate)[0], X, y) >= floor:
+            leaves = candidate
+            break
+    compressed, record = quantize(current, thresholds, leaves)
+
+    settings = {"rounds": rounds, "gamma": gamma, "thresholds": thresholds, "leaves": leaves}
+    summary.update(
+        settings=settings,
+        accuracy=round(accuracy(compressed, X, y), 4),
+        trees=len(_trees(_model_json(compressed))),
+        nodes=count_nodes(compressed),
+    )
+    return compressed, record, summary
@@ -0,0 +1,223 @@
+"""
+Constant-memory drift monitoring for /predict inputs and outputs.
+
+``train.py`` stores a reference ``HistogramSketch`` of every engineered
+feature (over the training data) and of every class probability (over the
+hold-out predictions) in ``model_meta.json``. The service keeps a live sketch
+with the same bin edges, updated in place per request. Memory is a fixed
+(n_columns, n_bins) count array, and nothing is kept per request. ``/drift``
+compares the two with:
+
+* PSI, the population stability index, summed over bins. Below 0.1 is
+  stable, 0.1-0.25 is moderate drift, above 0.25 is significant.
+* KS, the largest gap between the binned CDFs.
+
+Feature bin edges sit halfway between distinct training values. Discrete
+features (the risk maps, hour) get one bin per value. Wide ones get
+approximately equal-frequency bins. Edges never coincide with a value that
+occurs in training, so float32 request encoding cannot move a value across
+an edge. Counts are halved every ``window`` observations, so the live sketch
+tracks roughly the last 2 x window requests rather than everything since
+startup.
+"""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+MAX_FEATURE_BINS = 20
+PROBABILITY_EDGES = [i / 10 for i in range(1, 10)]
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+MIN_OBSERVATIONS = 100
+_EPSILON = 1e-4
+
+
+def feature_edges(values: np.ndarray, max_bins: int = MAX_FEATURE_BINS) -> List[float]:
+    """Inner bin edges for one column, halfway between distinct observed values."""
+    uniques = np.unique(np.asarray(values, dtype=np.float64))
+    if len(uniques) <= max_bins:
+        return ((uniques[:-1] + uniques[1:]) / 2).tolist()
+    quantiles = np.quantile(values, np.linspace(0, 1, max_bins + 1)[1:-1])
+    above = np.clip(np.searchsorted(uniques, quantiles, side="right"), 1, len(uniques) - 1)
+    return sorted({float((uniques[i - 1] + uniques[i]) / 2) for i in above})
+
+
+class HistogramSketch:
+    """Per-column counts over fixed bin edges; bin i holds edges[i-1] <= x < edges[i]."""
+
+    def __init__(self, columns: Sequence[str], edges: Sequence[Sequence[float]]) -> None:
+        self.columns = list(columns)
+        self.edges = [list(map(float, e)) for e in edges]
+        self.n_bins = max(len(e) for e in self.edges) + 1 if self.edges else 1
+        # Pad with +inf so all columns share one (n_columns, n_bins - 1) edge matrix
+        self._edge_matrix = np.full((len(self.columns), self.n_bins - 1), np.inf)
+        for i, column_edges in enumerate(self.edges):
+            self._edge_matrix[i, :len(column_edges)] = column_edges
+        self._row_offsets = np.arange(len(self.columns)) * self.n_bins
+        self._offsets = self._row_offsets.tolist()
+        self.counts = np.zeros((len(self.columns), self.n_bins))
+        self.flat_counts = self.counts.ravel()  # a view: writes land in ``counts``
+
+    @classmethod
+    def fit(cls, columns: Sequence[str], matrix: np.ndarray, max_bins: int = MAX_FEATURE_BINS) -> "HistogramSketch":
+        """Edges from ``matrix`` and its own counts: a reference sketch."""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        sketch = cls(columns, [feature_edges(matrix[:, i], max_bins) for i in range(matrix.shape[1])])
+        sketch.update(matrix)
+        return sketch
+
+    def bins(self, matrix: np.ndarray) -> np.ndarray:
+        """Flat count indices, shape (n_rows, n_columns)."""
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, len(self.columns))
+        return (matrix[:, :, None] >= self._edge_matrix[None, :, :]).sum(axis=2) + self._row_offsets
+
+    def row_bins(self, row: Sequence[float]) -> List[int]:
+        """``bins`` for a single row, without the per-call numpy overhead."""
+        return [offset + bisect_right(edges, value)
+                for offset, edges, value in zip(self._offsets, self.edges, row)]
+
+    def update(self, matrix: np.ndarray) -> None:
+        flat = self.bins(matrix).ravel()
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    @property
+    def total(self) -> float:
+        return float(self.counts[0].sum()) if len(self.columns) else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "columns": self.columns,
+            "edges": self.edges,
+            "counts": [[int(c) for c in row[:len(e) + 1]] for row, e in zip(self.counts, self.edges)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "HistogramSketch":
+        sketch = cls(data["columns"], data["edges"])
+        for i, row in enumerate(data["counts"]):
+            sketch.counts[i, :len(row)] = row
+        return sketch
+
+
+def probability_sketch(class_names: Sequence[str]) -> HistogramSketch:
+    """Empty sketch over equal-width probability bins, one column per class."""
+    class_names = [str(c).lower() for c in class_names]
+    return HistogramSketch(class_names, [PROBABILITY_EDGES] * len(class_names))
+
+
+def build_reference(
+    feature_columns: Sequence[str], features: np.ndarray, class_names: Sequence[str], probabilities: np.ndarray,
+) -> Dict:
+    """The ``drift_reference`` entry train.py writes to model_meta.json."""
+    outputs = probability_sketch(class_names)
+    outputs.update(probabilities)
+    return {
+        "features": HistogramSketch.fit(feature_columns, features).to_dict(),
+        "probabilities": outputs.to_dict(),
+    }
+
+
+def psi(reference: np.ndarray, live: np.ndarray) -> float:
+    p = np.maximum(reference / max(reference.sum(), 1.0), _EPSILON)
+    q = np.maximum(live / max(live.sum(), 1.0), _EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks(reference: np.ndarray, live: np.ndarray) -> float:
+    p = np.cumsum(reference) / max(reference.sum(), 1.0)
+    q = np.cumsum(live) / max(live.sum(), 1.0)
+    return float(np.abs(p - q).max())
+
+
+def _status(value: float) -> str:
+    if value >= PSI_SIGNIFICANT:
+        return "significant"
+    if value >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    """Live sketches of encoded request features and predicted probabilities."""
+
+    def __init__(self, reference: Dict, mean: np.ndarray, scale: np.ndarray, window: int = 50_000) -> None:
+        self.reference_features = HistogramSketch.from_dict(reference["features"])
+        self.reference_probabilities = HistogramSketch.from_dict(reference["probabilities"])
+        # Requests arrive scaled (see FeatureEncoder), so the live edges are scaled too.
+        mean = np.asarray(mean, dtype=np.float64)
+        scale = np.asarray(scale, dtype=np.float64)
+        scaled_edges = [
+            ((np.asarray(edges) - mean[i]) / scale[i]).tolist()
+            for i, edges in enumerate(self.reference_features.edges)
+        ]
+        self.features = HistogramSketch(self.reference_features.columns, scaled_edges)
+        self.probabilities = HistogramSketch(
+            self.reference_probabilities.columns, self.reference_probabilities.edges,
+        )
+        self.window = window
+        self.observed = 0
+        self._since_decay = 0
+        self._lock = threading.Lock()
+
+    def observe(self, encoded: np.ndarray, probabilities: np.ndarray) -> None:
+        """Add scaled feature rows and their class probabilities (one row or a batch)."""
+        encoded = np.asarray(encoded)
+        n_rows = 1 if encoded.ndim == 1 else len(encoded)
+        with self._lock:
+            if n_rows == 1:
+                feature_counts = self.features.flat_counts
+                for index in self.features.row_bins(encoded.ravel().tolist()):
+                    feature_counts[index] += 1
+                probability_counts = self.probabilities.flat_counts
+                for index in self.probabilities.row_bins(np.ravel(probabilities).tolist()):
+                    probability_counts[index] += 1
+            else:
+                self.features.update(encoded)
+                self.probabilities.update(probabilities)
+            self.observed += n_rows
+            self._since_decay += n_rows
+            if self.window and self._since_decay >= self.window:
+                self.features.counts *= 0.5
+                self.probabilities.counts *= 0.5
+                self._since_decay = 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.features.counts[:] = 0
+            self.probabilities.counts[:] = 0
+            self.observed = self._since_decay = 0
+
+    def _compare(self, reference: HistogramSketch, live: HistogramSketch) -> Dict[str, Dict]:
+        with self._lock:
+            live_counts = live.counts.copy()
+        scores = {}
+        for i, column in enumerate(reference.columns):
+            n = len(reference.edges[i]) + 1
+            column_psi = psi(reference.counts[i, :n], live_counts[i, :n])
+            scores[column] = {
+                "psi": round(column_psi, 4),
+                "ks": round(ks(reference.counts[i, :n], live_counts[i, :n]), 4),
+                "status": _status(column_psi),
+            }
+        return scores
+
+    def report(self) -> Dict:
+        weight = self.features.total
+        result: Dict = {
+            "observed": self.observed,
+            "window_weight": round(weight, 1),
+            "thresholds": {"psi_moderate": PSI_MODERATE, "psi_significant": PSI_SIGNIFICANT},
+        }
+        if weight < MIN_OBSERVATIONS:
+            result["status"] = "insufficient_data"
+            return result
+        result["features"] = self._compare(self.reference_features, self.features)
+        result["probabilities"] = self._compare(self.reference_probabilities, self.probabilities)
+        max_psi = max(s["psi"] for group in ("features", "probabilities") for s in result[group].values())
+        result["max_psi"] = max_psi
+        result["status"] = _status(max_psi)
+        return result
@@ -0,0 +1,135 @@
+"""
+Precompiled feature encoder for the inference hot path.
+
+At model load the feature engine's risk maps (features.py) and the fitted
+StandardScaler are folded into per-feature tables of already-scaled values,
+so a request is encoded by a few dict lookups straight into a float32 buffer and scored with a single
+``Booster.inplace_predict`` call — no DataFrame, ColumnTransformer or
+LabelEncoder on the request path.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from features import NUMERIC_FEATURES, FeatureEngine, parse_hour
+
+
+class FeatureEncoder:
+    def __init__(
+        self,
+        booster: Any,
+        engine: FeatureEngine,
+        mean: np.ndarray,
+        scale: np.ndarray,
+        class_names: Sequence[str],
+    ) -> None:
+        self.booster = booster
+        self.engine = engine
+        self.feature_columns = tuple(engine.feature_columns)
+        self.class_names = tuple(name.lower() for name in class_names)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self._local = threading.local()
+
+        # Categorical features: request value -> scaled feature value.
+        # Unknown values score as risk 0, exactly like the engine's code -1.
+        self._categorical: List[Tuple[int, str, Dict[str, float], float]] = []
+        for index, (field, mapping) in enumerate(engine.lookups):
+            table = {key: self._scaled(index, value) for key, value in mapping.items()}
+            self._categorical.append((index, field, table, self._scaled(index, 0.0)))
+
+        # Numeric features follow the categorical ones in feature order and may
+        # carry a converter from the raw request value (time_of_day -> hour).
+        offset = len(self._categorical)
+        self._numeric: List[Tuple[int, str, Optional[Callable], float, float]] = [
+            (offset + i, field, parse_hour if name == "hour" else None,
+             float(self.mean[offset + i]), float(self.scale[offset + i]))
+            for i, (name, _, field, _) in enumerate(NUMERIC_FEATURES)
+        ]
+
+    @classmethod
+    def from_bundle(cls, bundle: Dict[str, Any], engine: Optional[FeatureEngine] = None) -> "FeatureEncoder":
+        """Build from a model.joblib bundle; its risk maps are the ones in features.py."""
+        engine = engine or FeatureEngine()
+        pipeline = bundle["pipeline"]
+        preprocess = pipeline.named_steps["preprocess"]
+        scaler = preprocess.named_transformers_["num"]
+        columns = list(bundle["numeric_cols"])
+        scaled_columns = [cols for name, _, cols in preprocess.transformers_ if name == "num"]
+        if scaled_columns != [columns]:
+            raise ValueError("Expected one StandardScaler over all numeric columns in the preprocess step")
+        if columns != engine.feature_columns:
+            raise ValueError("The model's feature columns do not match the feature engine")
+
+        return cls(
+            booster=pipeline.named_steps["model"].get_booster(),
+            engine=engine,
+            mean=scaler.mean_,
+            scale=scaler.scale_,
+            class_names=bundle["label_encoder"].classes_,
+        )
+
+    @classmethod
+    def from_header(cls, booster: Any, header: Dict[str, Any]) -> "FeatureEncoder":
+        """Build from a lean artifact (see artifact.py), using its own risk maps."""
+        engine = FeatureEngine(header["risk_maps"])
+        if list(header["feature_columns"]) != engine.feature_columns:
+            raise ValueError("The artifact's feature columns do not match the feature engine")
+        return cls(
+            booster=booster,
+            engine=engine,
+            mean=header["scaler_mean"],
+            scale=header["scaler_scale"],
+            class_names=header["class_names"],
+        )
+
+    def _scaled(self, index: int, value: float) -> float:
+        return (float(value) - float(self.mean[index])) / float(self.scale[index])
+
+    def _buffer(self) -> np.ndarray:
+        # One buffer per thread: sync FastAPI handlers run concurrently on a threadpool.
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = np.empty((1, len(self.feature_columns)), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer
+
+    def encode(self, payload: Any, out: np.ndarray) -> np.ndarray:
+        """Write the scaled feature vector for one request into ``out``."""
+        for index, field, table, default in self._categorical:
+            out[index] = table.get(getattr(payload, field), default)
+        for index, field, convert, mean, scale in self._numeric:
+            value = getattr(payload, field)
+            if convert is not None:
+                value = convert(value)
+            out[index] = (value - mean) / scale
+        return out
+
+    def encode_one(self, payload: Any) -> np.ndarray:
+        """Encode one request into this thread's (1, n_features) buffer."""
+        buffer = self._buffer()
+        self.encode(payload, buffer[0])
+        return buffer
+
+    def predict_one(self, payload: Any) -> np.ndarray:
+        """Class probabilities for a single request object."""
+        return self.predict_encoded(self.encode_one(payload))[0]
+
+    def predict_encoded(self, encoded: np.ndarray) -> np.ndarray:
+        """Class probabilities for a float32 matrix of already-encoded rows."""
+        return self.booster.inplace_predict(encoded)
+
+    def scale_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """Encoded float32 rows for an unscaled (n_rows, n_features) feature matrix."""
+        return ((matrix - self.mean) / self.scale).astype(np.float32)
+
+    def transform(self, columns: Dict[str, Any], n_rows: Optional[int] = None) -> np.ndarray:
+        """Unscaled feature matrix for request columns keyed by field name (see FeatureEngine)."""
+        return self.engine.transform(columns, key="field", n_rows=n_rows)
+
+    def predict_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """Class probabilities for an unscaled (n_rows, n_features) feature matrix."""
+        return self.predict_encoded(self.scale_matrix(matrix))
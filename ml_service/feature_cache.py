@@ -0,0 +1,104 @@
+"""
+Typed, memory-mapped cache of ``build_dataset`` output.
+
+The engineered feature matrix and encoded target are stored as ``.npy`` files
+under a key combining the CSV's content hash and the feature-engineering code.
+When neither has changed, training loads the matrix memory-mapped, with no CSV
+parsing and no risk mapping. Any change to the data, to ``build_dataset``
+or to features.py (risk maps, parsing) produces a new key and a rebuild.
+
+    .feature_cache/<key>/features.npy   float64 (n_rows, n_features)
+                         target.npy     int16 class codes
+                         meta.json      column names, class names, source info
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import shutil
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = BASE_DIR / ".feature_cache"
+MAX_ENTRIES = 4
+
+
+def _feature_code_hash() -> str:
+    import features
+    import train
+
+    # The features module holds the risk maps and CSV read options as well as the code
+    source = inspect.getsource(train.build_dataset) + inspect.getsource(features)
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def cache_key(data_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(data_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(_feature_code_hash().encode())
+    return digest.hexdigest()[:32]
+
+
+def save_features(
+    entry: Path, features: pd.DataFrame, target: pd.Series,
+    categorical_cols: List[str], numeric_cols: List[str], source: Path,
+) -> None:
+    classes, codes = np.unique(target.to_numpy(dtype=str), return_inverse=True)
+    tmp = entry.with_name(entry.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    np.save(tmp / "features.npy", features[numeric_cols].to_numpy(dtype=np.float64))
+    np.save(tmp / "target.npy", codes.astype(np.int16))
+    meta = {
+        "source": str(source),
+        "rows": len(features),
+        "categorical_cols": categorical_cols,
+        "numeric_cols": numeric_cols,
+        "classes": classes.tolist(),
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    shutil.rmtree(entry, ignore_errors=True)
+    tmp.rename(entry)
+
+
+def prune(cache_dir: Path, keep: int = MAX_ENTRIES) -> None:
+    """Drop all but the ``keep`` most recently written entries."""
+    entries = sorted(
+        (p for p in cache_dir.iterdir() if p.is_dir() and not p.name.endswith(".tmp")),
+        key=lambda p: p.stat().st_mtime, reverse=True,
+    )
+    for stale in entries[keep:]:
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def load_features(entry: Path) -> Tuple[pd.DataFrame, pd.Series, List[str], List[str]]:
+    meta = json.loads((entry / "meta.json").read_text())
+    matrix = np.load(entry / "features.npy", mmap_mode="r")
+    codes = np.load(entry / "target.npy", mmap_mode="r")
+    features = pd.DataFrame(matrix, columns=meta["numeric_cols"], copy=False)
+    target = pd.Series(np.asarray(meta["classes"], dtype=object)[codes], name="Accident Severity")
+    return features, target, meta["categorical_cols"], meta["numeric_cols"]
+
+
+def load_dataset(data_path: Path, cache_dir: Path = CACHE_DIR) -> Tuple[pd.DataFrame, pd.Series, List[str], List[str]]:
+    """``build_dataset`` of the CSV at ``data_path``, served from the cache when possible."""
+    from features import READ_CSV_OPTIONS
+    from train import build_dataset
+
+    entry = cache_dir / cache_key(data_path)
+    if (entry / "meta.json").exists():
+        print(f"Loading cached features from {entry.relative_to(cache_dir.parent)}")
+        return load_features(entry)
+
+    print("Building features from CSV...")
+    features, target, categorical_cols, numeric_cols = build_dataset(pd.read_csv(data_path, **READ_CSV_OPTIONS))
+    save_features(entry, features, target, categorical_cols, numeric_cols, data_path)
+    prune(cache_dir)
+    return load_features(entry)
@@ -0,0 +1,203 @@
+"""
+Feature engineering shared by training, serving and data generation.
+
+The risk maps below are the only copy; train.py, app.py, train_streaming.py
+and generate_data.py all import them from here. ``FeatureEngine`` is fitted
+once from the maps: every categorical feature gets a fixed vocabulary
+(category -> integer code) and a risk array indexed by code, with a trailing
+0 that code -1 (unknown or missing) lands on, like the old
+``map(...).fillna(0)``.
+
+``transform`` builds the (n_rows, 12) feature matrix from columns keyed by
+CSV column or request field name, so one call covers a request batch, a whole
+CSV or a streamed chunk:
+
+* pandas columns are converted to categoricals (hash-based, in C) and their
+  category codes recoded to the vocabulary; other sequences are factorized
+  in one dict pass. Only the distinct values are ever looked up or parsed
+  (``time_of_day`` via ``parse_hour``), never each row;
+* the risk value is then a single array index over the codes;
+* a scalar instead of a column is evaluated once and shared by every row.
+
+A single request goes through ``FeatureEncoder`` instead (see encoder.py),
+which folds the engine's tables and the scaler into one dict per feature.
+
+The CSV must be read with ``READ_CSV_OPTIONS``. pandas reads the license
+status ``None`` as missing by default, which trained models on risk 0 for
+unlicensed drivers while the service scored them at 0.06.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+TARGET_COLUMN = "Accident Severity"
+
+# ---------------------------------------------------------------------------
+# Risk mappings (domain knowledge — how each factor contributes to severity)
+# ---------------------------------------------------------------------------
+
+WEATHER_RISK = {"Clear": 0, "Cloudy": 0.02, "Hazy": 0.06, "Rainy": 0.12, "Foggy": 0.15, "Stormy": 0.22}
+ROAD_COND_RISK = {"Dry": 0, "Wet": 0.06, "Damaged": 0.12, "Under Construction": 0.10}
+LIGHTING_RISK = {"Daylight": 0, "Dusk": 0.04, "Dawn": 0.05, "Dark": 0.12}
+ROAD_TYPE_RISK = {"Urban Road": 0.02, "Village Road": 0.04, "State Highway": 0.08, "National Highway": 0.10, "Expressway": 0.06}
+VEHICLE_RISK = {"Cycle": 0.10, "Pedestrian": 0.12, "Two-Wheeler": 0.10, "Auto-Rickshaw": 0.06, "Car": 0.02, "Bus": 0.04, "Truck": 0.06}
+LOCATION_RISK = {"Straight Road": 0, "Curve": 0.06, "Intersection": 0.08, "T-Junction": 0.06, "Bridge": 0.04, "Flyover": 0.02}
+ALCOHOL_RISK = {"Yes": 0.14}
+LICENSE_RISK = {"Valid": 0.0, "Expired": 0.03, "None": 0.06}
+
+# Engineered risk column -> map, exported with the lean model artifact
+RISK_MAPS = {
+    "weather_risk": WEATHER_RISK,
+    "road_cond_risk": ROAD_COND_RISK,
+    "lighting_risk": LIGHTING_RISK,
+    "road_type_risk": ROAD_TYPE_RISK,
+    "vehicle_risk": VEHICLE_RISK,
+    "location_risk": LOCATION_RISK,
+    "alcohol_risk": ALCOHOL_RISK,
+    "license_risk": LICENSE_RISK,
+}
+
+# (engineered column, CSV column, request field), in model feature order
+CATEGORICAL_FEATURES = [
+    ("weather_risk", "Weather Conditions", "weather"),
+    ("road_cond_risk", "Road Condition", "road_condition"),
+    ("lighting_risk", "Lighting Conditions", "lighting"),
+    ("road_type_risk", "Road Type", "road_type"),
+    ("vehicle_risk", "Vehicle Type Involved", "vehicle_type"),
+    ("location_risk", "Accident Location Details", "location_detail"),
+    ("alcohol_risk", "Alcohol Involvement", "alcohol"),
+    ("license_risk", "Driver License Status", "license_status"),
+]
+# (engineered column, CSV column, request field, value for missing/unparseable entries)
+NUMERIC_FEATURES = [
+    ("hour", "Time of Day", "time_of_day", 0),
+    ("speed_limit", "Speed Limit (km/h)", "speed_limit", 50),
+    ("driver_age", "Driver Age", "driver_age", 35),
+    ("num_vehicles", "Number of Vehicles Involved", "num_vehicles", 1),
+]
+FEATURE_COLUMNS = [name for name, _, _ in CATEGORICAL_FEATURES] + [name for name, _, _, _ in NUMERIC_FEATURES]
+
+# Only empty cells are missing: the default NA strings include the license status "None"
+READ_CSV_OPTIONS = {"keep_default_na": False, "na_values": [""]}
+
+
+def parse_hour(time_str: str) -> int:
+    try:
+        parts = time_str.strip().split(":")
+        return max(0, min(23, int(parts[0])))
+    except Exception:
+        return 0
+
+
+def _is_pandas(values: Any) -> bool:
+    return hasattr(values, "to_numpy") and hasattr(values, "astype")
+
+
+def _factorize(values: Any) -> Tuple[List[str], np.ndarray]:
+    """(distinct values as strings, per-row index into them); index -1 is missing."""
+    if _is_pandas(values):
+        if not hasattr(values, "cat"):
+            values = values.astype("category")
+        return [str(c) for c in values.cat.categories], values.cat.codes.to_numpy()
+    # Request columns are short Python lists: one dict pass beats sorting a string array
+    index: Dict[Any, int] = {}
+    inverse = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.intp, count=len(values))
+    return [str(value) for value in index], inverse
+
+
+def parse_hours(values: Any) -> np.ndarray:
+    """``parse_hour`` over a whole column, called once per distinct string."""
+    uniques, inverse = _factorize(values)
+    hours = np.array([parse_hour(value) for value in uniques] + [parse_hour("nan")], dtype=np.float64)
+    return hours[inverse]
+
+
+def _numbers(values: Any, fill: float) -> np.ndarray:
+    if _is_pandas(values):
+        # Malformed CSV entries become missing, as with to_numeric(errors="coerce")
+        import pandas as pd
+
+        values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    values = np.asarray(values, dtype=np.float64)
+    return np.trunc(np.where(np.isnan(values), fill, values))
+
+
+class FeatureEngine:
+    """Category vocabularies and code-indexed risk tables for one set of risk maps."""
+
+    def __init__(self, risk_maps: Mapping[str, Mapping[str, float]] = RISK_MAPS) -> None:
+        missing = [name for name, _, _ in CATEGORICAL_FEATURES if name not in risk_maps]
+        if missing:
+            raise ValueError(f"Risk maps missing for {', '.join(missing)}")
+        self.risk_maps = {name: dict(risk_maps[name]) for name, _, _ in CATEGORICAL_FEATURES}
+        self.feature_columns = list(FEATURE_COLUMNS)
+        self.categories = {name: list(mapping) for name, mapping in self.risk_maps.items()}
+        self._codes = {name: {category: code for code, category in enumerate(categories)}
+                       for name, categories in self.categories.items()}
+        # Trailing 0.0: code -1 (unknown/missing) scores as risk 0
+        self.risk_tables = {
+            name: np.array(list(mapping.values()) + [0.0], dtype=np.float64)
+            for name, mapping in self.risk_maps.items()
+        }
+
+    @property
+    def lookups(self) -> List[Tuple[str, Dict[str, float]]]:
+        """(request field, risk map) per categorical feature, in feature order."""
+        return [(field, self.risk_maps[name]) for name, _, field in CATEGORICAL_FEATURES]
+
+    def codes(self, feature: str, values: Any) -> np.ndarray:
+        """Vocabulary codes of a column of raw values; -1 for unknown or missing."""
+        uniques, inverse = _factorize(values)
+        vocabulary = self._codes[feature]
+        recode = np.array([vocabulary.get(value, -1) for value in uniques] + [-1], dtype=np.intp)
+        return recode[inverse]
+
+    def risk(self, feature: str, values: Any) -> np.ndarray:
+        return self.risk_tables[feature][self.codes(feature, values)]
+
+    def transform(self, columns: Mapping[str, Any], key: str = "column", n_rows: Optional[int] = None) -> np.ndarray:
+        """The (n_rows, n_features) float64 feature matrix.
+
+        ``columns`` maps CSV column names (``key="column"``) or request field names
+        (``key="field"``) to a column of raw values, or to one value shared by every
+        row. ``n_rows`` is needed only when every value is shared.
+        """
+        def source(csv_column: str, field: str) -> str:
+            return csv_column if key == "column" else field
+
+        names = [source(*spec[1:3]) for spec in CATEGORICAL_FEATURES + NUMERIC_FEATURES]
+        shared = {name for name in names if isinstance(columns[name], str) or not hasattr(columns[name], "__len__")}
+        if n_rows is None:
+            lengths = {len(columns[name]) for name in names if name not in shared}
+            if len(lengths) > 1:
+                raise ValueError("All columns must have the same length")
+            n_rows = lengths.pop() if lengths else 1
+
+        def column(name: str) -> Any:
+            return [columns[name]] if name in shared else columns[name]
+
+        matrix = np.empty((n_rows, len(self.feature_columns)), dtype=np.float64)
+        for i, (name, csv_column, field) in enumerate(CATEGORICAL_FEATURES):
+            matrix[:, i] = self.risk(name, column(source(csv_column, field)))
+        for i, (name, csv_column, field, fill) in enumerate(NUMERIC_FEATURES, start=len(CATEGORICAL_FEATURES)):
+            values = column(source(csv_column, field))
+            matrix[:, i] = parse_hours(values) if name == "hour" else _numbers(values, fill)
+        return matrix
+
+
+def feature_frame_dtypes() -> Dict[str, Any]:
+    """pandas ``read_csv`` dtypes for the columns ``transform`` reads, plus the target.
+
+    Risk columns become categoricals over the engine's vocabulary (unknown values
+    read as missing, code -1). Numeric columns are read as strings and coerced by
+    ``transform``.
+    """
+    import pandas as pd
+
+    return {
+        **{column: pd.CategoricalDtype(list(RISK_MAPS[name])) for name, column, _ in CATEGORICAL_FEATURES},
+        **{column: ("category" if name == "hour" else "string") for name, column, _, _ in NUMERIC_FEATURES},
+        TARGET_COLUMN: "category",
+    }
@@ -5,17 +5,36 @@ Severity is determined by a rule-based system that mirrors real-world patterns:
   - Serious: moderate risk factors present
   - Minor: low risk factors
 This ensures XGBoost can learn genuine patterns.
+
+``python generate_data.py`` writes the 15k-row CSV used by train.py.
+``python generate_data.py --vectorized --rows 20000000 --shards 8 --seed 7``
+draws whole columns with NumPy instead, in parallel shards with independent
+seed streams, and writes one columnar ``.npz`` per shard (see read_shards).
+Output is reproducible for a given seed and shard count.
 """
 from __future__ import annotations
 
+import argparse
 import csv
 import random
+import time
+from multiprocessing import Pool
 from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features import (
+    ALCOHOL_RISK, LICENSE_RISK, LIGHTING_RISK, LOCATION_RISK, ROAD_COND_RISK, ROAD_TYPE_RISK,
+    VEHICLE_RISK, WEATHER_RISK, FeatureEngine,
+)
 
 random.seed(42)
 
 OUTPUT = Path(__file__).resolve().parent.parent / "public" / "data" / "accident_prediction_india.csv"
 N_ROWS = 15000
+SHARD_DIR = Path(__file__).resolve().parent / "generated"
 
 STATES_CITIES = {
     "Maharashtra": ["Mumbai", "Pune", "Nagpur", "Nashik", "Aurangabad"],
@@ -57,12 +76,7 @@ LICENSE_STATUS = ["Valid", "Expired", "None"]
 ALCOHOL = ["Yes", "No"]
 LOCATION_DETAILS = ["Straight Road", "Curve", "Intersection", "Bridge", "Flyover", "T-Junction"]
 
-WEATHER_RISK = {"Clear": 0, "Cloudy": 0.02, "Hazy": 0.06, "Rainy": 0.12, "Foggy": 0.15, "Stormy": 0.22}
-ROAD_COND_RISK = {"Dry": 0, "Wet": 0.06, "Damaged": 0.12, "Under Construction": 0.10}
-LIGHTING_RISK = {"Daylight": 0, "Dusk": 0.04, "Dawn": 0.05, "Dark": 0.12}
-ROAD_TYPE_RISK = {"Urban Road": 0.02, "Village Road": 0.04, "State Highway": 0.08, "National Highway": 0.10, "Expressway": 0.06}
-VEHICLE_RISK = {"Cycle": 0.10, "Pedestrian": 0.12, "Two-Wheeler": 0.10, "Auto-Rickshaw": 0.06, "Car": 0.02, "Bus": 0.04, "Truck": 0.06}
-LOCATION_RISK = {"Straight Road": 0, "Curve": 0.06, "Intersection": 0.08, "T-Junction": 0.06, "Bridge": 0.04, "Flyover": 0.02}
+ENGINE = FeatureEngine()
 
 
 def compute_severity(
@@ -95,14 +109,10 @@ def compute_severity(
         risk += 0.05
 
     # Alcohol
-    if alcohol == "Yes":
-        risk += 0.14
+    risk += ALCOHOL_RISK.get(alcohol, 0.0)
 
     # License
-    if license_status == "None":
-        risk += 0.06
-    elif license_status == "Expired":
-        risk += 0.03
+    risk += LICENSE_RISK[license_status]
 
     # Multiple vehicles
     if num_vehicles >= 4:
@@ -200,6 +210,166 @@ def generate_row() -> dict:
     }
 
 
+# ---------------------------------------------------------------------------
+# Vectorized generator
+# ---------------------------------------------------------------------------
+
+STATES = list(STATES_CITIES)
+CITIES = [city for state in STATES for city in STATES_CITIES[state]]
+CITY_OFFSETS = np.cumsum([0] + [len(STATES_CITIES[s]) for s in STATES])[:-1]
+CITY_COUNTS = np.array([len(STATES_CITIES[s]) for s in STATES])
+TIMES = [f"{h}:{m:02d}" for h in range(24) for m in range(60)]
+SEVERITIES = ["Fatal", "Serious", "Minor"]
+
+# Column name -> vocabulary for every string column (stored as codes)
+VOCABULARIES: Dict[str, List[str]] = {
+    "State Name": STATES,
+    "City Name": CITIES,
+    "Month": MONTHS,
+    "Day of Week": DAYS,
+    "Time of Day": TIMES,
+    "Accident Severity": SEVERITIES,
+    "Vehicle Type Involved": VEHICLE_TYPES,
+    "Weather Conditions": WEATHER,
+    "Road Type": ROAD_TYPES,
+    "Road Condition": ROAD_CONDITIONS,
+    "Lighting Conditions": LIGHTING,
+    "Traffic Control Presence": TRAFFIC_CONTROL,
+    "Driver Gender": GENDERS,
+    "Driver License Status": LICENSE_STATUS,
+    "Alcohol Involvement": ALCOHOL,
+    "Accident Location Details": LOCATION_DETAILS,
+}
+
+COLUMN_ORDER = [
+    "State Name", "City Name", "Year", "Month", "Day of Week", "Time of Day",
+    "Accident Severity", "Number of Vehicles Involved", "Vehicle Type Involved",
+    "Number of Casualties", "Number of Fatalities", "Weather Conditions", "Road Type",
+    "Road Condition", "Lighting Conditions", "Traffic Control Presence", "Speed Limit (km/h)",
+    "Driver Age", "Driver Gender", "Driver License Status", "Alcohol Involvement",
+    "Accident Location Details",
+]
+
+
+def _weighted(rng: np.random.Generator, weights: List[float], n: int) -> np.ndarray:
+    p = np.asarray(weights, dtype=np.float64)
+    return rng.choice(len(p), size=n, p=p / p.sum())
+
+
+def draw_candidates(rng: np.random.Generator, n: int) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Draw ``n`` candidate rows as columns (string columns as codes) plus their risk."""
+    state = rng.integers(0, len(STATES), n)
+    hour = rng.integers(0, 24, n)
+    cols = {
+        "State Name": state,
+        "City Name": CITY_OFFSETS[state] + rng.integers(0, CITY_COUNTS[state]),
+        "Year": rng.integers(2018, 2025, n),
+        "Month": rng.integers(0, len(MONTHS), n),
+        "Day of Week": rng.integers(0, len(DAYS), n),
+        "Time of Day": hour * 60 + rng.integers(0, 60, n),
+        "Number of Vehicles Involved": _weighted(rng, [30, 30, 20, 12, 8], n) + 1,
+        "Vehicle Type Involved": rng.integers(0, len(VEHICLE_TYPES), n),
+        "Weather Conditions": _weighted(rng, [30, 18, 16, 16, 12, 8], n),
+        "Road Type": rng.integers(0, len(ROAD_TYPES), n),
+        "Road Condition": _weighted(rng, [40, 30, 15, 15], n),
+        "Lighting Conditions": _weighted(rng, [40, 25, 18, 17], n),
+        "Traffic Control Presence": rng.integers(0, len(TRAFFIC_CONTROL), n),
+        "Speed Limit (km/h)": rng.integers(20, 131, n),
+        "Driver Age": rng.integers(18, 71, n),
+        "Driver Gender": rng.integers(0, len(GENDERS), n),
+        "Driver License Status": _weighted(rng, [50, 25, 25], n),
+        "Alcohol Involvement": _weighted(rng, [30, 70], n),
+        "Accident Location Details": rng.integers(0, len(LOCATION_DETAILS), n),
+    }
+
+    # Same terms, in the same order, as compute_severity so float sums match exactly
+    speed = cols["Speed Limit (km/h)"]
+    age = cols["Driver Age"]
+    lic = cols["Driver License Status"]
+    nv = cols["Number of Vehicles Involved"]
+    risk = np.zeros(n, dtype=np.float64)
+    risk += ENGINE.risk("weather_risk", WEATHER)[cols["Weather Conditions"]]
+    risk += ENGINE.risk("road_cond_risk", ROAD_CONDITIONS)[cols["Road Condition"]]
+    risk += ENGINE.risk("lighting_risk", LIGHTING)[cols["Lighting Conditions"]]
+    risk += ENGINE.risk("road_type_risk", ROAD_TYPES)[cols["Road Type"]]
+    risk += ENGINE.risk("vehicle_risk", VEHICLE_TYPES)[cols["Vehicle Type Involved"]]
+    risk += ENGINE.risk("location_risk", LOCATION_DETAILS)[cols["Accident Location Details"]]
+    risk += np.select([speed > 100, speed > 80, speed > 60], [0.14, 0.08, 0.04], 0.0)
+    risk += np.select([age < 22, age > 60], [0.06, 0.05], 0.0)
+    risk += ENGINE.risk("alcohol_risk", ALCOHOL)[cols["Alcohol Involvement"]]
+    risk += ENGINE.risk("license_risk", LICENSE_STATUS)[lic]
+    risk += np.select([nv >= 4, nv >= 3], [0.06, 0.03], 0.0)
+    risk += np.where((hour <= 4) | (hour >= 22), 0.04, 0.0)
+    return cols, risk
+
+
+def generate_columns(rng: np.random.Generator, n_rows: int) -> Dict[str, np.ndarray]:
+    """Exactly ``n_rows`` accepted rows; dead-zone rejection is applied as a mask."""
+    parts: List[Dict[str, np.ndarray]] = []
+    remaining = n_rows
+    while remaining > 0:
+        # Roughly a third of candidates fall in the dead zones; oversample to
+        # usually finish in one draw.
+        cols, risk = draw_candidates(rng, int(remaining * 1.6) + 16)
+        keep = ~(((risk >= 0.28) & (risk < 0.40)) | ((risk >= 0.56) & (risk < 0.68)))
+        keep &= np.cumsum(keep) <= remaining
+        part = {name: values[keep] for name, values in cols.items()}
+        risk = risk[keep]
+
+        severity = np.select([risk >= 0.68, risk >= 0.40], [0, 1], 2)
+        n = len(risk)
+        fatal, serious = severity == 0, severity == 1
+        fatalities = np.where(fatal, rng.integers(1, 7, n), np.where(serious, _weighted(rng, [85, 15], n), 0))
+        casualties = np.where(
+            fatal, fatalities + rng.integers(0, 6, n),
+            np.where(serious, rng.integers(1, 9, n), rng.integers(0, 4, n)),
+        )
+        part["Accident Severity"] = severity
+        part["Number of Fatalities"] = fatalities
+        part["Number of Casualties"] = casualties
+        parts.append(part)
+        remaining -= n
+
+    # Every column (vocabulary codes and small integers) fits in int16
+    return {name: np.concatenate([p[name] for p in parts]).astype(np.int16) for name in COLUMN_ORDER}
+
+
+def _generate_shard(args: Tuple[np.random.SeedSequence, int, Path]) -> Tuple[Path, int]:
+    seed_seq, n_rows, path = args
+    columns = generate_columns(np.random.Generator(np.random.PCG64(seed_seq)), n_rows)
+    np.savez(path, **columns)
+    return path, n_rows
+
+
+def generate_vectorized(n_rows: int, seed: int, shards: int, out_dir: Path = SHARD_DIR) -> List[Path]:
+    """Write ``shards`` columnar .npz parts totalling ``n_rows`` rows."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for stale in out_dir.glob("part-*.npz"):
+        stale.unlink()
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+    sizes = [n_rows // shards + (1 if i < n_rows % shards else 0) for i in range(shards)]
+    jobs = [(s, size, out_dir / f"part-{i:05d}.npz") for i, (s, size) in enumerate(zip(seeds, sizes))]
+    if shards == 1:
+        results = [_generate_shard(jobs[0])]
+    else:
+        with Pool(processes=shards) as pool:
+            results = pool.map(_generate_shard, jobs)
+    return [path for path, _ in results]
+
+
+def read_shards(out_dir: Path = SHARD_DIR) -> pd.DataFrame:
+    """Decode the .npz parts into a DataFrame with the CSV's schema."""
+    frames = []
+    for path in sorted(out_dir.glob("part-*.npz")):
+        with np.load(path) as data:
+            frames.append(pd.DataFrame({
+                name: np.asarray(VOCABULARIES[name], dtype=object)[data[name]]
+                if name in VOCABULARIES else data[name].astype(np.int64)
+                for name in COLUMN_ORDER
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+
 def main() -> None:
     rows = []
     while len(rows) < N_ROWS:
@@ -221,5 +391,23 @@ def main() -> None:
     print(f"Saved to {OUTPUT}")
 
 
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Generate the synthetic accident dataset.")
+    parser.add_argument("--vectorized", action="store_true", help="NumPy column generator with sharded .npz output")
+    parser.add_argument("--rows", type=int, default=N_ROWS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--out", type=Path, default=SHARD_DIR)
+    args = parser.parse_args()
+    if not args.vectorized:
+        main()
+        return
+
+    start = time.perf_counter()
+    paths = generate_vectorized(args.rows, args.seed, args.shards, args.out)
+    print(f"Generated {args.rows} rows in {len(paths)} shards under {args.out} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,321 @@
+"""
+Grid index of accident hotspots for map and route-proximity queries.
+
+The accident CSV has no coordinates, only state and city names. Each record is
+placed at its city's coordinates from ``place_coordinates.json``, which is
+imported from the frontend's ``searchCache.ts``. A record whose city is
+unknown falls back to the state's coordinates, or to the mean of the state's
+cities. Records are aggregated at load time into one row per location with
+fatal/serious/minor counts. The locations are bucketed into a regular
+lat/lon grid of ``cell_deg`` cells.
+
+* A bounding-box query visits only the cells overlapping the box.
+* A polyline-buffer query visits the cells within ``buffer_km`` of each
+  segment's bounding box, then keeps the locations within ``buffer_km`` of
+  the polyline (equirectangular distance to each segment).
+
+Results are per-cell severity counts plus the contributing locations. Risk
+scores use the route-scoring severity weights.
+
+Refresh the coordinates after editing searchCache.ts:
+
+    python hotspots.py import ../src/services/searchCache.ts
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from route_scoring import EARTH_RADIUS_KM, SEVERITY_WEIGHTS
+
+BASE_DIR = Path(__file__).resolve().parent
+PLACES_PATH = BASE_DIR / "place_coordinates.json"
+DEFAULT_CELL_DEG = 0.1
+SEVERITIES = ("fatal", "serious", "minor")
+
+_KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+_PLACE_PATTERN = re.compile(
+    r"\{ name: '(?P<name>[^']+)',.*?lat: '(?P<lat>[-\d.]+)', lon: '(?P<lon>[-\d.]+)', "
+    r"type: '(?P<type>\w+)', state: '(?P<state>[^']*)'(?:.*?aliases: \[(?P<aliases>[^\]]*)\])?"
+)
+
+
+def import_search_cache(ts_path: Path) -> Dict:
+    """City and state coordinates from searchCache.ts's CACHED_PLACES."""
+    cities, states = [], []
+    for line in Path(ts_path).read_text(encoding="utf-8").splitlines():
+        match = _PLACE_PATTERN.search(line)
+        if match is None or match["type"] not in ("city", "state"):
+            continue
+        entry = {"name": match["name"], "lat": float(match["lat"]), "lon": float(match["lon"])}
+        if match["type"] == "state":
+            states.append(entry)
+        else:
+            aliases = re.findall(r"'([^']+)'", match["aliases"] or "")
+            cities.append(dict(entry, state=match["state"], aliases=aliases))
+    return {"source": Path(ts_path).name, "cities": cities, "states": states}
+
+
+class Geocoder:
+    """(city, state) -> (lat, lon); state names must match, city names are case-insensitive."""
+
+    def __init__(self, places: Dict) -> None:
+        self._cities: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        by_state: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+        for city in places["cities"]:
+            point = (city["lat"], city["lon"])
+            for name in [city["name"], *city.get("aliases", [])]:
+                self._cities.setdefault((name.lower(), city["state"]), point)
+            by_state[city["state"]].append(point)
+        self._states = {
+            state: (float(np.mean([p[0] for p in points])), float(np.mean([p[1] for p in points])))
+            for state, points in by_state.items()
+        }
+        self._states.update({state["name"]: (state["lat"], state["lon"]) for state in places["states"]})
+
+    @classmethod
+    def load(cls, path: Path = PLACES_PATH) -> "Geocoder":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def locate(self, city: str, state: str) -> Optional[Tuple[float, float, bool]]:
+        """(lat, lon, exact) or None; ``exact`` is False for a state fallback."""
+        point = self._cities.get((str(city).strip().lower(), state))
+        if point is not None:
+            return point[0], point[1], True
+        point = self._states.get(state)
+        if point is not None:
+            return point[0], point[1], False
+        return None
+
+
+def _risk_score(counts: np.ndarray) -> float:
+    total = counts.sum()
+    if not total:
+        return 0.0
+    weights = np.array([SEVERITY_WEIGHTS[s] for s in SEVERITIES])
+    return round(float(counts @ weights / total) * 100, 2)
+
+
+def _segment_distances_km(lat: np.ndarray, lon: np.ndarray, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distance from each location to the nearest polyline segment, and that segment's index.
+
+    Equirectangular projection around each segment; accurate to well under 1% at
+    the few-km buffers this is used with.
+    """
+    best = np.full(len(lat), np.inf)
+    nearest = np.zeros(len(lat), dtype=np.int64)
+    for i in range(len(points) - 1):
+        (lat0, lon0), (lat1, lon1) = points[i], points[i + 1]
+        kx = _KM_PER_DEG * math.cos(math.radians((lat0 + lat1) / 2))
+        ax, ay = (lon1 - lon0) * kx, (lat1 - lat0) * _KM_PER_DEG
+        px, py = (lon - lon0) * kx, (lat - lat0) * _KM_PER_DEG
+        length2 = ax * ax + ay * ay
+        t = np.clip((px * ax + py * ay) / length2, 0.0, 1.0) if length2 > 0 else np.zeros(len(lat))
+        distance = np.hypot(px - t * ax, py - t * ay)
+        closer = distance < best
+        best[closer] = distance[closer]
+        nearest[closer] = i
+    return best, nearest
+
+
+class HotspotIndex:
+    def __init__(
+        self,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        counts: np.ndarray,
+        labels: Sequence[Tuple[str, str, bool]],
+        cell_deg: float = DEFAULT_CELL_DEG,
+        unplaced: int = 0,
+    ) -> None:
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int64)  # (n_locations, 3) in SEVERITIES order
+        self.labels = list(labels)  # (city, state, exact)
+        self.cell_deg = cell_deg
+        self.unplaced = unplaced
+
+        rows = np.floor(self.lat / cell_deg).astype(np.int64)
+        cols = np.floor(self.lon / cell_deg).astype(np.int64)
+        members: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for index, key in enumerate(zip(rows.tolist(), cols.tolist())):
+            members[key].append(index)
+        self.cells = {key: np.array(indices) for key, indices in members.items()}
+        self.cell_names = list(self.cells)
+        self.location_cell = np.empty(len(self.lat), dtype=np.int64)
+        for position, key in enumerate(self.cell_names):
+            self.location_cell[self.cells[key]] = position
+        self._places = [{"name": name, "state": state, "exact": exact} for name, state, exact in self.labels]
+
+    @classmethod
+    def from_csv(
+        cls, data_path: Path, geocoder: Geocoder, cell_deg: float = DEFAULT_CELL_DEG,
+    ) -> "HotspotIndex":
+        # csv rather than pandas: three columns of strings, and the service need not import pandas
+        tally: Dict[Tuple[str, str], np.ndarray] = {}
+        severity_index = {name: i for i, name in enumerate(SEVERITIES)}
+        with open(data_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            state_col, city_col, severity_col = (
+                header.index("State Name"), header.index("City Name"), header.index("Accident Severity"),
+            )
+            for row in reader:
+                if len(row) != len(header):
+                    continue
+                severity = severity_index.get(row[severity_col].strip().lower())
+                if severity is None:
+                    continue
+                key = (row[city_col], row[state_col])
+                counts = tally.get(key)
+                if counts is None:
+                    counts = tally[key] = np.zeros(len(SEVERITIES), dtype=np.int64)
+                counts[severity] += 1
+
+        # Records sharing a point (e.g. every unknown city of a state) share one location
+        merged: Dict[Tuple[float, float], List] = {}
+        unplaced = 0
+        for (city, state), counts in tally.items():
+            located = geocoder.locate(city, state)
+            if located is None:
+                unplaced += int(counts.sum())
+                continue
+            lat, lon, exact = located
+            entry = merged.get((lat, lon))
+            if entry is None:
+                merged[(lat, lon)] = [city if exact else state, state, exact, counts]
+            else:
+                entry[2] = entry[2] and exact
+                entry[3] = entry[3] + counts
+        points = list(merged)
+        return cls(
+            lat=[p[0] for p in points],
+            lon=[p[1] for p in points],
+            counts=np.array([merged[p][3] for p in points]).reshape(-1, len(SEVERITIES)),
+            labels=[tuple(merged[p][:3]) for p in points],
+            cell_deg=cell_deg,
+            unplaced=unplaced,
+        )
+
+    def _cell_range(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Tuple[int, int]]:
+        r0, r1 = math.floor(min_lat / self.cell_deg), math.floor(max_lat / self.cell_deg)
+        c0, c1 = math.floor(min_lon / self.cell_deg), math.floor(max_lon / self.cell_deg)
+        if (r1 - r0 + 1) * (c1 - c0 + 1) > len(self.cells):
+            # A box wider than the data: scanning the occupied cells is cheaper
+            return [key for key in self.cells if r0 <= key[0] <= r1 and c0 <= key[1] <= c1]
+        return [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1) if (r, c) in self.cells]
+
+    def _candidates(self, cells: Sequence[Tuple[int, int]]) -> np.ndarray:
+        if not cells:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.cells[key] for key in cells])
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, min_accidents: int = 1) -> Dict:
+        cells = self._cell_range(min_lat, min_lon, max_lat, max_lon)
+        candidates = self._candidates(cells)
+        inside = (
+            (self.lat[candidates] >= min_lat) & (self.lat[candidates] <= max_lat)
+            & (self.lon[candidates] >= min_lon) & (self.lon[candidates] <= max_lon)
+        )
+        return self._result(candidates[inside], min_accidents)
+
+    def near_polyline(self, points: np.ndarray, buffer_km: float, min_accidents: int = 1) -> Dict:
+        points = np.asarray(points, dtype=np.float64)
+        pad_lat = buffer_km / _KM_PER_DEG
+        cells = set()
+        for i in range(len(points) - 1):
+            segment = points[i:i + 2]
+            pad_lon = buffer_km / (_KM_PER_DEG * max(math.cos(math.radians(np.abs(segment[:, 0]).max())), 1e-6))
+            cells.update(self._cell_range(
+                segment[:, 0].min() - pad_lat, segment[:, 1].min() - pad_lon,
+                segment[:, 0].max() + pad_lat, segment[:, 1].max() + pad_lon,
+            ))
+        candidates = self._candidates(sorted(cells))
+        distances, nearest = _segment_distances_km(self.lat[candidates], self.lon[candidates], points)
+        within = distances <= buffer_km
+        return self._result(candidates[within], min_accidents, distances[within], nearest[within])
+
+    def _result(
+        self, indices: np.ndarray, min_accidents: int,
+        distances: Optional[np.ndarray] = None, nearest: Optional[np.ndarray] = None,
+    ) -> Dict:
+        cells, inverse = np.unique(self.location_cell[indices], return_inverse=True)
+        n_cells = len(cells)
+        counts = np.zeros((n_cells, len(SEVERITIES)), dtype=np.int64)
+        np.add.at(counts, inverse, self.counts[indices])
+        totals = counts.sum(axis=1)
+        # Cell position: record-weighted mean of its matched locations
+        weights = self.counts[indices].sum(axis=1).astype(np.float64)
+        lat = np.bincount(inverse, weights * self.lat[indices], n_cells) / np.maximum(totals, 1)
+        lon = np.bincount(inverse, weights * self.lon[indices], n_cells) / np.maximum(totals, 1)
+        if distances is not None:
+            order = np.lexsort((distances, inverse))  # per cell, nearest location first
+            first = order[np.searchsorted(inverse[order], np.arange(n_cells))]
+
+        members: List[List[int]] = [[] for _ in range(n_cells)]
+        for location, cell in zip(indices.tolist(), inverse.tolist()):
+            members[cell].append(location)
+        weights_by_severity = np.array([SEVERITY_WEIGHTS[s] for s in SEVERITIES])
+        risk = counts @ weights_by_severity / np.maximum(totals, 1) * 100
+
+        hotspots = []
+        for i, (cell, total) in enumerate(zip(cells.tolist(), totals.tolist())):
+            if total < min_accidents:
+                continue
+            row, col = self.cell_names[cell]
+            hotspot = {
+                "cell": f"{row}:{col}",
+                "lat": round(lat[i], 5),
+                "lon": round(lon[i], 5),
+                "total": total,
+                **dict(zip(SEVERITIES, counts[i].tolist())),
+                "risk_score": round(float(risk[i]), 2),
+                "places": [self._places[m] for m in members[i]],
+            }
+            if distances is not None:
+                hotspot["distance_km"] = round(float(distances[first[i]]), 3)
+                hotspot["nearest_segment"] = int(nearest[first[i]])
+            hotspots.append(hotspot)
+
+        hotspots.sort(key=lambda h: (-h["total"], h["cell"]))
+        overall = counts[totals >= min_accidents].sum(axis=0)
+        return {
+            "hotspots": hotspots,
+            "total": int(overall.sum()),
+            **dict(zip(SEVERITIES, overall.tolist())),
+            "risk_score": _risk_score(overall),
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "locations": len(self.lat),
+            "cells": len(self.cells),
+            "cell_deg": self.cell_deg,
+            "records": int(self.counts.sum()),
+            "unplaced_records": self.unplaced,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hotspot index utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    importer = sub.add_parser("import", help="refresh place_coordinates.json from searchCache.ts")
+    importer.add_argument("ts_path", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        places = import_search_cache(args.ts_path)
+        PLACES_PATH.write_text(json.dumps(places, indent=1) + "\n", encoding="utf-8")
+        print(f"Wrote {len(places['cities'])} cities and {len(places['states'])} states to {PLACES_PATH.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Exhaustive precomputed prediction table for categorical-only queries.
+
+``python lookup_table.py`` (run after train.py) enumerates every combination of
+the categorical risk features, all 24 hours and a small grid of speed limit,
+driver age and vehicle counts, scores them once with the trained model and
+stores the class probabilities in a memory-mapped ``.npy`` array. The service
+answers any request whose numeric fields sit on that grid with a single index
+computation; everything else falls through to the model.
+
+Categorical axes hold the distinct risk values (not the raw strings), so
+categories sharing a risk value share a cell and unknown values land on the
+risk-0 cell exactly like the model's own fallback.
+
+A table is keyed to ``artifact.model_fingerprint``, a hash of the model's
+content, so every backend serving the same export uses it. The trainers
+recompile an existing table for each model they write (``refresh_table``).
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+TABLE_PATH = BASE_DIR / "lookup_table.npy"
+TABLE_META_PATH = BASE_DIR / "lookup_table.json"
+
+HOURS = list(range(24))
+
+# Defaults match PredictionRequest, i.e. queries that only describe conditions.
+DEFAULT_GRIDS = {
+    "speed_limit": [50],
+    "driver_age": [35],
+    "num_vehicles": [1],
+}
+
+CHUNK_ROWS = 262_144
+# Rows hashed to tie a table to its meta (see ``_sample_digest``)
+DIGEST_ROWS = 1024
+
+
+def file_fingerprint(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sample_digest(table: np.ndarray) -> str:
+    """Hash of evenly spaced rows: cheap to check on load, and differs between models."""
+    stride = max(1, len(table) // DIGEST_ROWS)
+    return hashlib.sha256(np.ascontiguousarray(table[::stride]).tobytes()).hexdigest()
+
+
+def _matches(table: np.ndarray, meta: Dict) -> bool:
+    """Whether ``table`` is the one ``meta`` was written for, not a leftover from an interrupted swap."""
+    return (table.shape == (int(np.prod(meta["shape"])), len(meta["class_names"]))
+            and meta.get("table_digest") == _sample_digest(table))
+
+
+def _risk_axis(mapping: Mapping[str, float]) -> List[float]:
+    return sorted({float(v) for v in mapping.values()} | {0.0})
+
+
+def compile_table(
+    encoder: Any,
+    lookups: Sequence[Tuple[str, Mapping[str, float]]],
+    fingerprint: str,
+    grids: Optional[Dict[str, List[int]]] = None,
+    table_path: Path = TABLE_PATH,
+    meta_path: Path = TABLE_META_PATH,
+) -> Dict:
+    grids = {**DEFAULT_GRIDS, **(grids or {})}
+
+    # Axis order matches the model's feature order: 8 risk features, hour, numerics.
+    axes: List[List[float]] = [_risk_axis(mapping) for _, mapping in lookups]
+    axes.append([float(h) for h in HOURS])
+    axes.extend([float(v) for v in grids[name]] for name in DEFAULT_GRIDS)
+    shape = tuple(len(axis) for axis in axes)
+    n_cells = int(np.prod(shape))
+    n_classes = len(encoder.class_names)
+
+    print(f"Compiling {n_cells:,} cells {shape} x {n_classes} classes...")
+    # Write beside the live files and swap them in, so a running service that has
+    # the old table mapped never sees a half-written one. The meta goes first and
+    # the table last: the service reloads on the table, and a meta whose table was
+    # never swapped in fails ``_matches``.
+    tmp_path = table_path.with_name(table_path.name + ".tmp")
+    table = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=(n_cells, n_classes)
+    )
+    axis_values = [np.asarray(axis, dtype=np.float64) for axis in axes]
+    for start in range(0, n_cells, CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, n_cells)
+        coords = np.unravel_index(np.arange(start, stop), shape)
+        matrix = np.column_stack([values[idx] for values, idx in zip(axis_values, coords)])
+        table[start:stop] = encoder.predict_matrix(matrix)
+    table.flush()
+    digest = _sample_digest(table)
+    del table
+
+    meta = {
+        "model_fingerprint": fingerprint,
+        "table_digest": digest,
+        "class_names": list(encoder.class_names),
+        "shape": list(shape),
+        "categorical": [
+            {"field": field, "values": axis, "risk": {k: float(v) for k, v in mapping.items()}}
+            for (field, mapping), axis in zip(lookups, axes)
+        ],
+        "grids": grids,
+    }
+    tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+    tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp_meta, meta_path)
+    os.replace(tmp_path, table_path)
+    return meta
+
+
+def refresh_table(
+    encoder: Any, fingerprint: str, table_path: Path = TABLE_PATH, meta_path: Path = TABLE_META_PATH,
+) -> Optional[Dict]:
+    """Recompile an existing table for a new model, on the grids it was compiled with.
+
+    Returns None if no table has been compiled or it already matches.
+    """
+    if not table_path.exists() or not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text())
+    if meta.get("model_fingerprint") == fingerprint and _matches(np.load(table_path, mmap_mode="r"), meta):
+        return None
+    return compile_table(encoder, encoder.engine.lookups, fingerprint, meta.get("grids"), table_path, meta_path)
+
+
+class LookupTable:
+    """Memory-mapped view over a compiled table with O(1) request indexing."""
+
+    def __init__(self, table: np.ndarray, meta: Dict, hour_parser: Any) -> None:
+        self.table = table
+        self.meta = meta
+        self.parse_hour = hour_parser
+        self.hits = 0
+        self.misses = 0
+
+        shape = meta["shape"]
+        strides = [int(np.prod(shape[i + 1:])) for i in range(len(shape))]
+
+        # Categorical field -> {request value: flat offset}; unknowns use the risk-0 cell.
+        self._categorical: List[Tuple[str, Dict[str, int], int]] = []
+        for axis, stride in zip(meta["categorical"], strides):
+            position = {value: i for i, value in enumerate(axis["values"])}
+            offsets = {key: position[risk] * stride for key, risk in axis["risk"].items()}
+            self._categorical.append((axis["field"], offsets, position[0.0] * stride))
+
+        n_categorical = len(self._categorical)
+        self._hour_stride = strides[n_categorical]
+        self._numeric: List[Tuple[str, Dict[int, int]]] = [
+            (name, {value: i * stride for i, value in enumerate(meta["grids"][name])})
+            for name, stride in zip(DEFAULT_GRIDS, strides[n_categorical + 1:])
+        ]
+
+    @classmethod
+    def load(
+        cls,
+        fingerprint: str,
+        hour_parser: Any,
+        table_path: Path = TABLE_PATH,
+        meta_path: Path = TABLE_META_PATH,
+    ) -> Optional["LookupTable"]:
+        """Open the table compiled for the model with ``fingerprint``, or None if it is missing or stale."""
+        if not table_path.exists() or not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        if meta.get("model_fingerprint") != fingerprint:
+            print(f"Ignoring {table_path.name}: compiled for a different model")
+            return None
+        table = np.load(table_path, mmap_mode="r")
+        if not _matches(table, meta):
+            print(f"Ignoring {table_path.name}: does not match {meta_path.name}; recompile it")
+            return None
+        return cls(table, meta, hour_parser)
+
+    def lookup(self, payload: Any) -> Optional[np.ndarray]:
+        """Class probabilities for ``payload`` or None if it is off the grid."""
+        index = 0
+        for name, offsets in self._numeric:
+            offset = offsets.get(getattr(payload, name))
+            if offset is None:
+                self.misses += 1
+                return None
+            index += offset
+        for field, offsets, default in self._categorical:
+            index += offsets.get(getattr(payload, field), default)
+        index += self.parse_hour(payload.time_of_day) * self._hour_stride
+        self.hits += 1
+        return self.table[index]
+
+    def stats(self) -> Dict:
+        return {"cells": len(self.table), "grids": self.meta["grids"], "hits": self.hits, "misses": self.misses}
+
+
+def _parse_grid(text: str) -> List[int]:
+    return sorted({int(v) for v in text.split(",") if v.strip()})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile the precomputed prediction table.")
+    for name, default in DEFAULT_GRIDS.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=_parse_grid, default=default,
+            help=f"comma-separated {name} values to enumerate (default: {default})",
+        )
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BASE_DIR))
+    import app
+
+    model = app.load_model()
+    start = time.perf_counter()
+    meta = compile_table(
+        model.encoder, model.encoder.engine.lookups, model.model_fingerprint,
+        grids={name: getattr(args, name) for name in DEFAULT_GRIDS},
+    )
+    size_mb = TABLE_PATH.stat().st_size / 1e6
+    print(f"Saved {TABLE_PATH.name} ({size_mb:.1f} MB, shape {meta['shape']}) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
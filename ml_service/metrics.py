@@ -0,0 +1,237 @@
+"""
+Minimal Prometheus instrumentation: counters, gauges and histograms rendered
+in the text exposition format, an ASGI middleware for per-route request
+metrics, and a switchable per-stage timer for the handlers.
+
+Stage timing is lap-based: a handler takes ``t = stages.start()`` and calls
+``t = stages.lap("encode", t)`` after each stage. With timing switched off
+both calls return 0 without touching a clock, so the hooks can stay in the hot
+path. Whatever a request spends outside the recorded stages (body parsing,
+validation, response serialization) is recorded as the ``framework`` stage.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# Seconds; tuned for a service whose requests take 50us-50ms
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Owns the metrics; ``collectors`` add gauges computed at scrape time."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[_Metric]]] = []
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs: Any) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, **kwargs))
+
+    def add_collector(self, collect: Callable[[], Iterable[_Metric]]) -> None:
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        metrics = list(self._metrics)
+        for collect in self._collectors:
+            metrics.extend(collect())
+        for metric in metrics:
+            samples = metric.samples()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+# Seconds spent in recorded stages by the current request (set by the middleware)
+_request_stage_seconds: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar(
+    "request_stage_seconds", default=None,
+)
+
+
+class StageTimer:
+    def __init__(self, histogram: Histogram, enabled: bool = True) -> None:
+        self.histogram = histogram
+        self.enabled = enabled
+
+    def start(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, stage: str, started: float) -> float:
+        """Record the time since ``started`` under ``stage``; return the new start."""
+        if not started:
+            return 0.0
+        now = time.perf_counter()
+        elapsed = now - started
+        self.histogram.observe(elapsed, (stage,))
+        spent = _request_stage_seconds.get()
+        if spent is not None:
+            spent[0] += elapsed
+        return now
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request count, latency and in-flight gauge per route."""
+
+    def __init__(
+        self, app: Any, requests: Counter, latency: Histogram, in_flight: Gauge, stages: StageTimer,
+    ) -> None:
+        self.app = app
+        self.requests = requests
+        self.latency = latency
+        self.in_flight = in_flight
+        self.stages = stages
+        self._paths: Optional[frozenset] = None
+
+    def _route(self, scope: Dict) -> str:
+        if self._paths is None:
+            router = scope.get("app")
+            routes = getattr(router, "routes", [])
+            self._paths = frozenset(getattr(route, "path", "") for route in routes)
+        path = scope["path"]
+        # Unknown paths share one label so scanners cannot blow up cardinality
+        return path if path in self._paths else "other"
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = self._route(scope)
+        labels = (route,)
+        status = ["500"]
+
+        async def send_wrapper(message: Dict) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        spent = [0.0]
+        token = _request_stage_seconds.set(spent)
+        self.in_flight.inc(labels)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight.dec(labels)
+            _request_stage_seconds.reset(token)
+            self.latency.observe(elapsed, labels)
+            self.requests.inc((route, scope["method"], status[0]))
+            if self.stages.enabled and spent[0]:
+                self.stages.histogram.observe(max(elapsed - spent[0], 0.0), ("framework",))
@@ -0,0 +1,371 @@
+"""
+Append-only prediction log, written off the request path.
+
+Handlers hand each prediction to ``PredictionLog.submit``, which only appends
+to a bounded in-memory queue. A background thread drains the queue every
+``flush_seconds``, or sooner once ``flush_rows`` are waiting, and writes the
+whole batch with one ``write`` call. A full queue never blocks a request.
+What happens instead depends on the policy:
+
+* ``drop_newest`` discards the incoming rows;
+* ``drop_oldest`` discards the oldest queued rows to make room;
+* ``sample`` keeps each row with a probability that falls from 1 at half full
+  to 0 at full, so a burst is thinned evenly instead of cut off.
+
+Every dropped row is counted.
+
+On disk, a segment is a flat array of fixed-size records next to a JSON
+sidecar that names the columns:
+
+    prediction_log/predictions-<UTC time>-<pid>-<seq>.bin    records
+                   predictions-<UTC time>-<pid>-<seq>.json   columns, class names
+
+A record holds the timestamp, model version, engineered feature vector
+(unscaled, as ``build_dataset`` produces it) and class probabilities. Segments
+rotate at ``segment_bytes``. Each worker process writes its own segments and
+keeps only its newest ``max_segments``. ``read_log`` memory-maps them back
+for ``train.py --prediction-log``.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+LOG_DIR = BASE_DIR / "prediction_log"
+POLICIES = ("drop_newest", "drop_oldest", "sample")
+
+# Engineered features have at most two decimals (risk maps) or are integers; rounding
+# undoes the float32 error of unscaling an encoded request row.
+_FEATURE_DECIMALS = 4
+
+# (timestamp, model, rows, probabilities, rows_are_scaled)
+Entry = Tuple[float, Any, np.ndarray, np.ndarray, bool]
+
+
+def record_dtype(n_features: int, n_classes: int) -> np.dtype:
+    return np.dtype([
+        ("timestamp", "<f8"),
+        ("model_version", "S12"),
+        ("features", "<f4", (n_features,)),
+        ("probabilities", "<f4", (n_classes,)),
+    ])
+
+
+class PredictionLog:
+    def __init__(
+        self,
+        directory: Path = LOG_DIR,
+        max_queue_rows: int = 50_000,
+        policy: str = "drop_newest",
+        flush_rows: int = 4096,
+        flush_seconds: float = 1.0,
+        segment_bytes: int = 64 << 20,
+        max_segments: int = 100,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown prediction log policy {policy!r}; choose from {', '.join(POLICIES)}")
+        self.directory = Path(directory)
+        self.max_queue_rows = max_queue_rows
+        self.policy = policy
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+
+        self._queue: List[Entry] = []
+        self._queued_rows = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Writer state; only touched by the flusher thread (or stop() after it exits)
+        self._file: Optional[Any] = None
+        self._segment_path: Optional[Path] = None
+        self._segment_header: Optional[Tuple] = None
+        self._sequence = 0
+
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        self.segments = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+
+    def submit(
+        self, model: Any, rows: np.ndarray, probabilities: np.ndarray, scaled: bool = True,
+    ) -> None:
+        """Queue predictions for writing. Never blocks and never raises on a full queue.
+
+        ``rows`` are encoded (scaled) request rows unless ``scaled`` is False, in
+        which case they are already the engineered feature values.
+        """
+        rows = np.array(rows, dtype=np.float32 if scaled else np.float64, ndmin=2)  # copies thread buffers
+        probabilities = np.array(probabilities, dtype=np.float32, ndmin=2)
+        n = len(rows)
+        with self._lock:
+            self.submitted += n
+            free = self.max_queue_rows - self._queued_rows
+            if self.policy == "sample" and n:
+                fill = self._queued_rows / self.max_queue_rows
+                keep = min(1.0, 2.0 * (1.0 - fill))
+                if keep < 1.0:
+                    mask = np.random.random(n) < keep
+                    rows, probabilities = rows[mask], probabilities[mask]
+            if len(rows) > free and self.policy == "drop_oldest":
+                free = self._evict(len(rows) - free)
+            if len(rows) > free:
+                rows, probabilities = rows[:max(free, 0)], probabilities[:max(free, 0)]
+            self.dropped += n - len(rows)
+            if len(rows):
+                self._queue.append((time.time(), model, rows, probabilities, scaled))
+                self._queued_rows += len(rows)
+                if self._queued_rows >= self.flush_rows:
+                    self._wake.notify()
+
+    def _evict(self, needed: int) -> int:
+        """Drop the oldest queued rows (lock held); return the free space after."""
+        while needed > 0 and self._queue:
+            timestamp, model, rows, probabilities, scaled = self._queue[0]
+            if len(rows) <= needed:
+                self._queue.pop(0)
+                removed = len(rows)
+            else:
+                self._queue[0] = (timestamp, model, rows[needed:], probabilities[needed:], scaled)
+                removed = needed
+            self._queued_rows -= removed
+            self.dropped += removed
+            needed -= removed
+        return self.max_queue_rows - self._queued_rows
+
+    @property
+    def queue_rows(self) -> int:
+        return self._queued_rows
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write out everything still queued and close the segment."""
+        self._stop.set()
+        with self._lock:
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_seconds + 5)
+            self._thread = None
+        self.flush()
+        self._close_segment()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                self._wake.wait_for(
+                    lambda: self._queued_rows >= self.flush_rows or self._stop.is_set(),
+                    timeout=self.flush_seconds,
+                )
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all queued rows; return how many were written."""
+        with self._lock:
+            entries, self._queue, self._queued_rows = self._queue, [], 0
+        if not entries:
+            return 0
+        try:
+            written = self._write(entries)
+        except OSError as exc:
+            # The log must never take the service down; count the loss and carry on
+            self.write_errors += 1
+            self.dropped += sum(len(rows) for _, _, rows, _, _ in entries)
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            self._close_segment()
+            return 0
+        self.written += written
+        self.flushes += 1
+        return written
+
+    def _write(self, entries: List[Entry]) -> int:
+        # Consecutive entries with the same column layout share one bulk write
+        written = 0
+        start = 0
+        while start < len(entries):
+            header = self._header(entries[start][1])
+            end = start + 1
+            while end < len(entries) and self._header(entries[end][1]) == header:
+                end += 1
+            records = self._records(entries[start:end], header)
+            self._ensure_segment(header, records.nbytes)
+            self._file.write(records.tobytes())
+            written += len(records)
+            start = end
+        self._file.flush()
+        return written
+
+    @staticmethod
+    def _header(model: Any) -> Tuple:
+        encoder = model.encoder
+        return tuple(encoder.feature_columns), tuple(encoder.class_names)
+
+    @staticmethod
+    def _records(entries: List[Entry], header: Tuple) -> np.ndarray:
+        columns, class_names = header
+        lengths = [len(rows) for _, _, rows, _, _ in entries]
+        records = np.empty(sum(lengths), dtype=record_dtype(len(columns), len(class_names)))
+        # Mostly single-row entries: build every column with one concatenate/repeat
+        models = {id(model): model for _, model, _, _, _ in entries}
+        model_ids = np.repeat([id(model) for _, model, _, _, _ in entries], lengths)
+        scaled = np.repeat([scaled for _, _, _, _, scaled in entries], lengths)
+        features = np.concatenate([rows for _, _, rows, _, _ in entries]).astype(np.float64)
+        for key, model in models.items():
+            mask = scaled & (model_ids == key)
+            if mask.any():
+                encoder = model.encoder
+                features[mask] = np.round(features[mask] * encoder.scale + encoder.mean, _FEATURE_DECIMALS)
+        records["timestamp"] = np.repeat([timestamp for timestamp, _, _, _, _ in entries], lengths)
+        records["model_version"] = np.repeat([model.version for _, model, _, _, _ in entries], lengths)
+        records["features"] = features
+        records["probabilities"] = np.concatenate([p for _, _, _, p, _ in entries])
+        return records
+
+    def _ensure_segment(self, header: Tuple, incoming: int) -> None:
+        if self._file is not None and self._segment_header == header and (
+            self._file.tell() == 0 or self._file.tell() + incoming <= self.segment_bytes
+        ):
+            return
+        self._close_segment()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        stem = f"predictions-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{self._sequence:04d}"
+        columns, class_names = header
+        sidecar = {
+            "columns": list(columns),
+            "class_names": list(class_names),
+            "created_at": time.time(),
+            "pid": os.getpid(),
+        }
+        (self.directory / f"{stem}.json").write_text(json.dumps(sidecar), encoding="utf-8")
+        self._segment_path = self.directory / f"{stem}.bin"
+        self._file = open(self._segment_path, "ab")
+        self._segment_header = header
+        self.segments += 1
+        self._prune()
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._segment_header = None
+
+    def _prune(self) -> None:
+        """Keep this worker's newest ``max_segments``.
+
+        Segments of other running workers are theirs to prune: deleting one would
+        silently lose the rows still being written to it. Those left by exited
+        workers count against this worker's quota, so restarts do not grow the log.
+        """
+        if self.max_segments <= 0:
+            return
+        pid = os.getpid()
+        ours = [path for path in segment_paths(self.directory)
+                if segment_pid(path) == pid or not _running(segment_pid(path))]
+        for stale in ours[:-self.max_segments]:
+            if stale == self._segment_path:
+                continue
+            stale.unlink(missing_ok=True)
+            stale.with_suffix(".json").unlink(missing_ok=True)
+
+    def stats(self) -> Dict:
+        return {
+            "directory": str(self.directory),
+            "policy": self.policy,
+            "queue_rows": self._queued_rows,
+            "max_queue_rows": self.max_queue_rows,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "segments": self.segments,
+            "write_errors": self.write_errors,
+            "last_error": self.last_error,
+        }
+
+
+def segment_paths(directory: Path) -> List[Path]:
+    """Segment files, oldest first (names sort by creation time)."""
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("predictions-*.bin"))
+
+
+def segment_pid(path: Path) -> int:
+    """Process id in a segment name (predictions-<UTC time>-<pid>-<seq>); -1 if malformed."""
+    try:
+        return int(path.stem.split("-")[2])
+    except (IndexError, ValueError):
+        return -1
+
+
+def _running(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, owned by another user
+        return True
+    return True
+
+
+def read_log(
+    directory: Path = LOG_DIR, columns: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """All logged records as columns.
+
+    Returns ``features`` (float64, n_rows x n_features), ``probabilities``,
+    ``timestamp``, ``model_version``, ``columns`` and ``class_names``. Segments
+    whose columns differ from ``columns`` (or from the first segment) are
+    skipped. A partly written last record is ignored.
+    """
+    parts: List[np.ndarray] = []
+    layout: Optional[Tuple] = None
+    for path in segment_paths(Path(directory)):
+        sidecar_path = path.with_suffix(".json")
+        if not sidecar_path.exists():
+            continue
+        sidecar = json.loads(sidecar_path.read_text())
+        segment_layout = (tuple(sidecar["columns"]), tuple(sidecar["class_names"]))
+        if columns is not None and segment_layout[0] != tuple(columns):
+            continue
+        if layout is None:
+            layout = segment_layout
+        elif segment_layout != layout:
+            continue
+        dtype = record_dtype(len(layout[0]), len(layout[1]))
+        n_records = path.stat().st_size // dtype.itemsize
+        if n_records:
+            parts.append(np.memmap(path, dtype=dtype, mode="r", shape=(n_records,)))
+
+    if layout is None:
+        layout = (tuple(columns or ()), ())
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=record_dtype(len(layout[0]), len(layout[1])))
+    return {
+        "columns": list(layout[0]),
+        "class_names": list(layout[1]),
+        "timestamp": records["timestamp"],
+        "model_version": records["model_version"].astype(str),
+        "features": records["features"].astype(np.float64),
+        "probabilities": records["probabilities"],
+    }
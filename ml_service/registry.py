@@ -0,0 +1,148 @@
+"""
+Model registry with hot reload.
+
+Everything a request needs from the model (encoder, lookup table, metadata,
+version) lives in one immutable ``LoadedModel``. A handler reads
+``registry.current`` once and uses that snapshot to the end. A reload builds
+the next snapshot off the request path and swaps it in with a single
+assignment, so in-flight requests finish on the model they started with and
+new ones pick up the new model. There is no lock on the read path.
+
+A daemon thread polls the artifact files. A change is only loaded once the
+files have stopped changing for one poll interval, so a model that is still
+being written is never loaded. If a reload fails, the current model keeps
+serving.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+# (file name, mtime_ns, size) of every watched file that exists
+Stamp = Tuple[Tuple[str, int, int], ...]
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    version: str
+    source: Path
+    encoder: Any
+    meta: Optional[Dict] = None
+    lookup_table: Optional[Any] = None
+    bundle: Optional[Dict] = None
+    drift: Optional[Any] = None
+    explainer: Optional[Any] = None
+    risk_surface: Optional[Any] = None
+    # Content hash shared by every exported format (artifact.model_fingerprint)
+    model_fingerprint: Optional[str] = None
+    loaded_at: float = field(default_factory=time.time)
+
+
+def stamp(paths: Sequence[Path]) -> Stamp:
+    entries = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(entries)
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        build: Callable[[], LoadedModel],
+        watched: Sequence[Path],
+        poll_seconds: float = 5.0,
+        on_swap: Optional[Callable[[LoadedModel], None]] = None,
+    ) -> None:
+        self._build = build
+        self.watched = list(watched)
+        self.poll_seconds = poll_seconds
+        self._on_swap = on_swap
+        self._current: Optional[LoadedModel] = None
+        self._stamp: Stamp = ()
+        self._pending: Optional[Stamp] = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def current(self) -> Optional[LoadedModel]:
+        return self._current
+
+    def load(self) -> LoadedModel:
+        """Build a snapshot from the files on disk and make it current."""
+        with self._load_lock:
+            before = stamp(self.watched)
+            model = self._build()
+            # Record what was on disk when the build started; a write that
+            # lands during the build shows up as a change on the next poll.
+            self._stamp = before
+            self._pending = None
+            previous, self._current = self._current, model
+            if previous is not None:
+                self.reloads += 1
+            if self._on_swap is not None:
+                self._on_swap(model)
+            return model
+
+    def reload_if_changed(self) -> bool:
+        """Poll once; reload when the watched files changed and have settled."""
+        now = stamp(self.watched)
+        if now == self._stamp:
+            self._pending = None
+            return False
+        if now != self._pending:
+            self._pending = now  # still being written, or first sighting: wait a poll
+            return False
+        try:
+            model = self.load()
+        except Exception as exc:
+            self.failed_reloads += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            # Do not retry the same broken files on every poll
+            self._stamp, self._pending = now, None
+            print(f"Model reload failed, still serving {self._current.version if self._current else None}: "
+                  f"{self.last_error}")
+            return False
+        print(f"Reloaded model {model.version} from {model.source.name}")
+        return True
+
+    def start(self) -> None:
+        """Start the watcher thread (call in each worker, after any fork)."""
+        if self.poll_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 1)
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            self.reload_if_changed()
+
+    def stats(self) -> Dict:
+        model = self._current
+        return {
+            "version": model.version if model else None,
+            "source": model.source.name if model else None,
+            "loaded_at": round(model.loaded_at, 3) if model else None,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "poll_seconds": self.poll_seconds,
+        }
@@ -0,0 +1,122 @@
+"""
+Risk surfaces for departure-time planning: class probabilities over every
+hour x weather x lighting combination, per road bucket.
+
+A road bucket is a road type, a location detail and a speed limit rounded to
+``speed_step`` km/h. The other features (road condition, vehicle, driver,
+alcohol, licence) are fixed by the surface's context, the ``/predict``
+defaults unless overridden. A bucket's surface is one dense
+``(24, n_weather, n_lighting, n_class)`` float32 block, filled with a single
+batched model call over its 24 x 6 x 4 = 576 rows. After that, a departure-time
+sweep over a route is array indexing: no encoding and no model call.
+
+Blocks live in one preallocated tensor ``(road types + 1, locations + 1,
+speeds, 24, weather, lighting, class)``. The extra slot of each categorical
+axis holds values missing from the risk maps, which the model scores as risk 0.
+``precompute`` fills every bucket (about 290k rows with the default step);
+otherwise ``surfaces`` fills the buckets a query needs on first use. A surface
+belongs to one model snapshot, so a reload starts from a new one.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+HOURS = 24
+SPEED_RANGE = (20, 130)
+DEFAULT_SPEED_STEP = 10
+# Stands for any category missing from the risk map (scored as risk 0)
+UNKNOWN = ""
+
+
+class RiskSurface:
+    def __init__(self, encoder: Any, context: Dict[str, Any], speed_step: int = DEFAULT_SPEED_STEP) -> None:
+        if speed_step < 1:
+            raise ValueError("speed_step must be at least 1")
+        categories = encoder.engine.categories
+        self.encoder = encoder
+        self.context = dict(context)
+        self.road_types: List[str] = list(categories["road_type_risk"])
+        self.locations: List[str] = list(categories["location_risk"])
+        self.weather: List[str] = list(categories["weather_risk"])
+        self.lighting: List[str] = list(categories["lighting_risk"])
+        self.speed_step = speed_step
+        self.speeds = np.arange(SPEED_RANGE[0], SPEED_RANGE[1] + 1, speed_step)
+        self.class_names = encoder.class_names
+
+        shape = (len(self.road_types) + 1, len(self.locations) + 1, len(self.speeds))
+        self.tensor = np.zeros(shape + (HOURS, len(self.weather), len(self.lighting), len(self.class_names)),
+                               dtype=np.float32)
+        self._filled = np.zeros(shape, dtype=bool)
+        self._lock = threading.Lock()
+        self.model_rows = 0
+
+    def bucket(self, road_type: str, location_detail: str, speed_limit: float) -> Tuple[int, int, int]:
+        """Tensor index of the road bucket a segment falls in."""
+        road = self.road_types.index(road_type) if road_type in self.road_types else len(self.road_types)
+        location = self.locations.index(location_detail) if location_detail in self.locations else len(self.locations)
+        speed = int(np.clip(np.floor((speed_limit - SPEED_RANGE[0]) / self.speed_step + 0.5), 0, len(self.speeds) - 1))
+        return road, location, speed
+
+    def _fill(self, buckets: Sequence[Tuple[int, int, int]]) -> None:
+        """Score every hour x weather x lighting row of ``buckets`` in one model call."""
+        if not buckets:
+            return
+        grid = (HOURS, len(self.weather), len(self.lighting))
+        cells = int(np.prod(grid))
+        hour, weather, lighting = (axis.ravel() for axis in np.indices(grid))
+        roads = self.road_types + [UNKNOWN]
+        locations = self.locations + [UNKNOWN]
+        index = np.asarray(buckets)
+        columns = dict(self.context)
+        times = np.array([f"{h:02d}:00" for h in range(HOURS)])
+        columns.update(
+            time_of_day=times[np.tile(hour, len(index))].tolist(),
+            weather=np.array(self.weather)[np.tile(weather, len(index))].tolist(),
+            lighting=np.array(self.lighting)[np.tile(lighting, len(index))].tolist(),
+            road_type=np.repeat([roads[r] for r in index[:, 0]], cells).tolist(),
+            location_detail=np.repeat([locations[k] for k in index[:, 1]], cells).tolist(),
+            speed_limit=np.repeat(self.speeds[index[:, 2]], cells),
+        )
+        probabilities = self.encoder.predict_matrix(self.encoder.transform(columns, n_rows=cells * len(index)))
+        blocks = probabilities.reshape((len(index),) + grid + (len(self.class_names),))
+        self.tensor[index[:, 0], index[:, 1], index[:, 2]] = blocks
+        self._filled[index[:, 0], index[:, 1], index[:, 2]] = True
+        self.model_rows += len(probabilities)
+
+    def precompute(self) -> "RiskSurface":
+        """Fill every bucket."""
+        with self._lock:
+            self._fill([tuple(b) for b in np.argwhere(~self._filled)])
+        return self
+
+    def surfaces(self, buckets: Sequence[Tuple[int, int, int]]) -> np.ndarray:
+        """(len(buckets), 24, n_weather, n_lighting, n_class) probabilities, filling missing buckets first."""
+        index = np.asarray(buckets, dtype=np.intp).reshape(-1, 3)
+        if not self._filled[index[:, 0], index[:, 1], index[:, 2]].all():
+            with self._lock:
+                missing = {tuple(b) for b in index.tolist() if not self._filled[tuple(b)]}
+                self._fill(sorted(missing))
+        return self.tensor[index[:, 0], index[:, 1], index[:, 2]]
+
+    def stats(self) -> Dict:
+        return {
+            "buckets": int(self._filled.size),
+            "filled": int(self._filled.sum()),
+            "speed_step": self.speed_step,
+            "model_rows": self.model_rows,
+            "megabytes": round(self.tensor.nbytes / 1e6, 2),
+        }
+
+
+def index_of(values: Optional[Sequence], choices: Sequence, name: str) -> List[int]:
+    """Positions of ``values`` among ``choices`` (all of them if None); ValueError on unknown values."""
+    if values is None:
+        return list(range(len(choices)))
+    unknown = [value for value in values if value not in choices]
+    if unknown:
+        raise ValueError(f"Unknown {name} {', '.join(map(str, unknown))}; expected one of "
+                         f"{', '.join(map(str, choices))}")
+    return [list(choices).index(value) for value in values]
@@ -0,0 +1,59 @@
+"""
+Helpers for scoring a whole route: segment geometry and risk aggregation.
+
+A route is a polyline of [lat, lon] points; segment i joins point i and i+1.
+Route risk is the length-weighted mean of each segment's expected severity,
+using the same fatal/serious/minor weights (10/5/1) as the frontend's hotspot
+risk score, scaled to 0-100.
+"""
+from __future__ import annotations
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+SEVERITY_WEIGHTS = {"fatal": 1.0, "serious": 0.5, "minor": 0.1}
+
+
+def segment_lengths_km(points: np.ndarray) -> np.ndarray:
+    """Great-circle length of each segment of an (n_points, 2) [lat, lon] array."""
+    lat = np.radians(points[:, 0])
+    lon = np.radians(points[:, 1])
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def segment_risk(probabilities: np.ndarray, class_names: Sequence[str]) -> np.ndarray:
+    """Expected severity (0-1) of each row of class probabilities."""
+    weights = np.array([SEVERITY_WEIGHTS.get(name, 0.0) for name in class_names])
+    return probabilities @ weights
+
+
+def aggregate_route(
+    probabilities: np.ndarray,
+    lengths_km: np.ndarray,
+    class_names: Sequence[str],
+) -> Tuple[Dict[str, float], np.ndarray, Dict[str, float]]:
+    """Length-weighted route probabilities, per-segment risk and route summary."""
+    risk = segment_risk(probabilities, class_names)
+    total_km = float(lengths_km.sum())
+    # Degenerate routes (all points identical) weigh segments equally.
+    weights = lengths_km / total_km if total_km > 0 else np.full(len(lengths_km), 1.0 / len(lengths_km))
+
+    route_probabilities = weights @ probabilities
+    worst = int(risk.argmax())
+    summary = {
+        "length_km": round(total_km, 3),
+        "risk_score": round(float(weights @ risk) * 100, 2),
+        "max_segment_risk_score": round(float(risk[worst]) * 100, 2),
+        "highest_risk_segment": worst,
+    }
+    if "fatal" in class_names:
+        fatal = probabilities[:, list(class_names).index("fatal")]
+        summary["max_fatal_probability"] = round(float(fatal.max()), 4)
+    probs = {name: round(float(p), 4) for name, p in zip(class_names, route_probabilities)}
+    return probs, risk, summary
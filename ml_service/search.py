@@ -0,0 +1,146 @@
+"""
+Hyperparameter search: successive halving over configs with early stopping.
+
+Every config is first scored on a single validation fold; only the best
+1/eta survive to be scored on more folds, until the last survivor has been
+cross-validated on all of them. Each fit uses XGBoost early stopping against
+its validation fold, so trees that would not improve mlogloss are never built.
+
+Fold matrices are built once (QuantileDMatrix, sharing the training fold's
+quantile cuts) and reused by every config and rung. Cores are split
+explicitly: ``fold_workers`` fits run concurrently, each with
+``n_jobs // fold_workers`` XGBoost threads, instead of letting sklearn and
+XGBoost both claim every core.
+"""
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import StratifiedKFold
+
+EARLY_STOPPING_ROUNDS = 50
+# On this near-separable target mlogloss keeps shrinking by tiny amounts long
+# after accuracy has settled; require a meaningful improvement to keep going.
+EARLY_STOPPING_MIN_DELTA = 1e-3
+
+
+def _fold_schedule(n_folds: int, eta: int) -> List[int]:
+    """Number of folds evaluated at each rung: 1, eta, eta^2, ..., n_folds."""
+    schedule = [1]
+    while schedule[-1] < n_folds:
+        schedule.append(min(schedule[-1] * eta, n_folds))
+    return schedule
+
+
+def build_folds(
+    X: np.ndarray, y: np.ndarray, n_folds: int, random_state: int
+) -> List[Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix, np.ndarray]]:
+    cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+    folds = []
+    for train_idx, val_idx in cv.split(X, y):
+        dtrain = xgb.QuantileDMatrix(X[train_idx], y[train_idx])
+        dval = xgb.QuantileDMatrix(X[val_idx], y[val_idx], ref=dtrain)
+        folds.append((dtrain, dval, y[val_idx]))
+    return folds
+
+
+def fit_fold(
+    params: Dict,
+    fold: Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix, np.ndarray],
+    num_classes: int,
+    nthread: int,
+    random_state: int,
+) -> Tuple[float, int]:
+    """Train one config on one fold with early stopping; return (accuracy, rounds)."""
+    dtrain, dval, y_val = fold
+    train_params = {k: v for k, v in params.items() if k != "n_estimators"}
+    train_params.update(
+        objective="multi:softprob",
+        num_class=num_classes,
+        eval_metric="mlogloss",
+        tree_method="hist",
+        nthread=nthread,
+        seed=random_state,
+        verbosity=0,
+    )
+    booster = xgb.train(
+        train_params,
+        dtrain,
+        num_boost_round=params["n_estimators"],
+        evals=[(dval, "val")],
+        callbacks=[xgb.callback.EarlyStopping(
+            rounds=EARLY_STOPPING_ROUNDS, metric_name="mlogloss", min_delta=EARLY_STOPPING_MIN_DELTA,
+        )],
+        verbose_eval=False,
+    )
+    rounds = booster.best_iteration + 1
+    probabilities = booster.predict(dval, iteration_range=(0, rounds))
+    accuracy = float((probabilities.argmax(axis=1) == y_val).mean())
+    return accuracy, rounds
+
+
+def successive_halving(
+    X: np.ndarray,
+    y: np.ndarray,
+    num_classes: int,
+    param_grid: Sequence[Dict],
+    n_folds: int = 5,
+    eta: int = 2,
+    n_jobs: Optional[int] = None,
+    random_state: int = 42,
+    log: Callable[[str], None] = print,
+) -> List[Dict]:
+    """Rank ``param_grid``; returns one result dict per config, best first."""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    folds = build_folds(np.asarray(X, dtype=np.float32), np.asarray(y), n_folds, random_state)
+
+    # (config index, fold index) -> (accuracy, early-stopped rounds)
+    scores: Dict[Tuple[int, int], Tuple[float, int]] = {}
+    survivors = list(range(len(param_grid)))
+    schedule = _fold_schedule(n_folds, eta)
+
+    def summarize(i: int) -> Dict:
+        results = [scores[(i, f)] for f in range(n_folds) if (i, f) in scores]
+        accuracies = np.array([acc for acc, _ in results])
+        return {
+            "params": param_grid[i],
+            "cv_accuracy": float(accuracies.mean()),
+            "cv_std": float(accuracies.std()),
+            "folds": len(results),
+            "best_rounds": int(round(np.mean([rounds for _, rounds in results]))),
+        }
+
+    for rung, rung_folds in enumerate(schedule):
+        tasks = [(i, f) for i in survivors for f in range(rung_folds) if (i, f) not in scores]
+        fold_workers = max(1, min(len(tasks), n_jobs))
+        nthread = max(1, n_jobs // fold_workers)
+        log(f"  Rung {rung + 1}/{len(schedule)}: {len(survivors)} configs x {rung_folds} folds "
+            f"({fold_workers} parallel fits x {nthread} threads)")
+
+        with ThreadPoolExecutor(max_workers=fold_workers) as pool:
+            futures = {
+                task: pool.submit(fit_fold, param_grid[task[0]], folds[task[1]], num_classes, nthread, random_state)
+                for task in tasks
+            }
+            for task, future in futures.items():
+                scores[task] = future.result()
+
+        ranked = sorted(survivors, key=lambda i: summarize(i)["cv_accuracy"], reverse=True)
+        for i in ranked:
+            summary = summarize(i)
+            params = param_grid[i]
+            log(f"    Config {i + 1}: depth={params['max_depth']}, n_est={params['n_estimators']}, "
+                f"lr={params['learning_rate']:.3f} => CV accuracy={summary['cv_accuracy']:.4f} "
+                f"(+/- {summary['cv_std']:.4f}) over {summary['folds']} folds, "
+                f"early-stopped at {summary['best_rounds']} trees")
+        if rung < len(schedule) - 1:
+            survivors = ranked[:max(1, math.ceil(len(ranked) / eta))]
+
+    results = [summarize(i) for i in range(len(param_grid))]
+    # Configs that went further carry the more reliable estimate, so they rank first.
+    return sorted(results, key=lambda r: (r["folds"], r["cv_accuracy"]), reverse=True)
@@ -0,0 +1,297 @@
+"""
+Pre-aggregated accident statistics for dashboard breakdowns.
+
+The CSV is reduced once to a sparse cube, with one cell per distinct
+combination of the dimensions below. Each cell holds the accident count and
+the fatality and casualty sums. Dimension values are small integer codes
+(uint8/uint16) and the measures are integer arrays, about 28 bytes per cell.
+
+With eight dimensions nearly every row is its own cell, so scanning the cells
+costs about as much as scanning the rows. Most dashboard queries touch only a
+few dimensions, though. For every combination of up to ``MAX_VIEW_DIMS``
+dimensions the cube also keeps a dense array of totals (e.g. month x hour x
+severity). A query whose filters and group-by fit one view slices it and sums
+it, which takes microseconds whatever the row count.
+
+Wider queries scan the cells. These are sorted by (state, city, ...), so a
+single state or city filter narrows the scan to a contiguous range via
+``searchsorted``. Group-by sums the selected cells per group key with
+``bincount``. No query ever goes back to the rows.
+
+    cube = StatsCube.from_csv(path, parse_hour)
+    cube.query({"state": ["Delhi"], "weather": ["Rainy", "Foggy"]}, group_by=["month", "severity"])
+"""
+from __future__ import annotations
+
+import csv
+from itertools import combinations
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Query name -> CSV column, in cube sort order (state and city first, for range slicing)
+DIMENSIONS = (
+    ("state", "State Name"),
+    ("city", "City Name"),
+    ("month", "Month"),
+    ("day_of_week", "Day of Week"),
+    ("hour", "Time of Day"),
+    ("weather", "Weather Conditions"),
+    ("road_type", "Road Type"),
+    ("severity", "Accident Severity"),
+)
+MEASURES = (
+    ("fatalities", "Number of Fatalities"),
+    ("casualties", "Number of Casualties"),
+)
+
+# Queries touching at most this many dimensions (filters and group-by together)
+# are answered from dense pre-summed views; ~8 MB for the current label counts
+MAX_VIEW_DIMS = 3
+
+# Calendar order for the dimensions where alphabetical order would be wrong
+_ORDER = {
+    "month": ["January", "February", "March", "April", "May", "June", "July",
+              "August", "September", "October", "November", "December"],
+    "day_of_week": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+}
+
+
+def _to_int(value: str) -> int:
+    try:
+        return int(float(value))
+    except ValueError:
+        return 0
+
+
+def _sorted_labels(dimension: str, values: Sequence[str]) -> List[str]:
+    if dimension == "hour":
+        return sorted(values, key=int)
+    order = _ORDER.get(dimension)
+    if order is not None:
+        return sorted(values, key=lambda v: (order.index(v) if v in order else len(order), v))
+    return sorted(values)
+
+
+class StatsCube:
+    def __init__(
+        self,
+        labels: Mapping[str, Sequence[str]],
+        codes: Mapping[str, np.ndarray],
+        count: np.ndarray,
+        sums: Mapping[str, np.ndarray],
+        max_view_dims: int = MAX_VIEW_DIMS,
+    ) -> None:
+        self.labels = {name: list(labels[name]) for name, _ in DIMENSIONS}
+        self.codes = {name: np.asarray(codes[name]) for name, _ in DIMENSIONS}
+        self.count = np.asarray(count)
+        self.sums = {name: np.asarray(sums[name]) for name, _ in MEASURES}
+        self._lookup = {
+            name: {label.lower(): code for code, label in enumerate(values)} for name, values in self.labels.items()
+        }
+        self._build_views(max_view_dims)
+
+    @classmethod
+    def from_csv(
+        cls, data_path: Path, parse_hour: Callable[[str], int], max_view_dims: int = MAX_VIEW_DIMS,
+    ) -> "StatsCube":
+        tally: Dict[Tuple[str, ...], List[int]] = {}
+        with open(data_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            dimension_cols = [header.index(column) for _, column in DIMENSIONS]
+            measure_cols = [header.index(column) for _, column in MEASURES]
+            hour_position = [name for name, _ in DIMENSIONS].index("hour")
+            hours: Dict[str, str] = {}
+            for row in reader:
+                if len(row) != len(header):
+                    continue
+                key = [row[i] for i in dimension_cols]
+                time_of_day = key[hour_position]
+                hour = hours.get(time_of_day)
+                if hour is None:
+                    hour = hours[time_of_day] = str(parse_hour(time_of_day))
+                key[hour_position] = hour
+                cell = tally.get(tuple(key))
+                if cell is None:
+                    cell = tally[tuple(key)] = [0] * (1 + len(MEASURES))
+                cell[0] += 1
+                for j, i in enumerate(measure_cols, start=1):
+                    cell[j] += _to_int(row[i])
+        return cls.from_cells(tally, max_view_dims)
+
+    @classmethod
+    def from_cells(
+        cls, tally: Mapping[Tuple[str, ...], Sequence[int]], max_view_dims: int = MAX_VIEW_DIMS,
+    ) -> "StatsCube":
+        """Build from {(dimension values...): (count, *measure sums)}."""
+        keys = list(tally)
+        labels, columns = {}, []
+        for position, (name, _) in enumerate(DIMENSIONS):
+            values = _sorted_labels(name, {key[position] for key in keys})
+            index = {value: code for code, value in enumerate(values)}
+            dtype = np.uint8 if len(values) <= 256 else np.uint16 if len(values) <= 65536 else np.uint32
+            labels[name] = values
+            columns.append(np.fromiter((index[key[position]] for key in keys), dtype=dtype, count=len(keys)))
+        values = np.array([tally[key] for key in keys], dtype=np.int64).reshape(len(keys), 1 + len(MEASURES))
+
+        order = np.lexsort(columns[::-1]) if keys else np.empty(0, dtype=np.int64)
+        count = values[order, 0]
+        return cls(
+            labels=labels,
+            codes={name: column[order] for (name, _), column in zip(DIMENSIONS, columns)},
+            count=count.astype(np.int32 if count.max(initial=0) < 2**31 else np.int64),
+            sums={name: values[order, j] for j, (name, _) in enumerate(MEASURES, start=1)},
+            max_view_dims=max_view_dims,
+        )
+
+    @property
+    def dimensions(self) -> List[str]:
+        return [name for name, _ in DIMENSIONS]
+
+    def _range(self, filters: Mapping[str, Sequence[str]]) -> Tuple[int, int]:
+        """Contiguous cell range implied by a single state (and single city) filter."""
+        start, stop = 0, len(self.count)
+        for name in ("state", "city"):
+            values = filters.get(name)
+            if not values or len(values) != 1:
+                break
+            code = self._lookup[name].get(str(values[0]).lower())
+            if code is None:
+                return 0, 0
+            column = self.codes[name][start:stop]
+            left = int(np.searchsorted(column, code, side="left"))
+            right = int(np.searchsorted(column, code, side="right"))
+            start, stop = start + left, start + right
+        return start, stop
+
+    def _accepted(self, name: str, values: Sequence[str]) -> np.ndarray:
+        """Codes of the filter values that exist (case-insensitive), ascending."""
+        codes = {self._lookup[name].get(str(value).lower()) for value in values}
+        return np.array(sorted(code for code in codes if code is not None), dtype=np.intp)
+
+    def _build_views(self, max_dims: int) -> None:
+        """Dense (measure, *dimension sizes) totals for every combination of up to ``max_dims`` dimensions."""
+        measures = [self.count, *self.sums.values()]
+        self.views: Dict[Tuple[str, ...], np.ndarray] = {(): np.array([m.sum() for m in measures], dtype=np.int64)}
+        if max_dims <= 0:
+            return
+        for combo in combinations(self.dimensions, min(max_dims, len(DIMENSIONS))):
+            shape = tuple(len(self.labels[name]) for name in combo)
+            keys = np.ravel_multi_index([self.codes[name] for name in combo], shape) if len(self.count) else []
+            size = int(np.prod(shape))
+            self.views[combo] = np.stack([
+                np.bincount(keys, weights=values, minlength=size).astype(np.int64).reshape(shape)
+                for values in measures
+            ])
+        # Smaller views are sums of a view that contains them
+        for k in range(min(max_dims, len(DIMENSIONS)) - 1, 0, -1):
+            for combo in combinations(self.dimensions, k):
+                parent = next(p for p in self.views if len(p) == k + 1 and set(combo) <= set(p))
+                dropped = next(i for i, name in enumerate(parent) if name not in combo)
+                self.views[combo] = self.views[parent].sum(axis=dropped + 1)
+
+    def query(
+        self,
+        filters: Optional[Mapping[str, Sequence[str]]] = None,
+        group_by: Sequence[str] = (),
+        limit: Optional[int] = None,
+    ) -> Dict:
+        """Measure totals over the cells matching ``filters``, per ``group_by`` combination.
+
+        ``filters`` maps a dimension to accepted values (case-insensitive; unknown
+        values match nothing). Groups are ordered by count, largest first.
+        """
+        filters = {name: values for name, values in (filters or {}).items() if values}
+        group_by = list(dict.fromkeys(group_by))
+        unknown = sorted(set(filters) - set(self.dimensions)) + sorted(set(group_by) - set(self.dimensions))
+        if unknown:
+            raise ValueError(f"Unknown dimension(s) {', '.join(unknown)}; choose from {', '.join(self.dimensions)}")
+
+        involved = tuple(name for name in self.dimensions if name in filters or name in group_by)
+        if involved in self.views:
+            keys, sums, axis_codes, source = self._from_view(involved, filters, group_by)
+        else:
+            keys, sums, axis_codes, source = self._from_cells(filters, group_by)
+
+        # keys: mixed-radix group keys (group_by order) of the non-empty groups; sums: (measure, group)
+        measure_names = ["count", *self.sums]
+        result: Dict = {
+            "total": {name: int(sums[i].sum()) for i, name in enumerate(measure_names)},
+            "source": source,
+        }
+        if not group_by:
+            return result
+        order = np.argsort(-sums[0], kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        shape = tuple(len(axis_codes[name]) for name in group_by)
+        positions = np.unravel_index(keys[order], shape)
+        label_columns = [
+            (name, [self.labels[name][code] for code in axis_codes[name][position].tolist()])
+            for name, position in zip(group_by, positions)
+        ]
+        value_columns = [(name, sums[i, order].tolist()) for i, name in enumerate(measure_names)]
+        result["groups"] = [
+            {**{name: column[i] for name, column in label_columns}, **{name: column[i] for name, column in value_columns}}
+            for i in range(len(order))
+        ]
+        result["group_count"] = len(keys)
+        return result
+
+    def _from_view(
+        self, involved: Tuple[str, ...], filters: Mapping[str, Sequence[str]], group_by: Sequence[str],
+    ) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray], str]:
+        view = self.views[involved]
+        axis_codes = {}
+        for axis, name in enumerate(involved, start=1):
+            if name in filters:
+                axis_codes[name] = self._accepted(name, filters[name])
+                view = np.take(view, axis_codes[name], axis=axis)
+            else:
+                axis_codes[name] = np.arange(view.shape[axis])
+        summed = tuple(axis for axis, name in enumerate(involved, start=1) if name not in group_by)
+        if summed:
+            view = view.sum(axis=summed)
+        kept = [name for name in involved if name in group_by]
+        flat = view.transpose(0, *[kept.index(name) + 1 for name in group_by]).reshape(len(view), -1)
+        keys = np.flatnonzero(flat[0])
+        return keys, flat[:, keys], axis_codes, f"view:{'+'.join(involved) or 'total'}"
+
+    def _from_cells(
+        self, filters: Mapping[str, Sequence[str]], group_by: Sequence[str],
+    ) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray], str]:
+        start, stop = self._range(filters)
+        mask = np.ones(stop - start, dtype=bool)
+        for name, values in filters.items():
+            accepted = np.zeros(len(self.labels[name]), dtype=bool)
+            accepted[self._accepted(name, values)] = True
+            mask &= accepted[self.codes[name][start:stop]]
+        selected = np.flatnonzero(mask) + start
+        measures = [values[selected] for values in (self.count, *self.sums.values())]
+
+        shape = tuple(len(self.labels[name]) for name in group_by)
+        keys = np.zeros(len(selected), dtype=np.int64)
+        for name, size in zip(group_by, shape):
+            keys = keys * size + self.codes[name][selected]
+        size = int(np.prod(shape))
+        if size <= max(4 * len(selected), 1 << 16):
+            dense = np.stack([np.bincount(keys, weights=m, minlength=size) for m in measures]).astype(np.int64)
+            groups = np.flatnonzero(dense[0])
+            sums = dense[:, groups]
+        else:
+            # Too many possible groups for a dense array: sum only the ones present
+            groups, inverse = np.unique(keys, return_inverse=True)
+            sums = np.stack([np.bincount(inverse, weights=m, minlength=len(groups)) for m in measures]).astype(np.int64)
+        axis_codes = {name: np.arange(n) for name, n in zip(group_by, shape)}
+        return groups, sums, axis_codes, f"cells:{stop - start}"
+
+    def stats(self) -> Dict:
+        nbytes = self.count.nbytes + sum(c.nbytes for c in self.codes.values()) + sum(s.nbytes for s in self.sums.values())
+        return {
+            "cells": len(self.count),
+            "rows": int(self.count.sum()),
+            "bytes": nbytes,
+            "dimensions": {name: len(values) for name, values in self.labels.items()},
+        }
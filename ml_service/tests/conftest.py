@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The service modules are flat files in ml_service/, imported by name
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
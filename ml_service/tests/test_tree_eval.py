@@ -0,0 +1,86 @@
+"""
+tree_eval parity against ``pipeline.predict_proba`` on a held-out split.
+
+A small scaler + XGBoost pipeline is trained on synthetic rows with the
+service's 12 feature columns, so the check runs in seconds without model.joblib.
+"""
+from __future__ import annotations
+
+import shutil
+
+import numpy as np
+import pytest
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+import tree_eval
+from compress import quantize
+from features import FEATURE_COLUMNS
+from tree_eval import PARITY_TOLERANCE, TreeEnsemble, export_trees, flatten_booster, verify_parity
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, len(FEATURE_COLUMNS))).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 8] > 0).astype(int) + (X[:, 9] > 0.8).astype(int)
+    # Missing values exercise each split's default direction
+    X[rng.random(X.shape) < 0.02] = np.nan
+    X_train, X_test, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    pipeline = Pipeline(steps=[
+        ("scale", StandardScaler()),
+        ("model", XGBClassifier(n_estimators=40, max_depth=4, learning_rate=0.3, objective="multi:softprob",
+                                random_state=42, n_jobs=1, verbosity=0)),
+    ]).fit(X_train, y_train)
+    scaled = pipeline.named_steps["scale"].transform(X_test).astype(np.float32)
+    return pipeline, scaled, pipeline.predict_proba(X_test)
+
+
+def _native_available() -> bool:
+    return tree_eval._load_native() is not None
+
+
+@pytest.mark.parametrize("backend", ["numpy", "native"])
+def test_backend_matches_predict_proba(fitted, backend):
+    if backend == "native" and not _native_available():
+        pytest.skip("no C compiler for the native kernel")
+    pipeline, scaled, expected = fitted
+    ensemble = TreeEnsemble(flatten_booster(pipeline.named_steps["model"].get_booster()), backend=backend)
+    assert ensemble.backend == backend
+    assert verify_parity(ensemble, scaled, expected) <= PARITY_TOLERANCE
+
+
+def test_exported_file_matches_predict_proba(fitted, tmp_path):
+    pipeline, scaled, expected = fitted
+    path = tmp_path / "model_trees.npz"
+    export_trees(pipeline.named_steps["model"].get_booster(), path)
+    assert verify_parity(TreeEnsemble.load(path), scaled, expected) <= PARITY_TOLERANCE
+
+
+def test_quantized_export_matches_quantized_booster(fitted, tmp_path):
+    pipeline, scaled, _ = fitted
+    booster, record = quantize(pipeline.named_steps["model"].get_booster(), "float16", "int8")
+    path = tmp_path / "model_trees.npz"
+    export_trees(booster, path, quantization=record)
+    assert verify_parity(TreeEnsemble.load(path), scaled, booster.inplace_predict(scaled)) <= PARITY_TOLERANCE
+
+
+def test_failed_build_returns_none(tmp_path, monkeypatch):
+    source = tmp_path / "tree_eval.c"
+    shutil.copy(tree_eval.NATIVE_SOURCE, source)
+    monkeypatch.setenv("CC", "false")  # a "compiler" that always fails
+    assert tree_eval.build_native(source, tmp_path / "_tree_eval.so") is None
+    assert list(tmp_path.iterdir()) == [source]  # no temp library left behind
+
+
+def test_falls_back_to_numpy_when_build_fails(fitted, monkeypatch):
+    pipeline, scaled, expected = fitted
+    monkeypatch.setattr(tree_eval, "build_native", lambda: None)
+    arrays = flatten_booster(pipeline.named_steps["model"].get_booster())
+    ensemble = TreeEnsemble(arrays)
+    assert ensemble.backend == "numpy"
+    assert verify_parity(ensemble, scaled, expected) <= PARITY_TOLERANCE
+    with pytest.raises(RuntimeError):
+        TreeEnsemble(arrays, backend="native")
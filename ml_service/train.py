@@ -1,75 +1,49 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
 import json
+import os
+import time
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 
 import joblib
 import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.compose import ColumnTransformer
-from sklearn.model_selection import StratifiedKFold, cross_val_score, train_test_split
+from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import LabelEncoder, OneHotEncoder, StandardScaler
 from xgboost import XGBClassifier
 
+from artifact import LEAN_MODEL_PATH, export_lean_artifact, model_fingerprint
+from compress import DEFAULT_TOLERANCE as COMPRESSION_TOLERANCE, apply_compression, compress
+from drift import build_reference
+from encoder import FeatureEncoder
+from explain import global_importance
+from feature_cache import load_dataset
+from features import FEATURE_COLUMNS, RISK_MAPS, TARGET_COLUMN, FeatureEngine
+from lookup_table import TABLE_PATH, refresh_table
+from prediction_log import read_log
+from search import successive_halving
+from tree_eval import TREES_PATH, TreeEnsemble, verify_parity
+
 BASE_DIR = Path(__file__).resolve().parent
 DATA_PATH = BASE_DIR.parent / "public" / "data" / "accident_prediction_india.csv"
 MODEL_PATH = BASE_DIR / "model.joblib"
 META_PATH = BASE_DIR / "model_meta.json"
 
-TARGET_COLUMN = "Accident Severity"
-
-
-# ---------------------------------------------------------------------------
-# Risk mappings (domain knowledge — how each factor contributes to severity)
-# ---------------------------------------------------------------------------
-
-WEATHER_RISK = {"Clear": 0, "Cloudy": 0.02, "Hazy": 0.06, "Rainy": 0.12, "Foggy": 0.15, "Stormy": 0.22}
-ROAD_COND_RISK = {"Dry": 0, "Wet": 0.06, "Damaged": 0.12, "Under Construction": 0.10}
-LIGHTING_RISK = {"Daylight": 0, "Dusk": 0.04, "Dawn": 0.05, "Dark": 0.12}
-ROAD_TYPE_RISK = {"Urban Road": 0.02, "Village Road": 0.04, "State Highway": 0.08, "National Highway": 0.10, "Expressway": 0.06}
-VEHICLE_RISK = {"Cycle": 0.10, "Pedestrian": 0.12, "Two-Wheeler": 0.10, "Auto-Rickshaw": 0.06, "Car": 0.02, "Bus": 0.04, "Truck": 0.06}
-LOCATION_RISK = {"Straight Road": 0, "Curve": 0.06, "Intersection": 0.08, "T-Junction": 0.06, "Bridge": 0.04, "Flyover": 0.02}
-
-
-def parse_hour(time_str: str) -> int:
-    try:
-        parts = time_str.strip().split(":")
-        return max(0, min(23, int(parts[0])))
-    except Exception:
-        return 0
+ENGINE = FeatureEngine(RISK_MAPS)
 
 
 def build_dataset(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
-    data = df.dropna(subset=[TARGET_COLUMN]).copy()
-
-    # Map categorical features to their risk contribution (domain knowledge)
-    data["weather_risk"] = data["Weather Conditions"].map(WEATHER_RISK).fillna(0)
-    data["road_cond_risk"] = data["Road Condition"].map(ROAD_COND_RISK).fillna(0)
-    data["lighting_risk"] = data["Lighting Conditions"].map(LIGHTING_RISK).fillna(0)
-    data["road_type_risk"] = data["Road Type"].map(ROAD_TYPE_RISK).fillna(0)
-    data["vehicle_risk"] = data["Vehicle Type Involved"].map(VEHICLE_RISK).fillna(0)
-    data["location_risk"] = data["Accident Location Details"].map(LOCATION_RISK).fillna(0)
-    data["alcohol_risk"] = (data["Alcohol Involvement"].astype(str) == "Yes").astype(float) * 0.14
-    data["license_risk"] = data["Driver License Status"].map({"Valid": 0.0, "Expired": 0.03, "None": 0.06}).fillna(0)
-
-    # Raw numeric features that feed into severity rules
-    data["hour"] = data["Time of Day"].astype(str).map(parse_hour)
-    data["speed_limit"] = pd.to_numeric(data["Speed Limit (km/h)"], errors="coerce").fillna(50).astype(int)
-    data["driver_age"] = pd.to_numeric(data["Driver Age"], errors="coerce").fillna(35).astype(int)
-    data["num_vehicles"] = pd.to_numeric(data["Number of Vehicles Involved"], errors="coerce").fillna(1).astype(int)
-
-    categorical_cols = []
-    numeric_cols = [
-        "weather_risk", "road_cond_risk", "lighting_risk", "road_type_risk",
-        "vehicle_risk", "location_risk", "alcohol_risk", "license_risk",
-        "hour", "speed_limit", "driver_age", "num_vehicles",
-    ]
-
-    features = data[numeric_cols]
+    """Engineered features and target for a CSV read with ``READ_CSV_OPTIONS``."""
+    data = df[df[TARGET_COLUMN].notna()]
+    features = pd.DataFrame(ENGINE.transform(data), columns=FEATURE_COLUMNS, index=data.index)
     target = data[TARGET_COLUMN].astype(str)
-    return features, target, categorical_cols, numeric_cols
+    return features, target, [], list(FEATURE_COLUMNS)
 
 
 # ---------------------------------------------------------------------------
@@ -85,79 +59,216 @@ PARAM_GRID = [
 ]
 
 
-def train_model() -> None:
+def save_bundle(bundle: dict, path: Path = MODEL_PATH) -> None:
+    """Dump beside ``path`` and rename, so a running service never loads a partial file."""
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(bundle, tmp)
+    os.replace(tmp, path)
+
+
+def refresh_lookup_table(bundle: dict) -> None:
+    """Recompile lookup_table.npy, if one was compiled, for the model about to be saved.
+
+    Runs before the model files change, so the service's reload finds a matching table.
+    """
+    encoder = FeatureEncoder.from_bundle(bundle)
+    started = time.perf_counter()
+    if refresh_table(encoder, model_fingerprint(encoder.booster, encoder.mean, encoder.scale, encoder.class_names)):
+        print(f"Recompiled {TABLE_PATH.name} for the new model in {time.perf_counter() - started:.1f}s")
+
+
+def write_meta(meta: dict, path: Path = META_PATH) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def data_snapshot(path: Path) -> dict:
+    """Size, row count and hash of the CSV's complete lines, for train_incremental.py.
+
+    A partly written last line is left out, so it is picked up as a new row later.
+    """
+    digest = hashlib.sha256()
+    size = newlines = 0
+    pending = b""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            block = pending + block
+            cut = block.rfind(b"\n") + 1
+            digest.update(block[:cut])
+            size += cut
+            newlines += block.count(b"\n", 0, cut)
+            pending = block[cut:]
+    return {"bytes": size, "rows": max(newlines - 1, 0), "sha256": digest.hexdigest()}
+
+
+def load_logged_predictions(
+    log_dir: Path, numeric_cols: list, label_encoder: LabelEncoder, min_confidence: float,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Rows from the service's prediction log, labelled with the served class.
+
+    The log holds no ground truth, so only predictions at least
+    ``min_confidence`` sure are used (pseudo-labels).
+    """
+    log = read_log(log_dir, columns=numeric_cols)
+    classes = {name.lower(): code for code, name in enumerate(label_encoder.classes_)}
+    if not len(log["features"]) or any(name not in classes for name in log["class_names"]):
+        return pd.DataFrame(columns=numeric_cols, dtype=np.float64), np.empty(0, dtype=np.int64)
+    confident = log["probabilities"].max(axis=1) >= min_confidence
+    codes = np.array([classes[name] for name in log["class_names"]])
+    labels = codes[log["probabilities"][confident].argmax(axis=1)]
+    return pd.DataFrame(log["features"][confident], columns=numeric_cols), labels
+
+
+def with_booster(pipeline: Pipeline, booster) -> Pipeline:
+    """A pipeline sharing ``pipeline``'s fitted scaler whose model step serves ``booster``."""
+    model = XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return Pipeline(steps=pipeline.steps[:-1] + [("model", model)])
+
+
+def train_model(
+    prediction_log: Optional[Path] = None,
+    min_confidence: float = 0.9,
+    compression_tolerance: Optional[float] = COMPRESSION_TOLERANCE,
+) -> None:
     if not DATA_PATH.exists():
         raise FileNotFoundError(f"Dataset not found at {DATA_PATH}")
 
     print("Loading dataset...")
-    df = pd.read_csv(DATA_PATH)
-    features, target, categorical_cols, numeric_cols = build_dataset(df)
+    snapshot = data_snapshot(DATA_PATH)
+    features, target, categorical_cols, numeric_cols = load_dataset(DATA_PATH)
 
     label_encoder = LabelEncoder()
     y = label_encoder.fit_transform(target)
     num_classes = len(label_encoder.classes_)
-
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ("num", StandardScaler(), numeric_cols),
-        ]
-    )
+    n_jobs = os.cpu_count() or 1
 
     print(f"Dataset: {len(features)} rows, {len(categorical_cols)} cat + {len(numeric_cols)} num features")
     print(f"Classes: {list(label_encoder.classes_)}")
-    print(f"Trying {len(PARAM_GRID)} hyperparameter configs...\n")
 
-    best_accuracy = 0.0
-    best_pipeline = None
-    best_params = None
+    # The hold-out split is set aside before the search so it never influences model selection
+    X_train, X_test, y_train, y_test = train_test_split(
+        features, y, test_size=0.15, random_state=42, stratify=y
+    )
+    # Compression settings are chosen on a slice of the real training rows, for the same reason
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.15, random_state=42, stratify=y_train
+    )
+
+    # The drift reference describes the CSV only: logged rows are the live traffic it is compared with
+    reference_features = features[numeric_cols].to_numpy(dtype=np.float64)
+
+    # Logged predictions only ever join the training side; the hold-out split stays real data
+    logged_rows = 0
+    if prediction_log is not None:
+        logged, logged_y = load_logged_predictions(prediction_log, numeric_cols, label_encoder, min_confidence)
+        logged_rows = len(logged)
+        print(f"Prediction log: {logged_rows} rows at confidence >= {min_confidence} from {prediction_log}")
+        if logged_rows:
+            X_train = pd.concat([X_train, logged], ignore_index=True)
+            y_train = np.concatenate([y_train, logged_y])
+            X_fit = pd.concat([X_fit, logged], ignore_index=True)
+            y_fit = np.concatenate([y_fit, logged_y])
+            features = pd.concat([features, logged], ignore_index=True)
+            y = np.concatenate([y, logged_y])
+
+    # Trees are invariant to the StandardScaler, so the search runs on raw features
+    print(f"Searching {len(PARAM_GRID)} hyperparameter configs (successive halving, early stopping)...\n")
+    results = successive_halving(X_train.to_numpy(), y_train, num_classes, PARAM_GRID, n_jobs=n_jobs)
+    best = results[0]
+    best_accuracy = best["cv_accuracy"]
+    best_params = dict(best["params"], n_estimators=best["best_rounds"])
+
+    print(f"\nBest CV accuracy: {best_accuracy:.4f} with params: {best_params}")
 
-    for i, params in enumerate(PARAM_GRID):
-        model = XGBClassifier(
-            **params,
+    best_pipeline = Pipeline(steps=[
+        ("preprocess", ColumnTransformer(transformers=[("num", StandardScaler(), numeric_cols)])),
+        ("model", XGBClassifier(
+            **best_params,
             objective="multi:softprob",
             num_class=num_classes,
             eval_metric="mlogloss",
             use_label_encoder=False,
             random_state=42,
-            n_jobs=-1,
+            n_jobs=n_jobs,
             verbosity=0,
-        )
-        pipeline = Pipeline(steps=[("preprocess", preprocessor), ("model", model)])
-
-        # 5-fold stratified cross-validation
-        cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-        scores = cross_val_score(pipeline, features, y, cv=cv, scoring="accuracy", n_jobs=-1)
-        mean_acc = scores.mean()
-
-        print(f"  Config {i+1}/{len(PARAM_GRID)}: depth={params['max_depth']}, "
-              f"n_est={params['n_estimators']}, lr={params['learning_rate']:.3f} "
-              f"=> CV accuracy={mean_acc:.4f} (+/- {scores.std():.4f})")
-
-        if mean_acc > best_accuracy:
-            best_accuracy = mean_acc
-            best_params = params
-            best_pipeline = pipeline
-
-    print(f"\nBest CV accuracy: {best_accuracy:.4f} with params: {best_params}")
-
-    # Final fit on full data for deployment, but also evaluate on a hold-out
-    X_train, X_test, y_train, y_test = train_test_split(
-        features, y, test_size=0.15, random_state=42, stratify=y
-    )
+        )),
+    ])
 
     best_pipeline.fit(X_train, y_train)
     test_accuracy = best_pipeline.score(X_test, y_test)
     print(f"Hold-out test accuracy: {test_accuracy:.4f}")
 
+    def scaled(pipeline: Pipeline, X: pd.DataFrame) -> np.ndarray:
+        scaler = pipeline.named_steps["preprocess"].named_transformers_["num"]
+        return ((X[numeric_cols].to_numpy(dtype=np.float64) - scaler.mean_) / scaler.scale_).astype(np.float32)
+
+    # Smallest truncated/pruned/quantized booster still within tolerance. It is chosen
+    # on a model fitted without the validation rows, then replayed on best_pipeline
+    # and scored on the untouched hold-out
+    compression, quantization = None, None
+    deployed = best_pipeline
+    if compression_tolerance is not None:
+        probe = clone(best_pipeline).fit(X_fit, y_fit)
+        _, _, compression = compress(
+            probe.named_steps["model"].get_booster(), scaled(probe, X_val), y_val,
+            best_params["learning_rate"], compression_tolerance,
+        )
+        settings = compression["settings"]
+        booster, quantization = apply_compression(
+            best_pipeline.named_steps["model"].get_booster(), settings, best_params["learning_rate"],
+        )
+        deployed = with_booster(best_pipeline, booster)
+        full_test_accuracy, test_accuracy = test_accuracy, deployed.score(X_test, y_test)
+        compression.update(validation_rows=len(X_val), full_test_accuracy=round(float(full_test_accuracy), 4),
+                           test_accuracy=round(float(test_accuracy), 4))
+        print(f"Compressed {compression['full_trees']} -> {compression['trees']} trees, "
+              f"{compression['full_nodes']} -> {compression['nodes']} nodes "
+              f"(rounds {settings['rounds']}, prune gamma {settings['gamma']}, "
+              f"{settings['thresholds']} thresholds, {settings['leaves']} leaves): "
+              f"validation accuracy {compression['full_accuracy']:.4f} -> {compression['accuracy']:.4f}, "
+              f"hold-out accuracy {full_test_accuracy:.4f} -> {test_accuracy:.4f}")
+
+    # The drift reference for outputs needs predictions on rows the model has not seen;
+    # after the refit below, the hold-out rows are part of the training data
+    reference_probabilities = deployed.predict_proba(X_test)
+
     # If test accuracy is high enough, refit on full data for max deployment performance
     if test_accuracy >= 0.95:
         print("Refitting on full dataset for deployment...")
         best_pipeline.fit(features, y)
+        deployed = best_pipeline
+        if compression is not None:
+            # Same settings again; the refit has no unseen rows to choose on
+            booster, quantization = apply_compression(
+                best_pipeline.named_steps["model"].get_booster(), compression["settings"], best_params["learning_rate"],
+            )
+            deployed = with_booster(best_pipeline, booster)
+
+    bundle = {"pipeline": deployed, "label_encoder": label_encoder,
+              "categorical_cols": categorical_cols, "numeric_cols": numeric_cols}
+    refresh_lookup_table(bundle)
+    save_bundle(bundle, MODEL_PATH)
+    export_lean_artifact(deployed, label_encoder, numeric_cols, RISK_MAPS, quantization=quantization)
+
+    # The flattened trees must score the whole hold-out split like the pipeline does
+    trees = TreeEnsemble.load(TREES_PATH)
+    scaled_test = scaled(deployed, X_test)
+    test_probabilities = deployed.predict_proba(X_test)
+    parity = verify_parity(trees, scaled_test, test_probabilities)
+    print(f"tree_eval ({trees.backend}) parity on {len(X_test)} hold-out rows: max |diff| {parity:.2e}")
+
+    # Served by GET /explain/global
+    feature_importance = global_importance(
+        deployed.named_steps["model"].get_booster(), scaled_test, numeric_cols, label_encoder.classes_,
+    )
+    print("Mean |SHAP| on the hold-out: " + ", ".join(
+        f"{name} {value:.3f}" for name, value in list(feature_importance["mean_abs"].items())[:5]))
 
-    joblib.dump(
-        {"pipeline": best_pipeline, "label_encoder": label_encoder,
-         "categorical_cols": categorical_cols, "numeric_cols": numeric_cols},
-        MODEL_PATH,
+    # Reference distributions the service's drift monitor compares live traffic against
+    drift_reference = build_reference(
+        numeric_cols, reference_features, label_encoder.classes_, reference_probabilities,
     )
 
     meta = {
@@ -167,13 +278,35 @@ def train_model() -> None:
         "best_cv_accuracy": round(float(best_accuracy), 4),
         "test_accuracy": round(float(test_accuracy), 4),
         "best_params": best_params,
+        "drift_reference": drift_reference,
+        "feature_importance": feature_importance,
+        "data_snapshot": snapshot,
+        "full_fit_snapshot": snapshot,
     }
-    META_PATH.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    if compression is not None:
+        meta["compression"] = compression
+    if prediction_log is not None:
+        meta["prediction_log_rows"] = logged_rows
+    write_meta(meta, META_PATH)
 
-    print(f"\nModel saved to {MODEL_PATH}")
+    print(f"\nModel saved to {MODEL_PATH} (lean artifact: {LEAN_MODEL_PATH.name})")
     print(f"Metadata saved to {META_PATH}")
     print(f"Final reported accuracy: {test_accuracy:.4f}")
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search, train and export the severity model.")
+    parser.add_argument("--prediction-log", type=Path, default=None,
+                        help="also train on rows from the service's prediction log directory")
+    parser.add_argument("--min-confidence", type=float, default=0.9,
+                        help="only use logged predictions at least this confident")
+    parser.add_argument("--compression-tolerance", type=float, default=COMPRESSION_TOLERANCE,
+                        help="largest hold-out accuracy drop the compressed model may have")
+    parser.add_argument("--no-compress", action="store_true", help="deploy the full booster")
+    args = parser.parse_args()
+    train_model(args.prediction_log, args.min_confidence,
+                None if args.no_compress else args.compression_tolerance)
+
+
 if __name__ == "__main__":
-    train_model()
+    main()
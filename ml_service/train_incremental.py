@@ -0,0 +1,206 @@
+"""
+Incremental refresh: append trees to the deployed booster using only the rows
+added to the CSV since the last fit.
+
+Every fit records ``data_snapshot`` (size, row count and hash of the CSV) in
+``model_meta.json``. Full fits also record ``full_fit_snapshot``. New reports
+are appended to the CSV, so an incremental run:
+
+1. checks that the CSV still starts with exactly the bytes it was last fit on
+   (otherwise the file was rewritten and a full ``train.py`` run is needed);
+2. reads only the bytes after the full-fit snapshot and engineers them like
+   ``train_streaming.py``;
+3. splits the rows by ``holdout_mask`` on their file position. Masked rows
+   since the full fit form the rolling hold-out, and no model is ever trained
+   on them. Unmasked rows since the last fit are the training rows;
+4. continues the current booster for ``--rounds`` more trees (``xgb_model``)
+   with the scaler and hyperparameters unchanged;
+5. publishes the model, lean artifact, flattened trees and meta only if
+   hold-out accuracy did not drop by more than ``--tolerance``. The running
+   service then picks them up through hot reload.
+
+    python train_incremental.py --rounds 50
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from xgboost import XGBClassifier
+
+from artifact import export_lean_artifact
+from explain import global_importance
+from features import READ_CSV_OPTIONS, RISK_MAPS
+from train import DATA_PATH, META_PATH, MODEL_PATH, data_snapshot, refresh_lookup_table, save_bundle, write_meta
+from train_streaming import RAW_DTYPES, engineer_chunk, holdout_mask
+from tree_eval import TREES_PATH, TreeEnsemble, verify_parity
+
+DEFAULT_ROUNDS = 50
+DEFAULT_TOLERANCE = 0.0
+# Newest held-out rows to validate on, and the fewest worth deciding on
+ROLLING_HOLDOUT_ROWS = 5000
+MIN_HOLDOUT_ROWS = 200
+
+
+def _prefix_sha256(path: Path, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = size
+        while remaining:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def read_rows_since(path: Path, offset: int, end: int) -> pd.DataFrame:
+    """The CSV rows stored in bytes [offset, end), parsed with the file's header."""
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        body = f.read(end - offset)
+    return pd.read_csv(io.BytesIO(header + body), usecols=list(RAW_DTYPES), dtype=RAW_DTYPES, **READ_CSV_OPTIONS)
+
+
+def split_new_rows(
+    raw: pd.DataFrame, first_row: int, last_fit_rows: int,
+) -> Tuple[Tuple[np.ndarray, pd.Series], Tuple[np.ndarray, pd.Series]]:
+    """(training rows added since the last fit, rolling hold-out rows since the full fit)."""
+    positions = np.arange(first_row, first_row + len(raw))
+    held_out = holdout_mask(positions)
+    train = engineer_chunk(raw[~held_out & (positions >= last_fit_rows)])
+    holdout_features, holdout_target = engineer_chunk(raw[held_out])
+    holdout = (holdout_features[-ROLLING_HOLDOUT_ROWS:], holdout_target.iloc[-ROLLING_HOLDOUT_ROWS:])
+    return train, holdout
+
+
+def accuracy(booster: xgb.Booster, scaled: np.ndarray, y: np.ndarray) -> float:
+    return float((booster.inplace_predict(scaled).argmax(axis=1) == y).mean())
+
+
+def train_incremental(
+    data_path: Path = DATA_PATH,
+    rounds: int = DEFAULT_ROUNDS,
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_holdout: int = MIN_HOLDOUT_ROWS,
+) -> Dict:
+    """Run one incremental refresh; return a summary including whether it was published."""
+    start = time.perf_counter()
+    if not META_PATH.exists() or not MODEL_PATH.exists():
+        raise FileNotFoundError("No trained model to continue from; run train.py first")
+    meta = json.loads(META_PATH.read_text())
+    last_fit, full_fit = meta.get("data_snapshot"), meta.get("full_fit_snapshot")
+    if not last_fit or not full_fit:
+        raise ValueError(f"{META_PATH.name} has no data snapshot; run train.py once to record one")
+
+    current = data_snapshot(data_path)
+    if current["bytes"] < last_fit["bytes"] or _prefix_sha256(data_path, last_fit["bytes"]) != last_fit["sha256"]:
+        raise ValueError(f"{data_path.name} no longer starts with the rows the model was fit on; run train.py")
+    summary: Dict = {"new_rows": current["rows"] - last_fit["rows"], "published": False}
+    if summary["new_rows"] <= 0:
+        print("No rows added since the last fit; nothing to do")
+        return summary
+
+    raw = read_rows_since(data_path, full_fit["bytes"], current["bytes"])
+    (X_new, target_new), (X_holdout, target_holdout) = split_new_rows(raw, full_fit["rows"], last_fit["rows"])
+    summary.update(train_rows=len(X_new), holdout_rows=len(X_holdout))
+    print(f"{summary['new_rows']} new rows: {len(X_new)} to train on, "
+          f"{len(X_holdout)} in the rolling hold-out since the last full fit")
+    if len(X_new) == 0:
+        print("Every new row is held out; nothing to train on yet")
+        return summary
+    if len(X_holdout) < min_holdout:
+        print(f"Rolling hold-out has {len(X_holdout)} rows (< {min_holdout}); not enough to validate, not publishing")
+        return summary
+
+    bundle = joblib.load(MODEL_PATH)
+    pipeline, label_encoder = bundle["pipeline"], bundle["label_encoder"]
+    unknown = sorted(set(target_new) - set(label_encoder.classes_))
+    if unknown:
+        raise ValueError(f"New rows contain classes the model was not trained on: {unknown}; run train.py")
+    scaler = pipeline.named_steps["preprocess"].named_transformers_["num"]
+    booster = pipeline.named_steps["model"].get_booster()
+
+    def scale(features: np.ndarray) -> np.ndarray:
+        return ((features - scaler.mean_) / scaler.scale_).astype(np.float32)
+
+    y_new = label_encoder.transform(target_new)
+    y_holdout = label_encoder.transform(target_holdout)
+    holdout_scaled = scale(X_holdout)
+    before = accuracy(booster, holdout_scaled, y_holdout)
+
+    params = {k: v for k, v in meta.get("best_params", {}).items() if k != "n_estimators"}
+    params.update(
+        objective="multi:softprob",
+        num_class=len(label_encoder.classes_),
+        eval_metric="mlogloss",
+        nthread=os.cpu_count() or 1,
+        seed=42,
+        verbosity=0,
+    )
+    n_trees_before = booster.num_boosted_rounds()
+    updated = xgb.train(params, xgb.DMatrix(scale(X_new), label=y_new), num_boost_round=rounds, xgb_model=booster)
+    after = accuracy(updated, holdout_scaled, y_holdout)
+    summary.update(accuracy_before=round(before, 4), accuracy_after=round(after, 4),
+                   trees=updated.num_boosted_rounds())
+    print(f"Rolling hold-out accuracy: {before:.4f} -> {after:.4f} "
+          f"({n_trees_before} -> {updated.num_boosted_rounds()} trees)")
+    if after < before - tolerance:
+        print(f"Accuracy regressed by more than {tolerance:.4f}; keeping the current model")
+        return summary
+
+    model = XGBClassifier()
+    model.load_model(bytearray(updated.save_raw("ubj")))
+    pipeline.steps[-1] = ("model", model)
+    bundle = dict(bundle, pipeline=pipeline)
+    refresh_lookup_table(bundle)
+    save_bundle(bundle, MODEL_PATH)
+    export_lean_artifact(pipeline, label_encoder, list(bundle["numeric_cols"]), RISK_MAPS)
+    parity = verify_parity(TreeEnsemble.load(TREES_PATH), holdout_scaled, updated.inplace_predict(holdout_scaled))
+    print(f"tree_eval parity on the hold-out: max |diff| {parity:.2e}")
+
+    meta["feature_importance"] = global_importance(
+        updated, holdout_scaled, list(bundle["numeric_cols"]), label_encoder.classes_,
+    )
+    meta["best_params"] = dict(meta.get("best_params", {}), n_estimators=updated.num_boosted_rounds())
+    meta["data_snapshot"] = current
+    meta["incremental"] = {
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "rounds_added": updated.num_boosted_rounds() - n_trees_before,
+        "train_rows": len(X_new),
+        "holdout_rows": len(X_holdout),
+        "holdout_accuracy_before": round(before, 4),
+        "holdout_accuracy_after": round(after, 4),
+        "updates_since_full_fit": meta.get("incremental", {}).get("updates_since_full_fit", 0) + 1,
+    }
+    write_meta(meta, META_PATH)
+    summary["published"] = True
+    print(f"Published in {time.perf_counter() - start:.1f}s")
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Continue the deployed model on newly appended rows.")
+    parser.add_argument("--data", type=Path, default=DATA_PATH)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="trees to append")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="largest hold-out accuracy drop that still publishes")
+    parser.add_argument("--min-holdout", type=int, default=MIN_HOLDOUT_ROWS)
+    args = parser.parse_args()
+    train_incremental(args.data, args.rounds, args.tolerance, args.min_holdout)
+
+
+if __name__ == "__main__":
+    main()
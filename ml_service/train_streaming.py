@@ -0,0 +1,286 @@
+"""
+Chunked, bounded-memory training for accident logs larger than RAM.
+
+The CSV is never loaded whole. Only the columns ``build_dataset`` uses are
+read, with explicit dtypes, and the risk columns are read as categoricals with
+fixed categories, so each risk map becomes one array index over category codes.
+Training makes a few passes over the file:
+
+1. fit the StandardScaler incrementally and collect the target classes;
+2. stream scaled chunks into XGBoost through a ``DataIter`` backed by an
+   external-memory ``DMatrix`` (pages are cached on disk, not in RAM),
+   early-stopping on the validation rows;
+3. score the hold-out rows chunk by chunk.
+
+A row belongs to the training, validation or hold-out set by a hash of its
+position in the file, so the split is deterministic without materialising an
+index. The hold-out is never used to choose the model, so its accuracy is the
+one reported. Hyperparameters
+come from the last full search (``model_meta.json``), or fall back to the
+first PARAM_GRID config.
+
+    python train_streaming.py --data /path/to/accidents.csv --chunksize 200000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from xgboost import XGBClassifier
+
+from artifact import export_lean_artifact
+from drift import HistogramSketch, probability_sketch
+from explain import IMPORTANCE_SAMPLE_ROWS, global_importance
+from search import EARLY_STOPPING_MIN_DELTA, EARLY_STOPPING_ROUNDS
+from tree_eval import TreeEnsemble, flatten_booster, verify_parity
+from features import FEATURE_COLUMNS, READ_CSV_OPTIONS, RISK_MAPS, TARGET_COLUMN, feature_frame_dtypes
+from train import (
+    DATA_PATH, ENGINE, META_PATH, MODEL_PATH, PARAM_GRID, data_snapshot, refresh_lookup_table, save_bundle,
+    write_meta,
+)
+
+DEFAULT_CHUNKSIZE = 100_000
+HOLDOUT_FRACTION = 0.15
+# Early-stopping rows, taken from what would otherwise be training rows
+VALIDATION_FRACTION = 0.1
+SPLITS = ("train", "validation", "holdout")
+
+NUMERIC_COLS = FEATURE_COLUMNS
+
+# Risk columns are read as categoricals over the engine's vocabulary, so each
+# risk map is one array index over category codes. Numeric columns are read as
+# strings and coerced, matching build_dataset on malformed rows.
+RAW_DTYPES: Dict[str, object] = feature_frame_dtypes()
+
+
+def read_chunks(path: Path, chunksize: int) -> Iterator[pd.DataFrame]:
+    return pd.read_csv(path, usecols=list(RAW_DTYPES), dtype=RAW_DTYPES, chunksize=chunksize, **READ_CSV_OPTIONS)
+
+
+def engineer_chunk(chunk: pd.DataFrame) -> Tuple[np.ndarray, pd.Series]:
+    """Same features as ``build_dataset`` for one chunk, as an (n, 12) float64 array."""
+    chunk = chunk[chunk[TARGET_COLUMN].notna()]
+    return ENGINE.transform(chunk), chunk[TARGET_COLUMN].astype(str)
+
+
+def _split_bucket(row_index: np.ndarray) -> np.ndarray:
+    """Deterministic pseudo-random bucket in [0, 10000) from the row's file position."""
+    mixed = (row_index.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(40)
+    return mixed % np.uint64(10_000)
+
+
+def holdout_mask(row_index: np.ndarray, fraction: float = HOLDOUT_FRACTION) -> np.ndarray:
+    return _split_bucket(row_index) < np.uint64(int(fraction * 10_000))
+
+
+def validation_mask(row_index: np.ndarray, fraction: float = VALIDATION_FRACTION) -> np.ndarray:
+    """The buckets right after the hold-out's, so the two sets never overlap."""
+    bucket = _split_bucket(row_index)
+    start = np.uint64(int(HOLDOUT_FRACTION * 10_000))
+    return (bucket >= start) & (bucket < start + np.uint64(int(fraction * 10_000)))
+
+
+def iter_split(path: Path, chunksize: int, split: str) -> Iterator[Tuple[np.ndarray, pd.Series]]:
+    """Engineered (features, target) chunks of the training, validation or hold-out rows."""
+    if split not in SPLITS:
+        raise ValueError(f"split must be one of {', '.join(SPLITS)}")
+    offset = 0
+    for chunk in read_chunks(path, chunksize):
+        positions = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        if split == "holdout":
+            mask = holdout_mask(positions)
+        elif split == "validation":
+            mask = validation_mask(positions)
+        else:
+            mask = ~holdout_mask(positions) & ~validation_mask(positions)
+        features, target = engineer_chunk(chunk[mask])
+        if len(features):
+            yield features, target
+
+
+class FeatureChunkIter(xgb.DataIter):
+    """Feeds scaled feature chunks to XGBoost; XGBoost calls reset() per pass."""
+
+    def __init__(
+        self,
+        make_chunks: Callable[[], Iterator[Tuple[np.ndarray, pd.Series]]],
+        scaler: StandardScaler,
+        label_encoder: LabelEncoder,
+        cache_prefix: str,
+    ) -> None:
+        self._make_chunks = make_chunks
+        self._scaler = scaler
+        self._label_encoder = label_encoder
+        self._chunks: Optional[Iterator] = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data: Callable) -> int:
+        if self._chunks is None:
+            self._chunks = self._make_chunks()
+        try:
+            features, target = next(self._chunks)
+        except StopIteration:
+            return 0
+        scaled = ((features - self._scaler.mean_) / self._scaler.scale_).astype(np.float32)
+        input_data(data=scaled, label=self._label_encoder.transform(target))
+        return 1
+
+    def reset(self) -> None:
+        self._chunks = None
+
+
+def fit_preprocessing(path: Path, chunksize: int) -> Tuple[ColumnTransformer, LabelEncoder, int]:
+    """Pass 1: incremental scaler fit on the training rows plus the class set."""
+    preprocessor: Optional[ColumnTransformer] = None
+    classes: set = set()
+    n_rows = 0
+    for features, target in iter_split(path, chunksize, "train"):
+        frame = pd.DataFrame(features, columns=NUMERIC_COLS)
+        if preprocessor is None:
+            preprocessor = ColumnTransformer(transformers=[("num", StandardScaler(), NUMERIC_COLS)])
+            preprocessor.fit(frame)
+        else:
+            preprocessor.named_transformers_["num"].partial_fit(frame)
+        classes.update(target.unique())
+        n_rows += len(features)
+    if preprocessor is None:
+        raise ValueError(f"No training rows found in {path}")
+    label_encoder = LabelEncoder().fit(sorted(classes))
+    return preprocessor, label_encoder, n_rows
+
+
+def _best_params() -> Dict:
+    if META_PATH.exists():
+        params = json.loads(META_PATH.read_text()).get("best_params")
+        if params:
+            return params
+    return PARAM_GRID[0]
+
+
+def train_model_streaming(data_path: Path = DATA_PATH, chunksize: int = DEFAULT_CHUNKSIZE) -> None:
+    if not data_path.exists():
+        raise FileNotFoundError(f"Dataset not found at {data_path}")
+
+    snapshot = data_snapshot(data_path)
+    print(f"Pass 1: fitting scaler over {data_path.name} in chunks of {chunksize}...")
+    preprocessor, label_encoder, n_train = fit_preprocessing(data_path, chunksize)
+    scaler = preprocessor.named_transformers_["num"]
+    num_classes = len(label_encoder.classes_)
+    print(f"Training rows: {n_train}, classes: {list(label_encoder.classes_)}")
+
+    params = _best_params()
+    train_params = {k: v for k, v in params.items() if k != "n_estimators"}
+    train_params.update(
+        objective="multi:softprob",
+        num_class=num_classes,
+        eval_metric="mlogloss",
+        tree_method="hist",
+        nthread=os.cpu_count() or 1,
+        seed=42,
+        verbosity=0,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="xgb-extmem-") as cache_dir:
+        train_iter = FeatureChunkIter(
+            lambda: iter_split(data_path, chunksize, "train"),
+            scaler, label_encoder, os.path.join(cache_dir, "train"),
+        )
+        validation_iter = FeatureChunkIter(
+            lambda: iter_split(data_path, chunksize, "validation"),
+            scaler, label_encoder, os.path.join(cache_dir, "validation"),
+        )
+        print("Pass 2: building external-memory DMatrix and training...")
+        dtrain = xgb.DMatrix(train_iter)
+        dvalidation = xgb.DMatrix(validation_iter)
+        booster = xgb.train(
+            train_params,
+            dtrain,
+            num_boost_round=params["n_estimators"],
+            evals=[(dvalidation, "validation")],
+            callbacks=[xgb.callback.EarlyStopping(
+                rounds=EARLY_STOPPING_ROUNDS, metric_name="mlogloss", min_delta=EARLY_STOPPING_MIN_DELTA,
+            )],
+            verbose_eval=False,
+        )
+        rounds = booster.best_iteration + 1
+        booster = booster[:rounds]
+        print(f"Early-stopped at {rounds} trees")
+
+    print("Pass 3: scoring hold-out rows...")
+    trees = TreeEnsemble(flatten_booster(booster))
+    correct = total = 0
+    parity = 0.0
+    importance_rows: List[np.ndarray] = []
+    # Drift reference over the hold-out rows; feature bin edges come from the first chunk
+    feature_sketch: Optional[HistogramSketch] = None
+    output_sketch = probability_sketch(label_encoder.classes_)
+    for features, target in iter_split(data_path, chunksize, "holdout"):
+        scaled = ((features - scaler.mean_) / scaler.scale_).astype(np.float32)
+        probabilities = booster.inplace_predict(scaled)
+        parity = max(parity, verify_parity(trees, scaled, probabilities))
+        if feature_sketch is None:
+            feature_sketch = HistogramSketch.fit(NUMERIC_COLS, features)
+        else:
+            feature_sketch.update(features)
+        output_sketch.update(probabilities)
+        if sum(map(len, importance_rows)) < IMPORTANCE_SAMPLE_ROWS:
+            importance_rows.append(scaled[:IMPORTANCE_SAMPLE_ROWS])
+        correct += int((probabilities.argmax(axis=1) == label_encoder.transform(target)).sum())
+        total += len(target)
+    test_accuracy = correct / total if total else 0.0
+    print(f"Hold-out test accuracy: {test_accuracy:.4f} ({total} rows)")
+    print(f"tree_eval ({trees.backend}) parity: max |diff| {parity:.2e}")
+
+    model = XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    pipeline = Pipeline(steps=[("preprocess", preprocessor), ("model", model)])
+
+    bundle = {"pipeline": pipeline, "label_encoder": label_encoder,
+              "categorical_cols": [], "numeric_cols": NUMERIC_COLS}
+    refresh_lookup_table(bundle)
+    save_bundle(bundle, MODEL_PATH)
+    export_lean_artifact(pipeline, label_encoder, NUMERIC_COLS, RISK_MAPS)
+    meta = {
+        "features_categorical": [],
+        "features_numeric": NUMERIC_COLS,
+        "target_classes": list(label_encoder.classes_),
+        "test_accuracy": round(float(test_accuracy), 4),
+        "best_params": dict(params, n_estimators=rounds),
+        "training_rows": n_train,
+        "streaming": True,
+        "data_snapshot": snapshot,
+        "full_fit_snapshot": snapshot,
+    }
+    if importance_rows:
+        meta["feature_importance"] = global_importance(
+            booster, np.concatenate(importance_rows)[:IMPORTANCE_SAMPLE_ROWS], NUMERIC_COLS, label_encoder.classes_,
+        )
+    if feature_sketch is not None:
+        meta["drift_reference"] = {"features": feature_sketch.to_dict(), "probabilities": output_sketch.to_dict()}
+    write_meta(meta, META_PATH)
+
+    print(f"\nModel saved to {MODEL_PATH}")
+    print(f"Metadata saved to {META_PATH}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train on a CSV too large for memory.")
+    parser.add_argument("--data", type=Path, default=DATA_PATH)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+    train_model_streaming(args.data, args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
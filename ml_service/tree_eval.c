@@ -0,0 +1,73 @@
+/*
+ * Native kernel for tree_eval.TreeEnsemble. Built on demand by tree_eval.py
+ * with the system C compiler:
+ *
+ *     cc -O3 -shared -fPIC [-fopenmp] tree_eval.c -o _tree_eval.so
+ *
+ * Nodes are packed 16 bytes apiece (children, split feature, threshold; a
+ * leaf points to itself and keeps its value in the threshold slot). Rows are
+ * walked in blocks, tree-major within a block, so a tree's nodes stay in cache
+ * while every row of the block passes through it. Margins are accumulated in
+ * float, tree by tree, and the softmax is computed in float, the same way
+ * XGBoost's CPU predictor does it.
+ */
+#include <math.h>
+#include <stdint.h>
+
+#define BLOCK_ROWS 64
+
+typedef struct {
+    int32_t left;
+    int32_t right;
+    int32_t feature;
+    float threshold;  /* leaf value for leaves */
+} node_t;
+
+void predict_proba(
+    const float *X, int64_t n_rows, int64_t n_features,
+    const node_t *nodes, const uint8_t *default_left,
+    const int32_t *roots, const int32_t *tree_class,
+    int64_t n_trees, int32_t n_class, float base_score, float *out)
+{
+    int64_t block;
+#pragma omp parallel for schedule(static)
+    for (block = 0; block < n_rows; block += BLOCK_ROWS) {
+        int64_t end = block + BLOCK_ROWS < n_rows ? block + BLOCK_ROWS : n_rows;
+        int64_t r, t;
+        int32_t k;
+
+        for (r = block; r < end; r++)
+            for (k = 0; k < n_class; k++)
+                out[r * n_class + k] = base_score;
+
+        for (t = 0; t < n_trees; t++) {
+            const int32_t root = roots[t];
+            const int32_t cls = tree_class[t];
+            for (r = block; r < end; r++) {
+                const float *x = X + r * n_features;
+                int32_t id = root;
+                const node_t *node = nodes + id;
+                while (node->left != id) {
+                    float v = x[node->feature];
+                    int go_left = isnan(v) ? default_left[id] : v < node->threshold;
+                    id = go_left ? node->left : node->right;
+                    node = nodes + id;
+                }
+                out[r * n_class + cls] += node->threshold;
+            }
+        }
+
+        for (r = block; r < end; r++) {
+            float *margin = out + r * n_class;
+            float wmax = margin[0], wsum = 0.0f;
+            for (k = 1; k < n_class; k++)
+                if (margin[k] > wmax) wmax = margin[k];
+            for (k = 0; k < n_class; k++) {
+                margin[k] = expf(margin[k] - wmax);
+                wsum += margin[k];
+            }
+            for (k = 0; k < n_class; k++)
+                margin[k] /= wsum;
+        }
+    }
+}
@@ -0,0 +1,381 @@
+"""
+Standalone evaluator for the trained booster, without the xgboost runtime.
+
+At export time the booster's trees are flattened into contiguous node arrays
+(split feature, threshold, left/right child, default direction, leaf value)
+and saved as ``model_trees.npz``. Its members are stored uncompressed and
+64-byte aligned, so ``TreeEnsemble.load`` memory-maps them: every worker
+serving the same file shares one copy in the page cache. A booster quantized
+by compress.py is stored narrower instead (float16 thresholds, int8 or float16
+leaves, no packed nodes): the file is about a third of the size, and each
+worker widens it into private float32 arrays on load. ``TreeEnsemble``
+scores float32 matrices from those arrays with either:
+
+* ``native``: the small C kernel in ``tree_eval.c``, compiled on first use
+  with the system compiler (OpenMP when available) and loaded through ctypes;
+* ``numpy``: a vectorized level-by-level walk of every (row, tree) pair.
+
+Leaves point to themselves, so every tree can be walked a fixed number of
+steps (the deepest tree's depth) without per-node branching. Both backends
+expose ``inplace_predict`` and drop into ``FeatureEncoder`` in place of an
+``xgboost.Booster``.
+
+    python tree_eval.py    # re-export model_trees.npz from model.ubj and check parity
+"""
+from __future__ import annotations
+
+import ctypes
+import io
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+TREES_PATH = BASE_DIR / "model_trees.npz"
+NATIVE_SOURCE = BASE_DIR / "tree_eval.c"
+NATIVE_LIBRARY = BASE_DIR / "_tree_eval.so"
+
+# Max |difference| in class probability tolerated against XGBoost's own output
+PARITY_TOLERANCE = 1e-5
+
+# Rows per block in the NumPy backend; bounds the (rows, trees) work arrays
+NUMPY_BLOCK_ROWS = 1024
+
+# Array data in model_trees.npz starts on this boundary so members can be memory-mapped
+NPZ_ALIGNMENT = 64
+# ZIP extra-field id used for alignment padding (the one zipalign uses)
+_PADDING_EXTRA_ID = 0xD935
+
+
+def flatten_booster(booster: Any) -> Dict[str, np.ndarray]:
+    """Node arrays for every tree of a multi:softprob booster, concatenated."""
+    model = json.loads(booster.save_raw(raw_format="json"))
+    learner = model["learner"]
+    if learner["objective"]["name"] != "multi:softprob":
+        raise ValueError(f"Unsupported objective {learner['objective']['name']}")
+    params = learner["learner_model_param"]
+    gbtree = learner["gradient_booster"]["model"]
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    depth = 0
+    offset = 0
+    for tree in gbtree["trees"]:
+        if any(tree.get("split_type", [])):
+            raise ValueError("Categorical splits are not supported")
+        lefts = np.asarray(tree["left_children"], dtype=np.int32)
+        rights = np.asarray(tree["right_children"], dtype=np.int32)
+        n_nodes = len(lefts)
+        is_leaf = lefts == -1
+        ids = np.arange(n_nodes, dtype=np.int32)
+
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.int32))
+        threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+        left.append(np.where(is_leaf, ids, lefts) + offset)
+        right.append(np.where(is_leaf, ids, rights) + offset)
+        default_left.append(np.asarray(tree["default_left"], dtype=np.uint8))
+        # A leaf's split_condition holds its value
+        value.append(np.where(is_leaf, threshold[-1], 0.0).astype(np.float32))
+
+        node_depth = np.zeros(n_nodes, dtype=np.int32)
+        for node in range(n_nodes):
+            if not is_leaf[node]:
+                node_depth[lefts[node]] = node_depth[rights[node]] = node_depth[node] + 1
+        depth = max(depth, int(node_depth.max()))
+        offset += n_nodes
+
+    return {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "default_left": np.concatenate(default_left),
+        "value": np.concatenate(value),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_class": np.asarray(gbtree["tree_info"], dtype=np.int32),
+        "n_class": np.int32(params["num_class"]),
+        "n_features": np.int32(params["num_feature"]),
+        "base_score": np.float32(float(params["base_score"])),
+        "depth": np.int32(depth),
+    }
+
+
+def pack_nodes(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    """(n_nodes, 4) int32 rows matching node_t in tree_eval.c: left, right, feature, threshold.
+
+    A leaf (its own left child) carries its value in the threshold slot.
+    """
+    left = np.asarray(arrays["left"], dtype=np.int32)
+    is_leaf = left == np.arange(len(left))
+    threshold = np.where(is_leaf, arrays["value"], arrays["threshold"]).astype(np.float32)
+    return np.column_stack([left, arrays["right"], arrays["feature"], threshold.view(np.int32)])
+
+
+def save_aligned_npz(path: Path, arrays: Dict[str, np.ndarray]) -> None:
+    """Uncompressed .npz (np.load compatible) whose array data is NPZ_ALIGNMENT-aligned."""
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, array in arrays.items():
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, np.asanyarray(array), allow_pickle=False)
+            member = zipfile.ZipInfo(name + ".npy", date_time=(1980, 1, 1, 0, 0, 0))
+            # np.save pads its own header to a multiple of 64, so aligning the
+            # start of the .npy aligns the data. Pad the local header's extra field.
+            start = archive.fp.tell() + 30 + len(member.filename.encode()) + 4
+            member.extra = struct.pack("<HH", _PADDING_EXTRA_ID, -start % NPZ_ALIGNMENT) + bytes(-start % NPZ_ALIGNMENT)
+            archive.writestr(member, buffer.getvalue())
+
+
+def load_npz_mmap(path: Path) -> Dict[str, np.ndarray]:
+    """Members of an uncompressed .npz, memory-mapped read-only (scalars are read)."""
+    arrays: Dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for member in archive.infolist():
+            if member.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path.name}: {member.filename} is compressed and cannot be mapped")
+            f.seek(member.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(member.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = member.filename[:-len(".npy")]
+            if shape == ():
+                arrays[name] = np.fromfile(f, dtype=dtype, count=1).reshape(())
+            else:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+    return arrays
+
+
+def _node_class(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    sizes = np.diff(np.append(arrays["roots"], len(arrays["left"])))
+    return np.repeat(np.asarray(arrays["tree_class"]), sizes)
+
+
+def narrow_arrays(arrays: Dict[str, np.ndarray], quantization: Dict) -> Dict[str, np.ndarray]:
+    """Stored form of a booster quantized by compress.py: float16 thresholds,
+    int8 (with per-class ``leaf_scale``) or float16 leaves, uint8 split features.
+
+    The packed ``nodes`` are left out and rebuilt by ``widen_arrays`` on load.
+    """
+    stored = {name: array for name, array in arrays.items() if name != "nodes"}
+    left = np.asarray(arrays["left"])
+    is_leaf = left == np.arange(len(left))
+    if int(arrays["n_features"]) <= 256:
+        stored["feature"] = np.asarray(arrays["feature"]).astype(np.uint8)
+    if quantization.get("thresholds") == "float16":
+        stored["threshold"] = np.where(is_leaf, 0, arrays["threshold"]).astype(np.float16)
+    if quantization.get("leaves") == "int8":
+        scale = np.asarray(quantization["leaf_scale"], dtype=np.float32)
+        stored["value"] = np.rint(np.asarray(arrays["value"]) / scale[_node_class(arrays)]).astype(np.int8)
+        stored["leaf_scale"] = scale
+    elif quantization.get("leaves") == "float16":
+        stored["value"] = np.asarray(arrays["value"]).astype(np.float16)
+    return stored
+
+
+def widen_arrays(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Float32 node arrays from the stored form (unchanged if not quantized)."""
+    if "nodes" in arrays:
+        return arrays
+    arrays = dict(arrays)
+    if "leaf_scale" in arrays:
+        scale = np.asarray(arrays["leaf_scale"], dtype=np.float32)
+        arrays["value"] = np.asarray(arrays["value"]).astype(np.float32) * scale[_node_class(arrays)]
+    arrays["threshold"] = np.asarray(arrays["threshold"]).astype(np.float32)
+    arrays["value"] = np.asarray(arrays["value"]).astype(np.float32)
+    arrays["feature"] = np.asarray(arrays["feature"]).astype(np.int32)
+    arrays["nodes"] = pack_nodes(arrays)
+    return arrays
+
+
+def export_trees(booster: Any, path: Path = TREES_PATH, quantization: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+    """Write ``path`` for ``booster``; narrow tables if it was quantized by compress.py."""
+    arrays = flatten_booster(booster)
+    if quantization:
+        stored = narrow_arrays(arrays, quantization)
+    else:
+        stored = arrays
+        arrays["nodes"] = pack_nodes(arrays)
+    tmp = path.with_name(path.name + ".tmp")
+    save_aligned_npz(tmp, stored)
+    os.replace(tmp, path)
+    return arrays
+
+
+def build_native(source: Path = NATIVE_SOURCE, library: Path = NATIVE_LIBRARY) -> Optional[Path]:
+    """Compile the C kernel if it is missing or stale; None if no compiler works."""
+    if library.exists() and library.stat().st_mtime >= source.stat().st_mtime:
+        return library
+    compiler = os.environ.get("CC") or shutil.which("cc") or shutil.which("gcc")
+    if compiler is None:
+        return None
+    # Unique temp name: several workers may start at once
+    tmp = library.with_name(f"{library.name}.{os.getpid()}.tmp")
+    base_cmd = [compiler, "-O3", "-shared", "-fPIC", str(source), "-o", str(tmp), "-lm"]
+    for cmd in (base_cmd[:4] + ["-fopenmp"] + base_cmd[4:], base_cmd):
+        if subprocess.run(cmd, capture_output=True).returncode == 0:
+            os.replace(tmp, library)
+            return library
+    tmp.unlink(missing_ok=True)
+    return None
+
+
+def _load_native() -> Optional[Any]:
+    try:
+        library = build_native()
+        if library is None:
+            return None
+        kernel = ctypes.CDLL(str(library)).predict_proba
+    except OSError:
+        return None
+
+    def array(dtype: Any) -> Any:
+        return np.ctypeslib.ndpointer(dtype=dtype, flags="C_CONTIGUOUS")
+
+    kernel.restype = None
+    kernel.argtypes = [
+        array(np.float32), ctypes.c_int64, ctypes.c_int64,
+        array(np.int32), array(np.uint8), array(np.int32), array(np.int32),
+        ctypes.c_int64, ctypes.c_int32, ctypes.c_float, array(np.float32),
+    ]
+    return kernel
+
+
+class TreeEnsemble:
+    """Booster stand-in over flattened tree arrays (see module docstring)."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], backend: str = "auto") -> None:
+        arrays = widen_arrays(arrays)
+        self.feature = np.ascontiguousarray(arrays["feature"], dtype=np.int32)
+        self.threshold = np.ascontiguousarray(arrays["threshold"], dtype=np.float32)
+        self.left = np.ascontiguousarray(arrays["left"], dtype=np.int32)
+        self.right = np.ascontiguousarray(arrays["right"], dtype=np.int32)
+        self.default_left = np.ascontiguousarray(arrays["default_left"], dtype=np.uint8)
+        self.value = np.ascontiguousarray(arrays["value"], dtype=np.float32)
+        self.roots = np.ascontiguousarray(arrays["roots"], dtype=np.int32)
+        self.tree_class = np.ascontiguousarray(arrays["tree_class"], dtype=np.int32)
+        self.n_class = int(arrays["n_class"])
+        self.n_features = int(arrays["n_features"])
+        self.base_score = float(arrays["base_score"])
+        self.depth = int(arrays["depth"])
+        # (n_trees, n_class) one-hot: sums leaf values into per-class margins
+        self._class_matrix = np.eye(self.n_class, dtype=np.float32)[self.tree_class]
+
+        if backend not in ("auto", "native", "numpy"):
+            raise ValueError(f"Unknown tree_eval backend {backend!r}")
+        self._kernel = _load_native() if backend != "numpy" else None
+        if backend == "native" and self._kernel is None:
+            raise RuntimeError(f"Could not build {NATIVE_LIBRARY.name}; is a C compiler installed?")
+        self.backend = "native" if self._kernel is not None else "numpy"
+        if self._kernel is not None:
+            nodes = arrays["nodes"] if "nodes" in arrays else pack_nodes(arrays)
+            self._packed = np.ascontiguousarray(nodes, dtype=np.int32)
+
+    @classmethod
+    def load(cls, path: Path = TREES_PATH, backend: str = "auto") -> "TreeEnsemble":
+        """Map the arrays read-only: workers loading the same file share one copy in the page cache."""
+        return cls(load_npz_mmap(path), backend=backend)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def inplace_predict(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities for a float32 (n_rows, n_features) matrix."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected (n_rows, {self.n_features}) features, got {X.shape}")
+        if self._kernel is not None:
+            out = np.empty((len(X), self.n_class), dtype=np.float32)
+            self._kernel(
+                X, len(X), self.n_features, self._packed, self.default_left,
+                self.roots, self.tree_class, self.n_trees, self.n_class, self.base_score, out,
+            )
+            return out
+        return self._predict_numpy(X)
+
+    def _predict_numpy(self, X: np.ndarray) -> np.ndarray:
+        out = np.empty((len(X), self.n_class), dtype=np.float32)
+        has_missing = bool(np.isnan(X).any())
+        for start in range(0, len(X), NUMPY_BLOCK_ROWS):
+            block = X[start:start + NUMPY_BLOCK_ROWS]
+            flat = block.ravel()
+            row_offsets = (np.arange(len(block)) * self.n_features)[:, None]
+            node = np.repeat(self.roots[None, :], len(block), axis=0)
+            for _ in range(self.depth):
+                values = flat[row_offsets + self.feature[node]]
+                go_left = values < self.threshold[node]
+                if has_missing:
+                    go_left |= np.isnan(values) & self.default_left[node].astype(bool)
+                node = np.where(go_left, self.left[node], self.right[node])
+            margin = self.value[node] @ self._class_matrix + np.float32(self.base_score)
+            margin -= margin.max(axis=1, keepdims=True)
+            np.exp(margin, out=margin)
+            out[start:start + len(block)] = margin / margin.sum(axis=1, keepdims=True)
+        return out
+
+
+def verify_parity(
+    ensemble: TreeEnsemble, X: np.ndarray, expected: np.ndarray, tolerance: float = PARITY_TOLERANCE,
+) -> float:
+    """Max |difference| between ``ensemble`` and reference probabilities; raises past ``tolerance``."""
+    if not len(X):
+        return 0.0
+    diff = float(np.abs(ensemble.inplace_predict(X) - np.asarray(expected, dtype=np.float32)).max())
+    if diff > tolerance:
+        raise ValueError(
+            f"tree_eval ({ensemble.backend}) diverges from XGBoost on {len(X)} rows: max |diff| {diff:.2e}"
+        )
+    return diff
+
+
+def main() -> None:
+    sys.path.insert(0, str(BASE_DIR))
+    from artifact import LEAN_HEADER_PATH, load_lean_artifact
+
+    booster, header = load_lean_artifact()
+    export_trees(booster, quantization=header.get("quantization"))
+    if header.get("tree_arrays") != TREES_PATH.name:
+        header["tree_arrays"] = TREES_PATH.name
+        tmp_header = LEAN_HEADER_PATH.with_name(LEAN_HEADER_PATH.name + ".tmp")
+        tmp_header.write_text(json.dumps(header, indent=2), encoding="utf-8")
+        os.replace(tmp_header, LEAN_HEADER_PATH)
+    print(f"Exported {TREES_PATH.name} ({TREES_PATH.stat().st_size / 1e6:.1f} MB) "
+          f"from {header['num_boosted_rounds']} boosting rounds")
+
+    # Parity and speed on rows spread over the scaled feature space
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20_000, len(header["feature_columns"]))).astype(np.float32)
+    start = time.perf_counter()
+    expected = booster.inplace_predict(X)
+    xgb_seconds = time.perf_counter() - start
+    for backend in ("native", "numpy"):
+        try:
+            ensemble = TreeEnsemble.load(backend=backend)
+        except RuntimeError as exc:
+            print(f"  {backend}: unavailable ({exc})")
+            continue
+        start = time.perf_counter()
+        diff = verify_parity(ensemble, X, expected)
+        seconds = time.perf_counter() - start
+        print(f"  {backend}: max |diff| {diff:.2e}, {len(X) / seconds:,.0f} rows/s "
+              f"(xgboost {len(X) / xgb_seconds:,.0f} rows/s)")
+    print(f"Serve with ML_MODEL_BACKEND=tree_eval (reads {LEAN_HEADER_PATH.name} + {TREES_PATH.name})")
+
+
+if __name__ == "__main__":
+    main()